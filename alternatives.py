@@ -0,0 +1,149 @@
+from collections import namedtuple
+import heapq
+
+from bounds import get_bounds, get_times_to
+from compiled_graph import CompiledGraph, compile_graph
+from optimizer import MAX_LIFT_REPEATS, TIME_EPSILON, _build_path
+
+# One itinerary from iter_alternatives; time is the minutes it takes
+Alternative = namedtuple("Alternative", ["distance", "path", "time"])
+
+def iter_alternatives(G, start, time_limit, k=10, min_difference=0, edge_keys=False, end=None):
+    """
+    Yield the k longest itineraries, longest first, from one shared search.
+
+    A best-first search over partial itineraries ordered by distance so far
+    plus the bound from bounds.DistanceBounds, which never underestimates
+    what is left. Finishing is queued as a move of its own, keyed by the
+    exact distance, so whenever a finished itinerary comes out of the queue
+    no unfinished one can still beat it, and itineraries come out in
+    non-increasing distance. The queue is kept between results, so each
+    further alternative only costs the work since the previous one.
+
+    As in the label search, states are (node, last lift, lift repeat
+    count). A partial itinerary is dropped when k others at the same state
+    took no longer and covered at least as much: each continuation of it
+    is beaten by the same continuation of those k.
+
+    Every itinerary counts as a plan, so by default the runners-up include
+    shorter versions of the best one. With min_difference, a plan is only
+    yielded if it differs from every earlier plan by at least that many slope
+    runs, counting each slope as often as the plans' number of runs on it
+    differs. Plans rejected this way still count against k for
+    dominance, so the later diverse alternatives are good but not
+    guaranteed to be the best diverse ones. Plans ending on a lift are
+    skipped unless end is given, since they only add a ride to a shorter plan.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
+           compiled with prune_dominated=False
+        start: Starting node
+        time_limit: Available time in minutes
+        k: Number of itineraries
+        min_difference: Slope runs a plan must differ by from every plan
+            yielded before it
+        edge_keys: Return graph edges instead of edge names, see
+            optimizer.find_max_distance_path
+        end: Node every itinerary has to finish at, or None
+    Yields:
+        Alternative
+    """
+    # A dominated parallel slope is never in the best plan, but it can be in
+    # the runners-up
+    cg = G if isinstance(G, CompiledGraph) else compile_graph(G, prune_dominated=False)
+    if not cg.num_nodes or start not in cg.node_index or time_limit <= 0 or k <= 0:
+        return
+    if end is not None and end not in cg.node_index:
+        return
+    indptr, target, edge_time, edge_distance, edge_lift = (
+        cg.indptr, cg.target, cg.time, cg.distance, cg.lift
+    )
+    bounds = get_bounds(cg)
+    end_id = None if end is None else cg.node_index[end]
+    times_to_end = None if end is None else get_times_to(cg, end_id)
+
+    # Heap entries: (-key, kind, seq, ...). Finished itineraries (kind 0,
+    # followed by the label and time used) sort before partial ones (kind 1,
+    # followed by time_used, distance, node, last_lift, lift_count, parent
+    # label, edge id) with the same key
+    start_id = cg.node_index[start]
+    heap = [(-bounds.bound(start_id, -1, 0, time_limit), 1, 0,
+             0, 0, start_id, -1, 0, -1, -1)]
+    seq = 1
+    parents, edges = [], []
+    # Slope runs of every label as a set of (name, n) for the n-th run of
+    # that slope, only tracked for min_difference
+    slopes_of = []
+    # (node, last_lift, lift_count) -> [(time_used, distance, slopes)] of expanded labels
+    expanded = {}
+    yielded = []
+
+    while heap and len(yielded) < k:
+        entry = heapq.heappop(heap)
+        if entry[1] == 0:
+            label = entry[3]
+            path = _build_path(parents, edges, label)
+            slopes = slopes_of[label] or frozenset()
+            if all(len(slopes ^ other) >= min_difference for other in yielded):
+                yielded.append(slopes)
+                yield Alternative(
+                    -entry[0],
+                    [cg.edge_keys[e] for e in path] if edge_keys else cg.edge_path_names(path),
+                    entry[4]
+                )
+            continue
+
+        _, _, _, time_used, distance, node, last_lift, lift_count, parent, edge = entry
+        slopes = None
+        if min_difference:
+            slopes = slopes_of[parent] if parent >= 0 else frozenset()
+            if edge >= 0 and edge_lift[edge] < 0:
+                runs = 1
+                while (cg.edge_names[edge], runs) in slopes:
+                    runs += 1
+                slopes = slopes | {(cg.edge_names[edge], runs)}
+        seen = expanded.setdefault((node, last_lift, lift_count), [])
+        dominating = 0
+        for seen_time, seen_distance, seen_slopes in seen:
+            if seen_time <= time_used + TIME_EPSILON and seen_distance >= distance:
+                # With the same slope runs, the plans it could lead to are
+                # no more diverse than those of the dominating label
+                dominating += k if min_difference and seen_slopes == slopes else 1
+                if dominating >= k:
+                    break
+        if dominating >= k:
+            continue
+        seen.append((time_used, distance, slopes))
+
+        label = len(parents)
+        parents.append(parent)
+        edges.append(edge)
+        slopes_of.append(slopes)
+        if edge >= 0 and (node == end_id if end is not None else edge_lift[edge] < 0):
+            heapq.heappush(heap, (-distance, 0, seq, label, time_used))
+            seq += 1
+
+        time_left = time_limit - time_used
+        for e in range(indptr[node], indptr[node + 1]):
+            time_needed = edge_time[e]
+            if times_to_end is not None:
+                time_needed += times_to_end[target[e]]
+            if time_needed > time_left + TIME_EPSILON:
+                continue
+            lift = edge_lift[e]
+            if lift >= 0:
+                if lift == last_lift:
+                    if lift_count >= MAX_LIFT_REPEATS:
+                        continue
+                    next_lift_state = (lift, lift_count + 1)
+                else:
+                    next_lift_state = (lift, 1)
+            else:
+                next_lift_state = (last_lift, lift_count)
+            next_node = target[e]
+            new_distance = distance + edge_distance[e]
+            new_time_left = time_left - edge_time[e]
+            key = new_distance + bounds.bound(next_node, *next_lift_state, new_time_left)
+            heapq.heappush(heap, (-key, 1, seq, time_used + edge_time[e], new_distance,
+                                  next_node, *next_lift_state, label, e))
+            seq += 1
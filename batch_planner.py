@@ -0,0 +1,97 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+from compiled_graph import CompiledGraph, compile_graph, shortest_times
+from optimizer import solve_compiled
+
+# Result of one query: distance in km, list of edge names (or edge keys),
+# solve time in seconds
+PlanResult = namedtuple("PlanResult", ["distance", "path", "seconds"])
+
+# Per-process state for pool workers: the compiled graph and the subgraphs
+# reachable from each start, shared by all queries a worker handles. Tasks
+# with a horizon of None search the whole graph, whose bounds are computed
+# once, so long-running callers with ever new time limits do not collect a
+# subgraph per limit
+_worker_graph = None
+_worker_subgraphs = {}
+
+def plan_many(G, queries, method="labels", processes=None, chunksize=1, edge_keys=False):
+    """
+    Plan many itineraries on the same resort.
+
+    The graph is compiled once. For every distinct start node, the nodes
+    reachable within the longest time limit asked from it are computed
+    once, and all queries from that start search only that subgraph.
+    Queries are spread over a process pool; each worker receives the
+    compiled graph once, when it starts.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
+        queries: Iterable of (start, time_limit, distance_goal) tuples
+        method: Solver method, see optimizer.find_max_distance_path
+        processes: Number of worker processes, None for one per CPU, 0 or 1
+                   to solve everything in the calling process
+        chunksize: Number of queries sent to a worker at a time
+        edge_keys: Give paths as graph edge keys (u, v, key) instead of
+                   names, which tells parallel edges apart
+    Returns:
+        List of PlanResult, in the same order as queries
+    """
+    cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+    queries = [tuple(query) for query in queries]
+
+    # Longest time limit per start, which bounds the reachable subgraph
+    horizons = {}
+    for start, time_limit, _ in queries:
+        horizons[start] = max(horizons.get(start, 0), time_limit)
+    tasks = [(start, time_limit, distance_goal, horizons[start], method, edge_keys)
+             for start, time_limit, distance_goal in queries]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(tasks))
+
+    if processes <= 1:
+        _init_worker(cg)
+        try:
+            return [_solve_task(task) for task in tasks]
+        finally:
+            _init_worker(None)
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(cg,)) as pool:
+        return list(pool.map(_solve_task, tasks, chunksize=chunksize))
+
+def _init_worker(cg):
+    global _worker_graph, _worker_subgraphs
+    _worker_graph = cg
+    _worker_subgraphs = {}
+
+def _reachable_subgraph(start, horizon):
+    """Return the subgraph of nodes reachable from start within horizon minutes."""
+    key = (start, horizon)
+    if key not in _worker_subgraphs:
+        cg = _worker_graph
+        if start in cg.node_index:
+            reachable = shortest_times(cg, cg.node_index[start], horizon)
+            _worker_subgraphs[key] = cg.subgraph(reachable)
+        else:
+            _worker_subgraphs[key] = cg
+    return _worker_subgraphs[key]
+
+def _solve_task(task):
+    start, time_limit, distance_goal, horizon, method, edge_keys = task
+    t0 = time.perf_counter()
+    cg = _worker_graph if horizon is None else _reachable_subgraph(start, horizon)
+    return _solve_on(cg, start, time_limit, distance_goal, method, t0, edge_keys)
+
+def _solve_on(cg, start, time_limit, distance_goal, method, t0=None, edge_keys=False):
+    """Solve one query on cg as a PlanResult, timed from t0 (default: now)."""
+    if t0 is None:
+        t0 = time.perf_counter()
+    distance, edge_ids = solve_compiled(cg, start, time_limit, distance_goal, method)
+    path = [cg.edge_keys[e] for e in edge_ids] if edge_keys else cg.edge_path_names(edge_ids)
+    return PlanResult(distance, path, time.perf_counter() - t0)
@@ -0,0 +1,52 @@
+"""
+Measure peak memory of find_max_distance_path.
+
+Each solve runs in a fresh subprocess so the reported peak RSS belongs to
+that solve alone. Run with:
+    python bench_memory.py [--time-limit 480] [--methods bfs labels dp]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, sys, time
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+
+method, start, time_limit, distance_goal = sys.argv[1], sys.argv[2], float(sys.argv[3]), float(sys.argv[4])
+G, _ = create_les_arcs_graph()
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+distance, path = find_max_distance_path(G, start, time_limit, distance_goal, method=method)
+elapsed = time.perf_counter() - t0
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"method": method, "distance": distance, "edges": len(path),
+                  "seconds": elapsed, "peak_rss_kb": peak, "baseline_rss_kb": baseline}))
+"""
+
+def measure(method, start, time_limit, distance_goal):
+    """Run one solve in a subprocess and return its measurements."""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, method, start, str(time_limit), str(distance_goal)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", default="Vallandry")
+    parser.add_argument("--time-limit", type=float, default=8*60)
+    parser.add_argument("--distance-goal", type=float, default=1000)
+    parser.add_argument("--methods", nargs="+", default=["bfs", "labels", "dp"])
+    args = parser.parse_args()
+
+    for method in args.methods:
+        result = measure(method, args.start, args.time_limit, args.distance_goal)
+        print(f"{method:>7}: peak RSS {result['peak_rss_kb'] / 1024:7.1f} MB "
+              f"(+{(result['peak_rss_kb'] - result['baseline_rss_kb']) / 1024:.1f} MB during solve), "
+              f"{result['seconds']:.3f}s, {result['distance']:.2f} km over {result['edges']} edges")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure the speedup of the "parallel" method over "labels" by process count.
+
+Each solve runs in a fresh subprocess on a synthetic resort, so pool start
+up is included in the parallel timings. Results are checked to be the same
+itinerary as the sequential search. Run with:
+    python bench_parallel.py [--nodes 1000 2000] [--processes 1 2 4 8 16 32]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CHILD = """
+import json, sys, time
+from compiled_graph import compile_graph
+from optimizer import _get_bounds, solve_compiled
+from parallel_search import parallel_label_search
+from synthetic_resort import create_synthetic_resort
+
+nodes, seed, time_limit, distance_goal, processes = json.loads(sys.argv[1])
+G, node_rows = create_synthetic_resort(num_nodes=nodes, seed=seed)
+start = node_rows[-1][0]
+cg = compile_graph(G)
+bounds = _get_bounds(cg)
+
+t0 = time.perf_counter()
+if processes:
+    distance, path = parallel_label_search(cg, cg.node_index[start], time_limit, distance_goal,
+                                           bounds, processes=processes)
+else:
+    distance, path = solve_compiled(cg, start, time_limit, distance_goal, "labels")
+print(json.dumps({"distance": distance, "path": [int(e) for e in path],
+                  "seconds": time.perf_counter() - t0}))
+"""
+
+def measure(nodes, seed, time_limit, distance_goal, processes):
+    """Run one solve in a subprocess, processes 0 meaning the sequential search."""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps([nodes, seed, time_limit, distance_goal, processes])],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 2000])
+    parser.add_argument("--time-limit", type=float, default=8*60)
+    parser.add_argument("--goal", type=float, default=1e9, help="Distance goal in km (1e9 means no goal)")
+    parser.add_argument("--processes", type=int, nargs="+", default=[2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    for nodes in args.nodes:
+        sequential = measure(nodes, args.seed, args.time_limit, args.goal, 0)
+        print(f"{nodes:>6} nodes  labels: {sequential['seconds']:8.3f}s  {sequential['distance']:.2f} km")
+        for processes in args.processes:
+            result = measure(nodes, args.seed, args.time_limit, args.goal, processes)
+            same = (result["distance"], result["path"]) == (sequential["distance"], sequential["path"])
+            print(f"{nodes:>6} nodes  {processes:>2} processes: {result['seconds']:8.3f}s  "
+                  f"speedup {sequential['seconds'] / result['seconds']:6.2f}x"
+                  f"{'' if same else '  DIFFERENT RESULT'}")
+
+if __name__ == "__main__":
+    main()
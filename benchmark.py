@@ -0,0 +1,120 @@
+"""
+Benchmark find_max_distance_path on synthetic resorts.
+
+Sweeps resort size, time limit, distance goal and solver method. Every
+run happens in a fresh subprocess so that wall time and peak RSS belong to
+that run alone; the SearchStats counters and phase times are included.
+Results are written as JSON for comparing runs:
+    python benchmark.py --nodes 100 400 --time-limits 120 480 --output new.json
+    python benchmark.py --compare old.json new.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+
+CHILD = """
+import json, resource, sys, time
+from compiled_graph import compile_graph
+from optimizer import find_max_distance_path
+import bounds, dp_solver  # Keep the NumPy import out of the timings
+from synthetic_resort import create_synthetic_resort
+
+nodes, seed, method, time_limit, distance_goal = json.loads(sys.argv[1])
+G, node_rows = create_synthetic_resort(num_nodes=nodes, seed=seed)
+start = node_rows[-1][0]
+cg = compile_graph(G)
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+t0 = time.perf_counter()
+distance, _, stats = find_max_distance_path(cg, start, time_limit, distance_goal, method, stats=True)
+seconds = time.perf_counter() - t0
+
+stats = stats.as_dict()
+del stats["trace"], stats["method"]
+print(json.dumps(dict(stats, distance=distance, seconds=seconds,
+                      peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      solve_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline,
+                      edges=cg.num_edges)))
+"""
+
+def run_case(nodes, seed, method, time_limit, distance_goal, timeout):
+    """Run one benchmark case in a subprocess and return its measurements."""
+    case = {"nodes": nodes, "seed": seed, "method": method,
+            "time_limit": time_limit, "distance_goal": distance_goal}
+    try:
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, json.dumps([nodes, seed, method, time_limit, distance_goal])],
+            check=True, capture_output=True, text=True, timeout=timeout
+        ).stdout
+    except subprocess.TimeoutExpired:
+        return dict(case, timeout=True)
+    return dict(case, timeout=False, **json.loads(output))
+
+def compare(old_path, new_path):
+    """Print the wall time ratio of every case present in both result files."""
+    def load(path):
+        with open(path) as f:
+            results = json.load(f)["results"]
+        return {(r["nodes"], r["seed"], r["method"], r["time_limit"], r["distance_goal"]): r
+                for r in results}
+
+    old, new = load(old_path), load(new_path)
+    print(f"{'nodes':>6} {'method':>7} {'time':>6} {'goal':>8} {'old s':>9} {'new s':>9} {'ratio':>6}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        if a["timeout"] or b["timeout"]:
+            ratio = "timeout"
+        else:
+            ratio = f"{b['seconds'] / a['seconds']:.2f}" if a["seconds"] else "-"
+        print(f"{key[0]:>6} {key[2]:>7} {key[3]:>6g} {key[4]:>8g} "
+              f"{a.get('seconds', float('nan')):>9.3f} {b.get('seconds', float('nan')):>9.3f} {ratio:>6}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--time-limits", type=float, nargs="+", default=[120, 240, 480])
+    parser.add_argument("--goals", type=float, nargs="+", default=[100, 1e9],
+                        help="Distance goals in km (1e9 means no goal)")
+    parser.add_argument("--methods", nargs="+", default=["labels", "dp"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="Seconds before a single case is abandoned")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for nodes, time_limit, goal, method in itertools.product(
+            args.nodes, args.time_limits, args.goals, args.methods):
+        result = run_case(nodes, args.seed, method, time_limit, goal, args.timeout)
+        results.append(result)
+        status = "timeout" if result["timeout"] else (
+            f"{result['seconds']:.3f}s, {result['solve_rss_kb'] / 1024:.1f} MB, "
+            f"{result['distance']:.2f} km")
+        print(f"{nodes:>6} nodes {method:>7} {time_limit:>5g} min goal {goal:g}: {status}",
+              file=sys.stderr)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import numpy as np
+from optimizer import MAX_LIFT_REPEATS
+
+# Relative precision of the maximum distance-per-minute cycle ratio
+RATIO_TOLERANCE = 1e-4
+
+class DistanceBounds:
+    """
+    Admissible upper bounds on the distance reachable from a state in a given time.
+
+    States are (node, last lift, lift repeat count) as in the label search,
+    so cycles that would need a lift more than MAX_LIFT_REPEATS times in a
+    row do not count. For every state s, rate[s] is (an upper estimate of)
+    the best km per minute over all cycles reachable from s, and
+    potential[s] is the most any itinerary from s can gain over skiing at
+    that rate:
+        potential[s] = max over paths P from s of sum(distance - rate[s] * time)
+    Since no reachable cycle beats rate[s], the maximum is finite, and any
+    itinerary from s taking at most t minutes covers at most
+        rate[s] * t + potential[s]
+    km, and never more than t times the fastest slope's km per minute.
+    """
+
+    def __init__(self, state_index, rate, potential, fastest):
+        self.state_index = state_index
+        self.rate = rate
+        self.potential = potential
+        self.fastest = fastest
+
+    def bound(self, node, last_lift, lift_count, time_left):
+        """Upper bound on the distance coverable from a state within time_left minutes."""
+        state = self.state_index[(node, last_lift, lift_count)]
+        return min(self.rate[state] * time_left + self.potential[state], self.fastest * time_left)
+
+def get_bounds(cg):
+    """Return the DistanceBounds of a compiled graph, computing them on first use."""
+    bounds = getattr(cg, "_distance_bounds", None)
+    if bounds is None:
+        bounds = compute_bounds(cg)
+        cg._distance_bounds = bounds
+    return bounds
+
+def get_times_to(cg, end):
+    """
+    Return times_to(cg, end), computing it on first use for each end node.
+
+    Graphs with precompute.PrecomputedTables attached look it up there.
+    """
+    tables = cg.__dict__.setdefault("_times_to", {})
+    if end not in tables:
+        precomputed = getattr(cg, "_precomputed", None)
+        tables[end] = times_to(cg, end) if precomputed is None else precomputed.times_to(end)
+    return tables[end]
+
+def times_to(cg, end):
+    """
+    Minimum time in minutes from every node to end, ignoring lift repeats.
+
+    Runs Dijkstra from end on the reversed graph with scipy.sparse.csgraph.
+    As the lift repeat rule only removes itineraries, a label with less time
+    left than this can never get back to end.
+
+    Args:
+        cg: CompiledGraph
+        end: End node id
+    Returns:
+        List with the time of every node id, inf where end cannot be reached
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    return dijkstra(quickest_edges(cg, reverse=True), directed=True, indices=end).tolist()
+
+def quickest_edges(cg, reverse=False):
+    """
+    Sparse matrix of the quickest edge time between every pair of nodes.
+
+    Parallel edges are collapsed to the quickest one, since sparse matrices
+    would add their times up, and closed edges are left out.
+
+    Args:
+        cg: CompiledGraph
+        reverse: Put target nodes in the rows, for searches towards a node
+    Returns:
+        scipy.sparse.csr_array of shape (num_nodes, num_nodes)
+    """
+    from scipy.sparse import csr_array
+
+    n = cg.num_nodes
+    source = np.frombuffer(cg.source(), dtype=np.int32).astype(np.int64)
+    target = np.frombuffer(cg.target, dtype=np.int32).astype(np.int64)
+    time = np.frombuffer(cg.time, dtype=np.float64)
+    open_edges = np.isfinite(time)
+    source, target, time = source[open_edges], target[open_edges], time[open_edges]
+    if reverse:
+        source, target = target, source
+    if not len(time):
+        return csr_array((n, n))
+
+    # One entry per (source, target) pair with the quickest edge
+    pair = source * n + target
+    order = np.argsort(pair, kind="stable")
+    pair, time = pair[order], time[order]
+    starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+    quickest = np.minimum.reduceat(time, starts)
+    return csr_array((quickest, (pair[starts] // n, pair[starts] % n)), shape=(n, n))
+
+def compute_bounds(cg):
+    """
+    Compute DistanceBounds for a compiled graph.
+
+    Cycle ratios are found per strongly connected component of the state
+    graph by bisection on the ratio, checking for positive cycles of
+    distance - ratio * time with a vectorized Bellman-Ford. The reported
+    ratio is the upper end of the final bisection interval, which is
+    certified to have no positive cycle, so the bounds stay admissible.
+
+    Args:
+        cg: CompiledGraph
+    Returns:
+        DistanceBounds
+    """
+    state_index, source, target, time, distance, _ = state_graph(cg)
+    n = len(state_index)
+
+    positive_time = time > 0
+    if distance[~positive_time].any():
+        raise ValueError("Slopes must take a positive amount of time")
+    edge_rate = np.frombuffer(cg.distance, dtype=np.float64) / np.maximum(
+        np.frombuffer(cg.time, dtype=np.float64), 1e-12)
+    fastest = float(edge_rate.max()) if cg.num_edges else 0.0
+
+    # Best cycle ratio inside each strongly connected component
+    num_components, component = strong_components(n, source, target)
+    component_rate = np.zeros(num_components)
+    internal = component[source] == component[target]
+    for c in np.unique(component[source[internal]]):
+        edges = internal & (component[source] == c)
+        component_rate[c] = _max_cycle_ratio(source[edges], target[edges], time[edges],
+                                             distance[edges], n, fastest)
+
+    # A state can reach every cycle its successors can reach
+    rate = component_rate[component]
+    for _ in range(n):
+        reachable = rate.copy()
+        np.maximum.at(reachable, source, rate[target])
+        if np.array_equal(reachable, rate):
+            break
+        rate = reachable
+
+    # Potentials, one pass per distinct rate over the states that cannot
+    # reach a better cycle (a set closed under reachability)
+    potential = np.zeros(n)
+    for value in np.unique(rate):
+        states = rate <= value
+        edges = states[source]
+        gains = _longest_gains(source[edges], target[edges], distance[edges] - value * time[edges], n)
+        assigned = rate == value
+        potential[assigned] = gains[assigned]
+
+    return DistanceBounds(state_index, rate.tolist(), potential.tolist(), fastest)
+
+def state_graph(cg, roots=None):
+    """
+    Expand a compiled graph into its (node, last lift, lift repeat count) states.
+
+    By default every node's lift-free state (node, -1, 0) is a root, with
+    the node id as its state id, so the result covers every state a search
+    from any start can reach.
+
+    Args:
+        cg: CompiledGraph
+        roots: States to expand from instead
+    Returns:
+        (state_index, source, target, time, distance, edge): a dict from
+        state to state id and NumPy arrays with one entry per state
+        transition, edge being the compiled edge id taken
+    """
+    if roots is None:
+        roots = [(node, -1, 0) for node in range(cg.num_nodes)]
+    state_index = {}
+    pending = []
+    for state in roots:
+        state_index[state] = len(state_index)
+        pending.append(state)
+
+    source, target, time, distance, edge = [], [], [], [], []
+    while pending:
+        state = pending.pop()
+        node, last_lift, lift_count = state
+        for e in cg.out_edges(node):
+            if cg.time[e] == float("inf"):
+                # Closed edge, see incremental.IncrementalPlanner
+                continue
+            lift = cg.lift[e]
+            if lift >= 0:
+                if lift == last_lift:
+                    if lift_count >= MAX_LIFT_REPEATS:
+                        continue
+                    next_state = (cg.target[e], lift, lift_count + 1)
+                else:
+                    next_state = (cg.target[e], lift, 1)
+            else:
+                next_state = (cg.target[e], last_lift, lift_count)
+
+            if next_state not in state_index:
+                state_index[next_state] = len(state_index)
+                pending.append(next_state)
+            source.append(state_index[state])
+            target.append(state_index[next_state])
+            time.append(cg.time[e])
+            distance.append(cg.distance[e])
+            edge.append(e)
+
+    return (state_index, np.array(source, dtype=np.int64), np.array(target, dtype=np.int64),
+            np.array(time, dtype=np.float64), np.array(distance, dtype=np.float64),
+            np.array(edge, dtype=np.int64))
+
+def strong_components(n, source, target):
+    """
+    Label the strongly connected components of a graph given as edge arrays (Tarjan).
+
+    Returns:
+        (number of components, array of the component of every node)
+    """
+    order = np.argsort(source, kind="stable")
+    successors = target[order].tolist()
+    indptr = np.searchsorted(source[order], np.arange(n + 1)).tolist()
+
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    component = np.full(n, -1, dtype=np.int64)
+    stack = []
+    counter = 0
+    num_components = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        # Iterative DFS frames: (node, iterator over its successors)
+        frames = [(root, iter(successors[indptr[root]:indptr[root + 1]]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while frames:
+            node, children = frames[-1]
+            for child in children:
+                if index[child] < 0:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    frames.append((child, iter(successors[indptr[child]:indptr[child + 1]])))
+                    break
+                if on_stack[child]:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = num_components
+                        if member == node:
+                            break
+                    num_components += 1
+
+    return num_components, component
+
+def _max_cycle_ratio(source, target, time, distance, n, high):
+    """Bisect for the smallest ratio without a positive distance - ratio * time cycle."""
+    low = 0.0
+    if _has_positive_cycle(source, target, distance - high * time, n):
+        # Only possible with zero-time cycles, which make distance unbounded
+        raise ValueError("Graph has a cycle that takes no time")
+    # Bisection keeps `high` certified cycle-free
+    while high - low > RATIO_TOLERANCE * max(high, 1e-9):
+        middle = (low + high) / 2
+        if _has_positive_cycle(source, target, distance - middle * time, n):
+            low = middle
+        else:
+            high = middle
+    return high
+
+def _has_positive_cycle(source, target, weight, n):
+    """Check for a cycle with positive total weight."""
+    return _longest_gains(source, target, weight, n) is None
+
+def _longest_gains(source, target, weight, n, check_every=8):
+    """
+    Longest path weight from every node, allowing the empty path.
+
+    Runs Bellman-Ford style rounds. Every check_every rounds the graph of
+    chosen successors is searched for a cycle; as with negative cycles in
+    shortest paths, such a cycle has positive weight, which usually shows
+    up long before the n rounds the plain bound needs.
+
+    Returns None if a positive cycle makes it unbounded.
+    """
+    gains = np.zeros(n)
+    for round_number in range(1, n + 2):
+        candidates = weight + gains[target]
+        updated = gains.copy()
+        np.maximum.at(updated, source, candidates)
+        if np.allclose(updated, gains, rtol=0, atol=1e-12):
+            return updated
+        gains = updated
+        if round_number % check_every == 0 and _successor_cycle(source, target, candidates, gains, n):
+            return None
+    return None
+
+def _successor_cycle(source, target, candidates, gains, n):
+    """Check whether the successors chosen in the last round form a cycle."""
+    successor = np.full(n, -1, dtype=np.int64)
+    chosen = np.nonzero((candidates >= gains[source] - 1e-12) & (gains[source] > 0))[0]
+    successor[source[chosen]] = target[chosen]
+
+    # Pointer doubling: if some node still has a successor 2**k >= n steps
+    # ahead, its successor path must run into a cycle
+    jump = successor
+    for _ in range(int(np.ceil(np.log2(max(n, 2)))) + 1):
+        jump = np.where(jump >= 0, jump[jump], -1)
+    return bool((jump >= 0).any())
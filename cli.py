@@ -0,0 +1,169 @@
+"""
+Command line entry point of the optimizer.
+
+Plan one itinerary:
+    python cli.py Vallandry --time-limit 480 --goal 100
+With lift waits and opening hours by time of day, see lift_schedules.py:
+    python cli.py Vallandry --lift-schedules resorts/les_arcs_lifts.csv --start-time 10:00
+Plan a stream of JSON-lines queries from stdin, one result line each:
+    echo '{"id": 1, "start": "Vallandry", "time_limit": 240}' | python cli.py --stream
+Serve the same queries over TCP on localhost, see planning_service.py:
+    python cli.py --serve 8765 --processes 4
+
+The resort is loaded through its compiled snapshot (see snapshot.py), and
+NetworkX, NumPy and matplotlib are only imported by the code paths that
+need them, so short calls stay cheap.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from load_graph import LES_ARCS_PATH
+from optimizer import find_max_distance_path, print_path_breakdown
+from snapshot import load_compiled_resort
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the ski itinerary covering the most slope distance in a time limit.")
+    parser.add_argument("start", nargs="?", default="Vallandry", help="Starting point")
+    parser.add_argument("-t", "--time-limit", type=float, default=8 * 60,
+                        help="Available time in minutes (default: 480)")
+    parser.add_argument("-g", "--goal", type=float, default=100,
+                        help="Distance in km after which an itinerary is good enough (default: 100)")
+    parser.add_argument("-e", "--end", help="Point the itinerary has to finish at (default: anywhere)")
+    parser.add_argument("-r", "--resort", default=LES_ARCS_PATH,
+                        help="Resort JSON or CSV file (default: Les Arcs)")
+    parser.add_argument("--lift-schedules", metavar="CSV",
+                        help="Per-lift table of lift times by time of day and opening hours")
+    parser.add_argument("--start-time", default="09:00",
+                        help="Clock time of the start, for --lift-schedules (default: 09:00)")
+    parser.add_argument("-m", "--method", default="labels", choices=["labels", "dp", "cycle", "parallel", "bfs"])
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read JSON-lines queries from stdin and write one JSON result per line")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="Answer JSON-lines queries over TCP on this localhost port")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Worker processes for --stream and --serve (results may come out of order)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    cg = load_compiled_resort(args.resort)
+
+    if args.stream:
+        stream(cg, sys.stdin, sys.stdout, args.method, args.processes)
+        return
+    if args.serve is not None:
+        import asyncio
+        from planning_service import run_server
+        asyncio.run(run_server(cg, args.serve, args.processes, args.method))
+        return
+
+    if args.start not in cg.node_index:
+        sys.exit(f"Unknown start point: {args.start}")
+    if args.end is not None and args.end not in cg.node_index:
+        sys.exit(f"Unknown end point: {args.end}")
+    schedules = None
+    if args.lift_schedules is not None:
+        from lift_schedules import read_lift_schedules
+        if args.method != "labels":
+            sys.exit("--lift-schedules only works with --method labels")
+        try:
+            schedules = read_lift_schedules(args.lift_schedules)
+        except ValueError as error:
+            sys.exit(f"Invalid lift schedules: {error}")
+    best_distance, best_path = find_max_distance_path(
+        cg, args.start, args.time_limit, args.goal, args.method, edge_keys=not args.json,
+        end=args.end, schedules=schedules, start_time=args.start_time
+    )
+    if args.json:
+        print(json.dumps({"distance": best_distance, "path": best_path}))
+    else:
+        print_path_breakdown(cg, best_distance, best_path, args.start)
+
+def stream(cg, lines, out, method="labels", processes=1):
+    """
+    Answer JSON-lines queries, writing each result as soon as it is ready.
+
+    Every query is an object with start, time_limit and optionally
+    distance_goal (default: no goal), method and id. Results are objects
+    with the id (the query's, or its line number), distance, path and
+    seconds, or the id and an error message. With several processes,
+    results are written in the order they complete.
+
+    Args:
+        cg: CompiledGraph
+        lines: Iterable of query lines, such as sys.stdin
+        out: Writable text stream
+        method: Default solver method
+        processes: Number of worker processes
+    """
+    lock = threading.Lock()
+
+    def write(result):
+        with lock:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+    pool = None
+    if processes > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        import batch_planner
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=batch_planner._init_worker,
+                                   initargs=(cg,))
+
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+                query_id = query.get("id", line_number)
+                start = query["start"]
+                time_limit = float(query["time_limit"])
+                distance_goal = float(query.get("distance_goal", float("inf")))
+                query_method = query.get("method", method)
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                write({"id": line_number, "error": f"Invalid query: {error}"})
+                continue
+            if start not in cg.node_index:
+                write({"id": query_id, "error": f"Unknown start point: {start}"})
+                continue
+
+            if pool is None:
+                write(_answer(cg, query_id, start, time_limit, distance_goal, query_method))
+            else:
+                # Whole-graph task, so that a long stream of distinct time
+                # limits does not build and keep a subgraph for each
+                task = (start, time_limit, distance_goal, None, query_method, False)
+                future = pool.submit(batch_planner._solve_task, task)
+                future.add_done_callback(
+                    lambda future, query_id=query_id: write(_pool_answer(query_id, future)))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+def _answer(cg, query_id, start, time_limit, distance_goal, method):
+    """Solve one streamed query in this process."""
+    t0 = time.perf_counter()
+    try:
+        distance, path = find_max_distance_path(cg, start, time_limit, distance_goal, method)
+    except ValueError as error:
+        return {"id": query_id, "error": str(error)}
+    return {"id": query_id, "distance": distance, "path": path,
+            "seconds": time.perf_counter() - t0}
+
+def _pool_answer(query_id, future):
+    """Turn a finished batch_planner task into a streamed result."""
+    try:
+        result = future.result()
+    except Exception as error:
+        return {"id": query_id, "error": str(error)}
+    return {"id": query_id, "distance": result.distance, "path": result.path,
+            "seconds": result.seconds}
+
+if __name__ == "__main__":
+    main()
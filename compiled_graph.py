@@ -0,0 +1,212 @@
+from array import array
+import heapq
+
+class CompiledGraph:
+    """
+    Array-backed copy of a resort graph for the optimizer hot loops.
+
+    Nodes and edges get integer ids. Edges are sorted by source node, so the
+    out-edges of node u are the ids in range(indptr[u], indptr[u + 1]) (CSR
+    adjacency). Per-edge attributes live in typed arrays:
+        target: id of the node the edge leads to
+        time: minutes needed to take the edge
+        distance: slope distance in km (0 for lifts)
+        is_lift: 1 for lifts, 0 for slopes
+        lift: lift id shared by all lifts with the same name, -1 for slopes
+    Names, grades and the original NetworkX edge of every edge are kept in
+    plain lists for turning results back into something readable. For
+    multigraphs the original edge is the (u, v, key) triple, otherwise (u, v).
+    dominated_pruned tells whether dominated parallel edges were left out,
+    see compile_graph.
+    """
+
+    def __init__(self, nodes, indptr, target, time, distance, is_lift, lift,
+                 edge_names, edge_grades, edge_keys, lift_names, dominated_pruned=False):
+        self.nodes = nodes
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.indptr = indptr
+        self.target = target
+        self.time = time
+        self.distance = distance
+        self.is_lift = is_lift
+        self.lift = lift
+        self.edge_names = edge_names
+        self.edge_grades = edge_grades
+        self.edge_keys = edge_keys
+        self.lift_names = lift_names
+        self.dominated_pruned = dominated_pruned
+
+    def __reduce_ex__(self, protocol):
+        # A graph mapped from a snapshot is sent to other processes as its
+        # file name, so they map the same pages instead of copying arrays
+        snapshot_path = getattr(self, "snapshot_path", None)
+        if snapshot_path is not None:
+            return _open_snapshot, (snapshot_path,)
+        return super().__reduce_ex__(protocol)
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.target)
+
+    def out_edges(self, node_id):
+        """Return the ids of the edges leaving node_id."""
+        return range(self.indptr[node_id], self.indptr[node_id + 1])
+
+    def source(self):
+        """Return the source node id of every edge as a typed array."""
+        source = array("i")
+        for node_id in range(self.num_nodes):
+            source.extend([node_id] * (self.indptr[node_id + 1] - self.indptr[node_id]))
+        return source
+
+    def edge_path_names(self, edge_ids):
+        """Translate a list of edge ids into edge names."""
+        return [self.edge_names[e] for e in edge_ids]
+
+    def subgraph(self, node_ids):
+        """
+        Return the compiled graph induced by node_ids.
+
+        Node and edge ids are renumbered; names, grades, edge keys and lift
+        ids carry over, so lift repeat rules behave exactly as before.
+        """
+        keep = sorted(set(node_ids))
+        new_id = {old: new for new, old in enumerate(keep)}
+
+        indptr = array("i", [0])
+        target, time, distance, is_lift, lift = array("i"), array("d"), array("d"), array("B"), array("i")
+        edge_names, edge_grades, edge_keys = [], [], []
+        for old in keep:
+            for e in self.out_edges(old):
+                if self.target[e] not in new_id:
+                    continue
+                target.append(new_id[self.target[e]])
+                time.append(self.time[e])
+                distance.append(self.distance[e])
+                is_lift.append(self.is_lift[e])
+                lift.append(self.lift[e])
+                edge_names.append(self.edge_names[e])
+                edge_grades.append(self.edge_grades[e])
+                edge_keys.append(self.edge_keys[e])
+            indptr.append(len(target))
+
+        return CompiledGraph([self.nodes[old] for old in keep], indptr, target, time, distance,
+                             is_lift, lift, edge_names, edge_grades, edge_keys, self.lift_names,
+                             self.dominated_pruned)
+
+def _open_snapshot(path):
+    from snapshot import load_snapshot
+    return load_snapshot(path)
+
+def shortest_times(cg, source, max_time=float("inf")):
+    """
+    Minimum time in minutes from source to every node, ignoring lift repeats.
+
+    Since the lift repeat rule only removes itineraries, these times are
+    lower bounds on what any valid itinerary needs.
+
+    Args:
+        cg: CompiledGraph
+        source: Source node id
+        max_time: Stop exploring beyond this many minutes
+    Returns:
+        dict mapping node id to minimum time, for nodes within max_time
+    """
+    times = {source: 0}
+    heap = [(0, source)]
+    while heap:
+        time_used, node = heapq.heappop(heap)
+        if time_used > times[node]:
+            continue
+        for e in cg.out_edges(node):
+            next_time = time_used + cg.time[e]
+            next_node = cg.target[e]
+            if next_time <= max_time + 1e-9 and next_time < times.get(next_node, float("inf")):
+                times[next_node] = next_time
+                heapq.heappush(heap, (next_time, next_node))
+    return times
+
+def compile_graph(G, prune_dominated=True):
+    """
+    Compile a NetworkX resort graph into a CompiledGraph.
+
+    Parallel edges of a MultiDiGraph are kept as separate edges. With
+    prune_dominated, a parallel edge is dropped when another edge between the
+    same nodes is at least as fast and at least as long and leaves the lift
+    state the same way (both slopes, or both the same lift). Such an edge can
+    never be part of a better itinerary.
+
+    Args:
+        G: NetworkX graph or multigraph containing the ski resort, with
+           "time", "distance" and "name" attributes on every edge ("grade"
+           on slopes)
+        prune_dominated: Drop dominated parallel edges
+    Returns:
+        CompiledGraph with the same nodes and the remaining edges
+    """
+    nodes = list(G.nodes())
+    node_index = {node: i for i, node in enumerate(nodes)}
+
+    indptr = array("i", [0])
+    target = array("i")
+    time = array("d")
+    distance = array("d")
+    is_lift = array("B")
+    lift = array("i")
+    edge_names = []
+    edge_grades = []
+    edge_keys = []
+    lift_ids = {}
+
+    for node in nodes:
+        if G.is_multigraph():
+            out_edges = [((u, v, k), data) for u, v, k, data in G.out_edges(node, keys=True, data=True)]
+        else:
+            out_edges = [((u, v), data) for u, v, data in G.out_edges(node, data=True)]
+        if prune_dominated:
+            out_edges = _without_dominated(out_edges)
+
+        for key, data in out_edges:
+            v = key[1]
+            target.append(node_index[v])
+            time.append(data["time"])
+            distance.append(data["distance"])
+            edge_names.append(data["name"])
+            edge_grades.append(data.get("grade"))
+            edge_keys.append(key)
+            if data["distance"] == 0:
+                is_lift.append(1)
+                lift.append(lift_ids.setdefault(data["name"], len(lift_ids)))
+            else:
+                is_lift.append(0)
+                lift.append(-1)
+        indptr.append(len(target))
+
+    return CompiledGraph(nodes, indptr, target, time, distance, is_lift, lift,
+                         edge_names, edge_grades, edge_keys, list(lift_ids), prune_dominated)
+
+def _without_dominated(out_edges):
+    """Remove parallel edges that another edge to the same node dominates."""
+    kept = []
+    for i, (key, data) in enumerate(out_edges):
+        dominated = False
+        for j, (other_key, other) in enumerate(out_edges):
+            if i == j or other_key[1] != key[1]:
+                continue
+            # Only edges with the same effect on the lift state are comparable
+            if (data["distance"] == 0) != (other["distance"] == 0):
+                continue
+            if data["distance"] == 0 and data["name"] != other["name"]:
+                continue
+            if other["time"] <= data["time"] and other["distance"] >= data["distance"]:
+                # Of two identical edges keep the first one
+                if other["time"] < data["time"] or other["distance"] > data["distance"] or j < i:
+                    dominated = True
+                    break
+        if not dominated:
+            kept.append((key, data))
+    return kept
@@ -0,0 +1,273 @@
+from collections import namedtuple
+import heapq
+import math
+
+import numpy as np
+
+from bounds import RATIO_TOLERANCE, _has_positive_cycle, _max_cycle_ratio, get_bounds, state_graph
+from optimizer import MAX_LIFT_REPEATS, LabelSearch
+
+# Minutes of the day solved exactly around the repeated cycle
+DEFAULT_WINDOW = 240
+
+# A repeatable loop in the (node, last lift, lift repeat count) state graph.
+# states[i] is the state before edges[i]; the loop ends where it started
+Cycle = namedtuple("Cycle", ["states", "edges", "time", "distance"])
+
+# Result of long_horizon_search. upper_bound bounds the distance of any
+# itinerary (capped at the goal), gap is upper_bound - distance, repeats is
+# how often the cycle was inserted
+LongHorizonResult = namedtuple(
+    "LongHorizonResult", ["distance", "path", "upper_bound", "gap", "repeats", "cycle"]
+)
+
+def best_cycle(cg, start):
+    """
+    Find the loop with the best km per minute that can be reached from start.
+
+    Loops live in the (node, last lift, lift repeat count) state graph, so a
+    loop that would use a lift more than MAX_LIFT_REPEATS times in a row is
+    not a loop there, and repeating a loop found here is always allowed.
+    The ratio is found by bisection as in bounds.compute_bounds and is
+    within RATIO_TOLERANCE of the best.
+
+    Args:
+        cg: CompiledGraph
+        start: Start node id
+    Returns:
+        Cycle, or None if no loop covers any distance
+    """
+    state_index, source, target, time, distance, edge = state_graph(cg, roots=[(start, -1, 0)])
+    n = len(state_index)
+    if not len(source) or not _has_positive_cycle(source, target, distance, n):
+        return None
+
+    fastest = float((distance / np.maximum(time, 1e-12)).max())
+    high = _max_cycle_ratio(source, target, time, distance, n, fastest)
+    transitions = _positive_cycle(source, target, distance - high * (1 - RATIO_TOLERANCE) * time, n)
+    states = list(state_index)
+    return Cycle([states[source[t]] for t in transitions], [int(edge[t]) for t in transitions],
+                 float(time[transitions].sum()), float(distance[transitions].sum()))
+
+def long_horizon_search(cg, start, time_limit, distance_goal=float("inf"), window=DEFAULT_WINDOW,
+                        end=None):
+    """
+    Plan a long day as a prefix, a repeated best loop and a suffix.
+
+    Long optimal itineraries mostly repeat the loop with the best km per
+    minute. Only window minutes (plus less than one loop) are searched
+    exactly, and the loop from best_cycle fills the rest of the time, so
+    the run time hardly depends on time_limit. Two ways of fitting the
+    loop in are tried: inserting it where the exact plan for the window
+    passes through the loop, and walking to the loop as fast as possible,
+    then repeating it and ending with an exact plan for the time left.
+
+    The answer is certified by the upper bound of bounds.DistanceBounds,
+    the best loop rate times time_limit plus the most any itinerary can gain
+    over that rate, so the gap to the optimum is known. Time limits that
+    fit in the window are solved exactly.
+
+    If the plan reaches distance_goal, it is cut at the goal, and when that
+    happens within the window plus a loop, the exact search takes over to
+    find the quickest itinerary to the goal. With an end node the exact
+    parts finish at end, and plans reaching the goal are cut at their
+    first visit to end once the goal is reached.
+
+    Args:
+        cg: CompiledGraph
+        start: Starting node name
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        window: Minutes solved exactly
+        end: Node name the itinerary has to finish at, or None
+    Returns:
+        LongHorizonResult with compiled edge ids as path
+    """
+    if not cg.num_nodes or start not in cg.node_index or time_limit <= 0:
+        return LongHorizonResult(0, [], 0, 0, 0, None)
+    if end is not None and end not in cg.node_index:
+        return LongHorizonResult(0, [], 0, 0, 0, None)
+    start_id = cg.node_index[start]
+    end_id = None if end is None else cg.node_index[end]
+    bounds = get_bounds(cg)
+    upper_bound = min(bounds.bound(start_id, -1, 0, time_limit), distance_goal)
+
+    cycle = best_cycle(cg, start_id)
+    if cycle is None or time_limit <= window + cycle.time:
+        return _exact(cg, start_id, time_limit, distance_goal, bounds, cycle, end_id)
+
+    candidates = [c for c in (
+        _insert_into_window_plan(cg, start_id, time_limit, bounds, cycle, window, end_id),
+        _walk_to_cycle(cg, start_id, time_limit, bounds, cycle, window, end_id)
+    ) if c is not None]
+    if not candidates:
+        return _exact(cg, start_id, time_limit, distance_goal, bounds, cycle, end_id)
+    distance, path, repeats = max(candidates, key=lambda c: c[0])
+
+    if distance >= distance_goal:
+        cut = _cut_at_goal(cg, path, distance_goal, end_id)
+        if cut is None:
+            return _exact(cg, start_id, time_limit, distance_goal, bounds, cycle, end_id,
+                          seed=path)
+        path, distance, time_used = cut
+        if time_used <= window + cycle.time:
+            return _exact(cg, start_id, time_limit, distance_goal, bounds, cycle, end_id,
+                          seed=path)
+        return LongHorizonResult(distance, path, distance, 0, repeats, cycle)
+    return LongHorizonResult(distance, path, upper_bound, max(upper_bound - distance, 0),
+                             repeats, cycle)
+
+def _exact(cg, start_id, time_limit, distance_goal, bounds, cycle, end_id, seed=None):
+    search = LabelSearch(cg, start_id, time_limit, distance_goal, bounds,
+                         seed_paths=[seed] if seed else (), end=end_id)
+    search.run()
+    if search.best_distance < 0:
+        return LongHorizonResult(0, [], 0, 0, 0, cycle)
+    return LongHorizonResult(search.best_distance, search.path(), search.best_distance, 0, 0, cycle)
+
+def _insert_into_window_plan(cg, start_id, time_limit, bounds, cycle, window, end_id):
+    """Exact plan for the window plus spare time, with the loop inserted where it passes."""
+    repeats = int((time_limit - window) // cycle.time)
+    search = LabelSearch(cg, start_id, time_limit - repeats * cycle.time, float("inf"), bounds,
+                         end=end_id)
+    search.run()
+    if search.best_distance < 0:
+        return None
+    path = search.path()
+
+    position = {state: i for i, state in enumerate(cycle.states)}
+    state = (start_id, -1, 0)
+    for i, e in enumerate(path + [None]):
+        if state in position:
+            loop = cycle.edges[position[state]:] + cycle.edges[:position[state]]
+            return (search.best_distance + repeats * cycle.distance,
+                    path[:i] + loop * repeats + path[i:], repeats)
+        if e is not None:
+            state = _next_state(cg, state, e)
+    return None
+
+def _walk_to_cycle(cg, start_id, time_limit, bounds, cycle, window, end_id):
+    """Quickest way onto the loop, the loop as often as fits, then an exact ending."""
+    prefix, prefix_time, state = _quickest_route(cg, (start_id, -1, 0), set(cycle.states))
+    if prefix is None or prefix_time > time_limit:
+        return None
+    repeats = max(0, int((time_limit - prefix_time - window) // cycle.time))
+    position = cycle.states.index(state)
+    loop = cycle.edges[position:] + cycle.edges[:position]
+
+    time_left = time_limit - prefix_time - repeats * cycle.time
+    search = LabelSearch(cg, state[0], time_left, float("inf"), bounds, start_lift=state[1:],
+                         end=end_id)
+    search.run()
+    if search.best_distance < 0:
+        return None
+    distance = (sum(cg.distance[e] for e in prefix) + repeats * cycle.distance
+                + search.best_distance)
+    return distance, prefix + loop * repeats + search.path(), repeats
+
+def _quickest_route(cg, state, targets):
+    """Dijkstra over lift states; returns (edge ids, time, state reached) or (None, None, None)."""
+    times = {state: 0}
+    parents = {state: None}
+    heap = [(0, 0, state)]
+    seq = 1
+    while heap:
+        time_used, _, state = heapq.heappop(heap)
+        if time_used > times[state]:
+            continue
+        if state in targets:
+            path = []
+            current = state
+            while parents[current] is not None:
+                current, e = parents[current]
+                path.append(e)
+            path.reverse()
+            return path, time_used, state
+        for e in cg.out_edges(state[0]):
+            next_state = _next_state(cg, state, e)
+            if next_state is None or cg.time[e] == math.inf:
+                continue
+            next_time = time_used + cg.time[e]
+            if next_time < times.get(next_state, math.inf):
+                times[next_state] = next_time
+                parents[next_state] = (state, e)
+                heapq.heappush(heap, (next_time, seq, next_state))
+                seq += 1
+    return None, None, None
+
+def _next_state(cg, state, e):
+    """Lift state after taking edge e, or None if the lift repeat limit forbids it."""
+    _, last_lift, lift_count = state
+    lift = cg.lift[e]
+    if lift < 0:
+        return (cg.target[e], last_lift, lift_count)
+    if lift != last_lift:
+        return (cg.target[e], lift, 1)
+    if lift_count >= MAX_LIFT_REPEATS:
+        return None
+    return (cg.target[e], lift, lift_count + 1)
+
+def _cut_at_goal(cg, path, distance_goal, end_id=None):
+    """
+    Shortest prefix of path reaching distance_goal (and ending at end_id if
+    given), with its distance and time, or None if there is none.
+    """
+    distance = time_used = 0
+    for i, e in enumerate(path):
+        distance += cg.distance[e]
+        time_used += cg.time[e]
+        if distance >= distance_goal and (end_id is None or cg.target[e] == end_id):
+            return path[:i + 1], distance, time_used
+    return None
+
+def _positive_cycle(source, target, weight, n):
+    """
+    Transitions of a cycle with positive total weight, in order.
+
+    Bellman-Ford for longest paths, remembering which transition last
+    improved every state. Once a positive cycle makes the gains grow
+    without bound, these successor choices close into a cycle.
+    """
+    order = np.argsort(source, kind="stable")
+    sorted_source = source[order]
+    starts = np.flatnonzero(np.r_[True, sorted_source[1:] != sorted_source[:-1]])
+    owners = sorted_source[starts]
+    positions = np.arange(len(order))
+
+    gains = np.zeros(n)
+    successor = np.full(n, -1, dtype=np.int64)
+    for round_number in range(1, 4 * n + 2):
+        candidates = (weight + gains[target])[order]
+        best = np.maximum.reduceat(candidates, starts)
+        improved = best > gains[owners] + 1e-12
+        if not improved.any():
+            return None
+        first = np.minimum.reduceat(
+            np.where(candidates == np.repeat(best, np.diff(np.r_[starts, len(order)])),
+                     positions, len(order)), starts)
+        successor[owners[improved]] = order[first[improved]]
+        gains[owners[improved]] = best[improved]
+
+        if round_number % 8 == 0 or round_number > n:
+            cycle = _successor_loop(successor, target, weight, n)
+            if cycle is not None:
+                return cycle
+    return None
+
+def _successor_loop(successor, target, weight, n):
+    """A loop with positive weight among the chosen successor transitions, if any."""
+    next_state = np.where(successor >= 0, target[np.maximum(successor, 0)], -1)
+    jump = next_state
+    for _ in range(int(np.ceil(np.log2(max(n, 2)))) + 1):
+        jump = np.where(jump >= 0, jump[jump], -1)
+    for state in np.unique(jump[jump >= 0]):
+        loop = []
+        current = state
+        while True:
+            loop.append(int(successor[current]))
+            current = next_state[current]
+            if current == state:
+                break
+        if weight[loop].sum() > 0:
+            return loop
+    return None
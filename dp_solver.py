@@ -0,0 +1,188 @@
+import numpy as np
+from optimizer import MAX_LIFT_REPEATS
+
+# Edge times are discretized on this grid (minutes), matching the rounding
+# in load_graph.calculate_slope_time
+TIME_STEP = 0.1
+
+def dp_search(cg, start, time_limit, distance_goal, end=None):
+    """
+    Solve the max-distance problem as a dynamic program over time ticks.
+
+    The table holds, for every tick of TIME_STEP minutes and every reachable
+    (node, last lift, lift repeat count) state, the best distance of an
+    itinerary arriving in that state at exactly that tick. Edges shorter than
+    the shortest edge cannot feed a slice from the same block, so whole
+    blocks of slices are relaxed at once with vectorized NumPy operations.
+
+    Args:
+        cg: CompiledGraph from compile_graph
+        start: Starting node id
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        end: Node id the itinerary has to finish at, or None
+    Returns:
+        (best_distance, edge_ids) where edge_ids lists compiled edge ids
+    """
+    src, dst, ticks, dist, edges, states = _build_transitions(cg, start)
+    if len(src) == 0:
+        return 0, []
+    # States an itinerary may finish in
+    final = np.array([end is None or node == end for node, _, _ in states], dtype=bool)
+
+    table = TickTable(src, dst, ticks, dist, len(states), num_ticks(time_limit))
+    for rows, best in table.blocks():
+        # Slices are in time order, so the first one reaching the goal holds
+        # the quickest itinerary that does
+        reached = np.nonzero((best[:, final] >= distance_goal).any(axis=1))[0]
+        if len(reached):
+            best_tick = int(rows[reached[0]])
+            best_state = int(np.argmax(np.where(final, table.row(best_tick), -np.inf)))
+            break
+    else:
+        best_tick, best_state = table.argmax(final)
+
+    best_distance = float(table.row(best_tick)[best_state])
+    if best_distance <= 0:
+        return 0, []
+    return best_distance, [int(edges[t]) for t in table.transitions_to(best_tick, best_state)]
+
+def num_ticks(time_limit):
+    """Number of whole ticks in time_limit minutes."""
+    return int(np.floor(time_limit / TIME_STEP + 1e-6))
+
+class TickTable:
+    """
+    Best distance of itineraries from state 0 arriving in each state at each tick.
+
+    Transitions are given as parallel arrays of source state, destination
+    state, duration in ticks (at least 1) and distance. Iterating blocks()
+    fills the table in time order; row(tick) is final once its block has
+    been yielded.
+    """
+
+    def __init__(self, src, dst, ticks, dist, num_states, num_ticks):
+        self.num_states = num_states
+        self.num_ticks = num_ticks
+        # Group transitions by destination state so each group can be reduced
+        order = np.argsort(dst, kind="stable")
+        self.order = order
+        self.src, self.dst, self.ticks, self.dist = src[order], dst[order], ticks[order], dist[order]
+        self.targets, self.group_starts = np.unique(self.dst, return_index=True)
+        self.group_sizes = np.diff(np.append(self.group_starts, len(self.dst)))
+
+        # The table starts with `pad` rows of -inf so that looking back past
+        # tick 0 needs no masking; tick t lives in row t + pad
+        self.pad = int(self.ticks.max()) if len(self.ticks) else 0
+        self.table = np.full((self.pad + num_ticks + 1, num_states), -np.inf)
+        self.back = np.full((self.pad + num_ticks + 1, num_states), -1, dtype=np.int32)
+        self.table[self.pad, 0] = 0.0
+
+    def blocks(self):
+        """
+        Relax the table block by block, in time order.
+
+        Yields:
+            (ticks, best) after each block: the ticks of the block and the
+            best distance at each of them for every state
+        """
+        if not len(self.dst):
+            return
+        pad, table, back = self.pad, self.table, self.back
+        positions = np.arange(len(self.dst))
+        lookback = pad - self.ticks
+        block = int(self.ticks.min())
+        for first in range(1, self.num_ticks + 1, block):
+            rows = np.arange(first, min(first + block, self.num_ticks + 1))
+            values = table[rows[:, None] + lookback, self.src] + self.dist
+
+            group_best = np.maximum.reduceat(values, self.group_starts, axis=1)
+            is_best = values == np.repeat(group_best, self.group_sizes, axis=1)
+            choice = np.minimum.reduceat(np.where(is_best, positions, len(self.dst)),
+                                         self.group_starts, axis=1)
+
+            table[rows[:, None] + pad, self.targets] = group_best
+            back[rows[:, None] + pad, self.targets] = np.where(np.isfinite(group_best), choice, -1)
+            yield rows, table[rows + pad]
+
+    def fill(self):
+        """Relax the whole table."""
+        for _ in self.blocks():
+            pass
+
+    def row(self, tick):
+        """Best distance of every state at tick."""
+        return self.table[tick + self.pad]
+
+    def argmax(self, final=None):
+        """(tick, state) of the best distance over the filled table, among final states."""
+        table = self.table[self.pad:]
+        if final is not None:
+            table = np.where(final, table, -np.inf)
+        return divmod(int(np.argmax(table)), self.num_states)
+
+    def transitions_to(self, tick, state):
+        """Indices into the original transition arrays of the best itinerary to state at tick."""
+        path = []
+        row = tick + self.pad
+        while self.back[row, state] >= 0:
+            transition = self.back[row, state]
+            path.append(int(self.order[transition]))
+            row -= self.ticks[transition]
+            state = self.src[transition]
+        path.reverse()
+        return path
+
+def _build_transitions(cg, start, last_lift=-1, lift_count=0):
+    """
+    Enumerate lift states reachable from start and the transitions between them.
+
+    State 0 is (start, last_lift, lift_count), by default with no lift yet.
+    Returns parallel arrays of source state, destination state, duration in
+    ticks, distance and compiled edge id, and the list of (node, last lift,
+    lift repeat count) of every state.
+    """
+    state_ids = {(start, last_lift, lift_count): 0}
+    pending = [(start, last_lift, lift_count)]
+    src, dst, edges = [], [], []
+
+    while pending:
+        state = pending.pop()
+        node, last_lift, lift_count = state
+        for e in cg.out_edges(node):
+            lift = cg.lift[e]
+            if lift >= 0:
+                if lift == last_lift:
+                    if lift_count >= MAX_LIFT_REPEATS:
+                        continue
+                    next_state = (cg.target[e], lift, lift_count + 1)
+                else:
+                    next_state = (cg.target[e], lift, 1)
+            else:
+                next_state = (cg.target[e], last_lift, lift_count)
+
+            if next_state not in state_ids:
+                state_ids[next_state] = len(state_ids)
+                pending.append(next_state)
+
+            src.append(state_ids[state])
+            dst.append(state_ids[next_state])
+            edges.append(e)
+
+    edges = np.array(edges, dtype=np.int64)
+    edge_distance = np.frombuffer(cg.distance, dtype=np.float64)
+    return (np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+            _to_ticks(cg, edges), edge_distance[edges], edges, list(state_ids))
+
+def _to_ticks(cg, edges):
+    """Convert the times of edges to positive numbers of ticks."""
+    times = np.frombuffer(cg.time, dtype=np.float64)[edges]
+    ticks = np.rint(times / TIME_STEP).astype(np.int64)
+    bad = (ticks <= 0) | (np.abs(ticks * TIME_STEP - times) > 1e-6)
+    if bad.any():
+        e = int(edges[np.argmax(bad)])
+        raise ValueError(
+            f"Edge {cg.edge_names[e]!r} has time {cg.time[e]}, "
+            f"which is not a positive multiple of {TIME_STEP} minutes"
+        )
+    return ticks
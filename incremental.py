@@ -0,0 +1,606 @@
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+import heapq
+import time
+
+from compiled_graph import CompiledGraph, compile_graph
+from optimizer import BOUND_EPSILON, MAX_LIFT_REPEATS, TIME_EPSILON, LabelSearch, _build_path
+
+# Number of recent plans kept as warm starts for new queries
+RECENT_PLANS = 8
+
+# Number of searches kept for repair after edge changes; each holds all its
+# labels and the labels it dropped
+KEPT_SEARCHES = 8
+
+class IncrementalPlanner:
+    """
+    Planner for a resort that changes during the day.
+
+    The resort is compiled once and edge changes patch the compiled arrays in
+    place: a closed edge gets an infinite time, which every solver skips,
+    and time changes overwrite the edge's time. All parallel edges are kept
+    when compiling, so closing one slope makes a parallel one usable again.
+
+    Work is only redone where a change can make a difference:
+        - Distance bounds for branch and bound are recomputed on the next
+          search after any change, which costs far less than the search
+          and keeps its pruning and greedy seed as strong as a cold solve's.
+        - Plans are memoized. Closing or slowing down an edge invalidates
+          only the plans that use it, because every other itinerary can only
+          have become worse. Any speed-up invalidates all plans.
+        - The searches of recent queries are kept as RepairableSearch. When
+          a query is asked again after edges closed or got slower, only the
+          labels that cross a changed edge are thrown away, the labels they
+          shadowed are brought back, and the search continues from there.
+        - New queries, such as after a position update, are seeded with the
+          rest of recent plans from the new start, cut short where they
+          became invalid, so branch and bound starts from a near-optimal
+          incumbent.
+    Plans are exact, as with find_max_distance_path(method="labels").
+    """
+
+    def __init__(self, G):
+        """
+        Args:
+            G: NetworkX graph containing the ski resort, or a CompiledGraph
+               compiled with prune_dominated=False
+        Raises:
+            ValueError for a CompiledGraph without its dominated parallel edges
+        """
+        if isinstance(G, CompiledGraph):
+            if G.dominated_pruned:
+                raise ValueError("IncrementalPlanner needs every parallel edge, "
+                                 "compile the graph with prune_dominated=False")
+            # Own writable copies of the arrays that get patched
+            cg = CompiledGraph(G.nodes, G.indptr, G.target, array("d", G.time), G.distance,
+                               G.is_lift, G.lift, G.edge_names, G.edge_grades, G.edge_keys,
+                               G.lift_names)
+        else:
+            cg = compile_graph(G, prune_dominated=False)
+        self.cg = cg
+        self.original_time = array("d", cg.time)
+        self.edge_ids = {key: e for e, key in enumerate(cg.edge_keys)}
+
+        self._bounds = None
+        self._plans = {}
+        self._plans_using_edge = {}
+        self._recent = deque(maxlen=RECENT_PLANS)
+        self._searches = OrderedDict()
+
+        self.bounds_computations = 0
+        self.cache_hits = 0
+        self.searches = 0
+        self.repairs = 0
+
+    def close_edge(self, edge):
+        """
+        Close an edge, or every edge with a name such as a lift.
+
+        Args:
+            edge: Graph edge, (u, v, key) for multigraphs, or an edge name
+        Returns:
+            Number of edges that were open and are now closed
+        """
+        closed = 0
+        for e in self._find(edge):
+            if self.cg.time[e] != float("inf"):
+                self._set_time(e, float("inf"))
+                closed += 1
+        return closed
+
+    def reopen_edge(self, edge):
+        """Reopen an edge, or every edge with a name, at its original time."""
+        for e in self._find(edge):
+            self._set_time(e, self.original_time[e])
+
+    def set_edge_time(self, edge, minutes):
+        """Change the time of an edge, or of every edge with a name, to minutes."""
+        if not minutes > 0:
+            raise ValueError("Edge times must be positive")
+        for e in self._find(edge):
+            self._set_time(e, minutes)
+
+    def plan(self, start, time_left, distance_goal, edge_keys=False, stats=None):
+        """
+        Best itinerary from start in the time left, on the resort as it is now.
+
+        Args:
+            start: Current position
+            time_left: Available time in minutes
+            distance_goal: Distance in km after which an itinerary is good enough
+            edge_keys: Return graph edges instead of edge names
+            stats: SearchStats to fill in with the work of this call, or None
+        Returns:
+            (best_distance, best_path) as find_max_distance_path
+        """
+        cg = self.cg
+        key = (start, time_left, distance_goal)
+        if stats is not None:
+            stats.method = "incremental"
+        if key in self._plans:
+            self.cache_hits += 1
+            distance, edge_ids = self._plans[key]
+        else:
+            distance, edge_ids = self._search(key, stats)
+            self._plans[key] = distance, edge_ids
+            for e in set(edge_ids):
+                self._plans_using_edge.setdefault(e, set()).add(key)
+            if edge_ids:
+                self._recent.append((cg.node_index[start], edge_ids))
+
+        if edge_keys:
+            return distance, [cg.edge_keys[e] for e in edge_ids]
+        return distance, cg.edge_path_names(edge_ids)
+
+    def _search(self, key, stats):
+        cg = self.cg
+        start, time_left, distance_goal = key
+        if start not in cg.node_index or time_left <= 0:
+            return 0, []
+        if self._bounds is None:
+            from bounds import compute_bounds
+            self._bounds = compute_bounds(cg)
+            self.bounds_computations += 1
+
+        search = self._searches.get(key)
+        if search is not None:
+            self._searches.move_to_end(key)
+            search.repair(self._bounds, self._suffixes_from)
+            self.repairs += 1
+        else:
+            start_id = cg.node_index[start]
+            search = RepairableSearch(cg, start_id, time_left, distance_goal, self._bounds,
+                                      self._suffixes_from(start_id))
+            self._searches[key] = search
+            if len(self._searches) > KEPT_SEARCHES:
+                self._searches.popitem(last=False)
+        search.run(stats)
+        self.searches += 1
+        return search.result()
+
+    def _suffixes_from(self, start_id):
+        """Rest of every recent plan from each point where it passes start_id."""
+        suffixes = []
+        for plan_start, edge_ids in self._recent:
+            node = plan_start
+            for i, e in enumerate(edge_ids):
+                if node == start_id:
+                    suffixes.append(edge_ids[i:])
+                node = self.cg.target[e]
+        return suffixes
+
+    def _set_time(self, e, minutes):
+        old = self.cg.time[e]
+        if minutes == old:
+            return
+        self.cg.time[e] = minutes
+        self._bounds = None
+        if minutes < old:
+            # Better itineraries may exist now, anywhere
+            self._plans.clear()
+            self._plans_using_edge.clear()
+            self._searches.clear()
+        else:
+            for key in self._plans_using_edge.pop(e, ()):
+                self._plans.pop(key, None)
+            for search in self._searches.values():
+                search.changed_edges.add(e)
+
+    def _find(self, edge):
+        """Compiled edge ids of a graph edge or of all edges with a name."""
+        if edge in self.edge_ids:
+            return [self.edge_ids[edge]]
+        found = [e for e, name in enumerate(self.cg.edge_names) if name == edge]
+        if not found:
+            raise KeyError(f"No edge {edge!r}")
+        return found
+
+class RepairableSearch:
+    """
+    Label-setting search for one query that survives edges closing or
+    getting slower.
+
+    The search is optimizer.LabelSearch, over (node, last lift, lift repeat
+    count) states with the same dominance, branch and bound and greedy
+    seed, but it also keeps every label it drops, with the reason:
+        - A label dominated by an accepted one is kept with that label.
+        - A label pruned by branch and bound is kept with its bound.
+        - A label beyond the horizon set by a seed that reached the goal is
+          kept until the horizon moves.
+    Labels dropped by the time limit or the lift repeat rule stay dropped,
+    since closures and slowdowns only take time away.
+
+    After edges close or get slower, repair() throws away the accepted
+    labels that cross one of them and everything built on those. It then
+    queues again the dropped labels that no longer have a reason to be
+    dropped: the labels shadowed by a thrown-away label, the pruned labels
+    whose bound reaches the new incumbent, and the labels within a new
+    horizon. It also queues again the slower edges from the accepted
+    labels they leave. run() then continues. Queued labels can now be older
+    than accepted ones, so each state keeps a staircase of its accepted
+    labels by time used, and a label is only dominated by a label at most
+    as old. A later label that a revived one dominates stays accepted,
+    which costs a little work but never a better itinerary.
+    """
+
+    def __init__(self, cg, start, time_limit, distance_goal, bounds, seed_paths=()):
+        """
+        Args:
+            cg: CompiledGraph, whose edge times may change between runs
+            start: Start node id
+            time_limit: Available time in minutes
+            distance_goal: Distance in km after which an itinerary is good enough
+            bounds: bounds.DistanceBounds, admissible for every later state
+                of the graph
+            seed_paths: Edge ids of candidate itineraries for the seed
+        """
+        self.cg = cg
+        self.start = start
+        self.time_limit = time_limit
+        self.distance_goal = distance_goal
+        self.bounds = bounds
+        # Edges that closed or got slower since the last run
+        self.changed_edges = set()
+
+        # Accepted labels: parent label, edge id, time used, distance, state
+        # and whether they are still valid
+        self.parents, self.edges, self.times, self.distances, self.states = [], [], [], [], []
+        self.valid = bytearray()
+        # state -> labels accepted at it
+        self.labels_at = {}
+        # state -> [times, distances, labels], the valid labels no older
+        # label at the state covers, in order of time used
+        self.stairs = {}
+        # Dropped labels, as heap entries: (time_used, -distance, seq, node,
+        # last_lift, lift_count, parent label, edge id)
+        self.shadowed = {}
+        self.pruned = []
+        self.beyond_horizon = []
+        self.heap = [(0, 0, 0, start, -1, 0, -1, -1)]
+        self.seq = 1
+        self.pushes = 0
+
+        # Incumbents: the longest valid label, the quickest valid label
+        # reaching the goal as (time used, -distance, label)
+        self.best_distance = 0
+        self.best_label = -1
+        self.goal = None
+
+        self.expansions = 0
+        self.pops = 0
+        self.dominated = 0
+        self.pruned_count = 0
+        self._seed(seed_paths)
+
+    def run(self, stats=None):
+        """Expand labels until the search is complete; stats get this run's counters."""
+        cg = self.cg
+        indptr, target, edge_time, edge_distance, edge_lift = (
+            cg.indptr, cg.target, cg.time, cg.distance, cg.lift
+        )
+        heap, shadowed, pruned, beyond_horizon = (
+            self.heap, self.shadowed, self.pruned, self.beyond_horizon
+        )
+        time_limit, horizon, distance_goal = self.time_limit, self.horizon, self.distance_goal
+        state_index, rate, potential, fastest = (
+            self.bounds.state_index, self.bounds.rate, self.bounds.potential, self.bounds.fastest
+        )
+        stairs = self.stairs
+        prune_below = self._prune_below()
+        start_counts = (self.pops, self.expansions, self.dominated, self.pruned_count, self.pushes)
+        pops, expansions, dominated, pruned_count, pushes = start_counts
+        seq = self.seq
+        t0 = time.perf_counter()
+
+        while heap:
+            entry = heap[0]
+            # Nothing quicker than the goal label is left
+            if self.goal is not None and (entry[0], entry[1]) >= self.goal[:2]:
+                break
+            heapq.heappop(heap)
+            pops += 1
+            time_used, neg_distance, _, node, last_lift, lift_count, _, _ = entry
+            distance = -neg_distance
+
+            label = _dominator(stairs, node, last_lift, lift_count, time_used, distance)
+            if label >= 0:
+                shadowed.setdefault(label, []).append(entry)
+                dominated += 1
+                continue
+            time_left = horizon - time_used
+            state = state_index[(node, last_lift, lift_count)]
+            bound = rate[state] * time_left + potential[state]
+            if fastest * time_left < bound:
+                bound = fastest * time_left
+            if distance + bound < prune_below:
+                pruned.append((distance + bound, entry))
+                pruned_count += 1
+                continue
+
+            label = self._accept(entry)
+            expansions += 1
+            if distance >= distance_goal:
+                # Labels come out in time order except for revived ones, so
+                # keep the quickest, and do not extend it
+                if self.goal is None or (time_used, neg_distance) < self.goal[:2]:
+                    self.goal = (time_used, neg_distance, label)
+                continue
+            if distance > self.best_distance:
+                self.best_distance = distance
+                self.best_label = label
+                prune_below = self._prune_below()
+
+            time_left = time_limit - time_used
+            for e in range(indptr[node], indptr[node + 1]):
+                if edge_time[e] > time_left + TIME_EPSILON:
+                    continue
+                lift = edge_lift[e]
+                if lift >= 0:
+                    if lift == last_lift:
+                        if lift_count >= MAX_LIFT_REPEATS:
+                            continue
+                        new_lift_count = lift_count + 1
+                    else:
+                        new_lift_count = 1
+                    new_last_lift = lift
+                else:
+                    new_lift_count = lift_count
+                    new_last_lift = last_lift
+
+                next_node = target[e]
+                new_time = time_used + edge_time[e]
+                new_distance = distance + edge_distance[e]
+                child = (new_time, -new_distance, seq, next_node, new_last_lift, new_lift_count,
+                         label, e)
+                seq += 1
+                if new_time > horizon + TIME_EPSILON:
+                    beyond_horizon.append(child)
+                    continue
+                other = _dominator(stairs, next_node, new_last_lift, new_lift_count, new_time,
+                                   new_distance)
+                if other >= 0:
+                    shadowed.setdefault(other, []).append(child)
+                    dominated += 1
+                    continue
+                new_time_left = horizon - new_time
+                state = state_index[(next_node, new_last_lift, new_lift_count)]
+                bound = rate[state] * new_time_left + potential[state]
+                if fastest * new_time_left < bound:
+                    bound = fastest * new_time_left
+                if new_distance + bound < prune_below:
+                    pruned.append((new_distance + bound, child))
+                    pruned_count += 1
+                    continue
+                heapq.heappush(heap, child)
+                pushes += 1
+
+        self.pops, self.expansions, self.dominated, self.pruned_count, self.pushes = (
+            pops, expansions, dominated, pruned_count, pushes
+        )
+        self.seq = seq
+        if stats is not None:
+            stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - t0
+            stats.pops += pops - start_counts[0]
+            stats.expansions += expansions - start_counts[1]
+            stats.dominated += dominated - start_counts[2]
+            stats.bound_pruned += pruned_count - start_counts[3]
+            stats.pushes += pushes - start_counts[4]
+
+    def result(self):
+        """(distance, edge ids) of the best itinerary, as find_max_distance_path."""
+        if self.seed_distance >= self.distance_goal and (
+                self.goal is None or self.seed_time < self.goal[0]):
+            return self.seed_distance, list(self.seed_path)
+        if self.goal is not None:
+            return -self.goal[1], _build_path(self.parents, self.edges, self.goal[2])
+        if self.seed_distance >= self.best_distance:
+            return self.seed_distance, list(self.seed_path)
+        return self.best_distance, _build_path(self.parents, self.edges, self.best_label)
+
+    def repair(self, bounds=None, seed_paths_from=None):
+        """
+        Bring the search up to date with changed_edges, see the class docstring.
+
+        Args:
+            bounds: bounds.DistanceBounds of the graph as it is now, by
+                default the current ones. Pruned labels are scored again
+                with them, so they need not be tighter than the old ones.
+            seed_paths_from: Function from the start node id to candidate
+                itineraries, for a new seed if the current one is now invalid
+        """
+        changed = self.changed_edges
+        if not changed:
+            return
+        self.changed_edges = set()
+        rescore = bounds is not None and bounds is not self.bounds
+        if rescore:
+            self.bounds = bounds
+        parents, edges, valid = self.parents, self.edges, self.valid
+
+        # Parents are accepted before their children, so one pass in label
+        # order finds every label built on a changed edge
+        thrown_away = []
+        for label in range(1, len(parents)):
+            if valid[label] and (edges[label] in changed or not valid[parents[label]]):
+                valid[label] = 0
+                thrown_away.append(label)
+        revived = []
+        for label in thrown_away:
+            revived.extend(self.shadowed.pop(label, ()))
+        for state in {self.states[label] for label in thrown_away}:
+            self._rebuild_stair(state)
+
+        if self.goal is not None and not valid[self.goal[2]]:
+            self.goal = None
+        self.best_distance, self.best_label = 0, -1
+        for label in range(len(parents)):
+            if not valid[label]:
+                continue
+            distance = self.distances[label]
+            if distance >= self.distance_goal:
+                key = (self.times[label], -distance, label)
+                if self.goal is None or key < self.goal:
+                    self.goal = key
+            elif distance > self.best_distance:
+                self.best_distance, self.best_label = distance, label
+
+        old_horizon = self.horizon
+        if any(e in changed for e in self.seed_path):
+            self._seed(() if seed_paths_from is None else seed_paths_from(self.start))
+
+        # Slower edges are queued again from every label they leave
+        cg = self.cg
+        source = {}
+        for e in changed:
+            if cg.time[e] != float("inf"):
+                source.setdefault(self._source(e), []).append(e)
+        if source:
+            for label in range(len(parents)):
+                state = self.states[label]
+                if valid[label] and state[0] in source and \
+                        self.distances[label] < self.distance_goal:
+                    for e in source[state[0]]:
+                        child = self._child(label, e)
+                        if child is not None:
+                            revived.append(child)
+
+        heap = [entry for entry in self.heap if self._still_valid(entry)]
+        beyond_horizon = [entry for entry in self.beyond_horizon if self._still_valid(entry)]
+        if self.horizon < old_horizon:
+            beyond_horizon.extend(entry for entry in heap if entry[0] > self.horizon + TIME_EPSILON)
+            heap = [entry for entry in heap if entry[0] <= self.horizon + TIME_EPSILON]
+        elif self.horizon > old_horizon:
+            revived.extend(entry for entry in beyond_horizon
+                           if entry[0] <= self.horizon + TIME_EPSILON)
+            beyond_horizon = [entry for entry in beyond_horizon
+                              if entry[0] > self.horizon + TIME_EPSILON]
+        self.beyond_horizon = beyond_horizon
+
+        # Pruned labels whose bound reaches the new incumbent
+        prune_below = self._prune_below()
+        pruned = []
+        for key, entry in self.pruned:
+            if not self._still_valid(entry):
+                continue
+            if rescore or self.horizon != old_horizon:
+                key = -entry[1] + self.bounds.bound(entry[3], entry[4], entry[5],
+                                                    self.horizon - entry[0])
+            if key < prune_below:
+                pruned.append((key, entry))
+            else:
+                revived.append(entry)
+        self.pruned = pruned
+
+        heap.extend(entry for entry in revived if self._still_valid(entry))
+        heapq.heapify(heap)
+        self.heap = heap
+
+    def _seed(self, seed_paths):
+        """Greedy seed itinerary as in LabelSearch, and the horizon it sets."""
+        seed = LabelSearch(self.cg, self.start, self.time_limit, self.distance_goal, self.bounds,
+                           seed_paths=seed_paths)
+        self.seed_distance, self.seed_path, self.horizon = (
+            seed.seed_distance, seed.seed_path, seed.horizon
+        )
+        self.seed_time = sum(self.cg.time[e] for e in self.seed_path)
+
+    def _prune_below(self):
+        """Distance bound under which a label can neither beat the incumbent nor reach the goal."""
+        incumbent = max(self.best_distance, self.seed_distance)
+        return min(incumbent + BOUND_EPSILON, self.distance_goal - BOUND_EPSILON)
+
+    def _accept(self, entry):
+        """Store a label as accepted and return its index."""
+        time_used, neg_distance, _, node, last_lift, lift_count, parent, edge = entry
+        state = (node, last_lift, lift_count)
+        label = len(self.parents)
+        self.parents.append(parent)
+        self.edges.append(edge)
+        self.times.append(time_used)
+        self.distances.append(-neg_distance)
+        self.states.append(state)
+        self.valid.append(1)
+        self.labels_at.setdefault(state, []).append(label)
+
+        stair = self.stairs.get(state)
+        if stair is None:
+            self.stairs[state] = [[time_used], [-neg_distance], [label]]
+            return label
+        times, distances, labels = stair
+        if times[-1] <= time_used:
+            times.append(time_used)
+            distances.append(-neg_distance)
+            labels.append(label)
+        else:
+            # A revived label: replace the younger labels it covers
+            i = j = bisect_right(times, time_used)
+            while j < len(times) and distances[j] <= -neg_distance:
+                j += 1
+            times[i:j], distances[i:j], labels[i:j] = [time_used], [-neg_distance], [label]
+        return label
+
+    def _rebuild_stair(self, state):
+        """Staircase of a state from its valid labels."""
+        labels = [label for label in self.labels_at[state] if self.valid[label]]
+        self.labels_at[state] = labels
+        labels.sort(key=lambda label: (self.times[label], -self.distances[label]))
+        stair = [[], [], []]
+        for label in labels:
+            if not stair[1] or self.distances[label] > stair[1][-1]:
+                stair[0].append(self.times[label])
+                stair[1].append(self.distances[label])
+                stair[2].append(label)
+        if stair[0]:
+            self.stairs[state] = stair
+        else:
+            self.stairs.pop(state, None)
+
+    def _still_valid(self, entry):
+        """Whether a queued or dropped label's parent is valid and its edge unchanged."""
+        parent, e = entry[6], entry[7]
+        if parent < 0:
+            return True
+        return bool(self.valid[parent]) and self.times[parent] + self.cg.time[e] == entry[0]
+
+    def _child(self, label, e):
+        """Heap entry for taking edge e from an accepted label, or None if it is not allowed."""
+        cg = self.cg
+        time_used = self.times[label] + cg.time[e]
+        if time_used > self.time_limit + TIME_EPSILON:
+            return None
+        node, last_lift, lift_count = self.states[label]
+        lift = cg.lift[e]
+        if lift >= 0:
+            if lift == last_lift:
+                if lift_count >= MAX_LIFT_REPEATS:
+                    return None
+                last_lift, lift_count = lift, lift_count + 1
+            else:
+                last_lift, lift_count = lift, 1
+        self.seq += 1
+        return (time_used, -(self.distances[label] + cg.distance[e]), self.seq - 1, cg.target[e],
+                last_lift, lift_count, label, e)
+
+    def _source(self, e):
+        """Node id an edge leaves."""
+        return bisect_right(self.cg.indptr, e) - 1
+
+def _dominator(stairs, node, last_lift, lift_count, time_used, distance):
+    """Accepted label at an equal or freer lift state, no younger and covering distance, or -1."""
+    stair = stairs.get((node, -1, 0))
+    if stair is not None:
+        times = stair[0]
+        # Unless labels were revived, no accepted label is younger
+        i = len(times) - 1 if times[-1] <= time_used else bisect_right(times, time_used) - 1
+        if i >= 0 and stair[1][i] >= distance:
+            return stair[2][i]
+    for count in range(1, lift_count + 1):
+        stair = stairs.get((node, last_lift, count))
+        if stair is not None:
+            times = stair[0]
+            i = len(times) - 1 if times[-1] <= time_used else bisect_right(times, time_used) - 1
+            if i >= 0 and stair[1][i] >= distance:
+                return stair[2][i]
+    return -1
@@ -0,0 +1,178 @@
+"""
+Lift times that depend on the time of day.
+
+A lift's schedule gives its time, queue and ride together, at some clock
+times of the day, with linear interpolation in between, and the times it
+closes. A skier reaching a closed lift waits for it to open again. Each
+schedule must be FIFO: leaving later never means arriving earlier. Then
+an itinerary that reaches a point sooner can always do whatever a later
+one can, which is what lets the label search keep one label per state
+and minute as in the static case.
+
+Schedules are read from a CSV table with one row per lift and clock time:
+    name,clock,time
+    Grizzly Lift,08:45,7
+    Grizzly Lift,10:30,15
+    Grizzly Lift,12:00,closed
+    Grizzly Lift,13:00,9
+    Grizzly Lift,16:30,closed
+A lift is closed before its first row and from every "closed" row (or
+empty time) until the next row with a time. After its last row with a
+time it keeps that time, until it closes.
+"""
+from array import array
+from bisect import bisect_right
+import csv
+
+from compiled_graph import CompiledGraph
+
+class LiftSchedule:
+    """
+    Piecewise-linear lift time against the clock, with closed periods.
+
+    Clock times are minutes after midnight.
+    """
+
+    def __init__(self, clocks, times, name="lift"):
+        """
+        Args:
+            clocks: Increasing clock times at which the lift time is given
+            times: Minutes needed to take the lift when leaving at each clock
+                time, or None where the lift closes
+            name: Lift name for error messages
+        Raises:
+            ValueError if the clock times do not increase or the schedule
+            is not FIFO
+        """
+        if len(clocks) != len(times) or not clocks:
+            raise ValueError(f"{name}: a schedule needs one time per clock time")
+        if any(b <= a for a, b in zip(clocks, clocks[1:])):
+            raise ValueError(f"{name}: clock times must increase")
+        if all(time is None for time in times):
+            raise ValueError(f"{name}: the lift never opens")
+        self.name = name
+        self.clocks = list(clocks)
+        self.times = list(times)
+        # Per period from clocks[i] on: time when leaving at its start (None
+        # if closed) and change of time per minute
+        self._slopes = []
+        for i, time in enumerate(times):
+            following = times[i + 1] if i + 1 < len(times) else None
+            if time is None or following is None:
+                self._slopes.append(0)
+            else:
+                self._slopes.append((following - time) / (clocks[i + 1] - clocks[i]))
+        # Index of the next open period from each period on, -1 if none
+        self._next_open = [-1] * len(times)
+        next_open = -1
+        for i in range(len(times) - 1, -1, -1):
+            if times[i] is not None:
+                next_open = i
+            self._next_open[i] = next_open
+        self.fastest = min(time for time in times if time is not None)
+        self._check_fifo()
+
+    def arrival(self, clock):
+        """
+        Clock time at the top when reaching the bottom at clock.
+
+        Returns:
+            Arrival clock time, waiting for the lift to open if it is closed,
+            or inf if it does not open again
+        """
+        i = bisect_right(self.clocks, clock) - 1
+        if i >= 0 and self.times[i] is not None:
+            return clock + self.times[i] + self._slopes[i] * (clock - self.clocks[i])
+        i = self._next_open[i + 1] if i + 1 < len(self.times) else -1
+        if i < 0:
+            return float("inf")
+        return self.clocks[i] + self.times[i]
+
+    def duration(self, clock):
+        """Minutes from reaching the bottom at clock to the top, including waits."""
+        return self.arrival(clock) - clock
+
+    def _check_fifo(self):
+        """Raise ValueError where leaving later would arrive earlier."""
+        last_arrival = -float("inf")
+        for i, time in enumerate(self.times):
+            if time is None:
+                continue
+            arrival = self.clocks[i] + time
+            # Arrival when leaving at the end of the period: at the next
+            # row, or at closing with the time held
+            end_arrival = arrival
+            if i + 1 < len(self.times):
+                following = self.times[i + 1]
+                end_arrival = self.clocks[i + 1] + (time if following is None else following)
+            if arrival < last_arrival or end_arrival < arrival:
+                raise ValueError(f"{self.name}: leaving after {format_clock(self.clocks[i])} can "
+                                 f"arrive earlier than leaving before, the schedule is not FIFO")
+            last_arrival = end_arrival
+
+def parse_clock(clock):
+    """Minutes after midnight of "HH:MM", or of a number of minutes."""
+    if isinstance(clock, str) and ":" in clock:
+        hours, minutes = clock.split(":")
+        return int(hours) * 60 + float(minutes)
+    return float(clock)
+
+def format_clock(minutes):
+    """"HH:MM" of minutes after midnight."""
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def read_lift_schedules(path):
+    """
+    Read lift schedules from a CSV table, see the module docstring.
+
+    Args:
+        path: CSV file with name, clock and time columns
+    Returns:
+        dict mapping lift name to LiftSchedule
+    """
+    rows = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            time = record["time"].strip()
+            time = None if time.lower() in ("", "closed") else float(time)
+            rows.setdefault(record["name"], []).append((parse_clock(record["clock"].strip()), time))
+    schedules = {}
+    for name, points in rows.items():
+        points.sort(key=lambda point: point[0])
+        schedules[name] = LiftSchedule([clock for clock, _ in points],
+                                       [time for _, time in points], name)
+    return schedules
+
+class LiftTimetable:
+    """
+    Lift schedules resolved to the edges of a compiled graph.
+
+    graph is a copy of the compiled graph in which every scheduled lift
+    takes its fastest time, so bounds and shortest times computed on it
+    stay valid lower bounds whenever the lifts are taken. Build it once and
+    pass it to optimizer.find_max_distance_path as schedules to reuse its
+    bounds across queries.
+    """
+
+    def __init__(self, cg, schedules):
+        """
+        Args:
+            cg: CompiledGraph
+            schedules: dict mapping lift name to LiftSchedule; lifts without
+                one keep their fixed time
+        Raises:
+            ValueError for a schedule of a lift the graph does not have
+        """
+        unknown = set(schedules) - set(cg.lift_names)
+        if unknown:
+            raise ValueError(f"Schedules for unknown lifts: {', '.join(sorted(unknown))}")
+        by_lift = [schedules.get(name) for name in cg.lift_names]
+        self.cg = cg
+        self.edge_schedules = [by_lift[cg.lift[e]] if cg.lift[e] >= 0 else None
+                               for e in range(cg.num_edges)]
+        time = array("d", (cg.time[e] if schedule is None else schedule.fastest
+                           for e, schedule in enumerate(self.edge_schedules)))
+        self.graph = CompiledGraph(cg.nodes, cg.indptr, cg.target, time, cg.distance, cg.is_lift,
+                                   cg.lift, cg.edge_names, cg.edge_grades, cg.edge_keys,
+                                   cg.lift_names, cg.dominated_pruned)
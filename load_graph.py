@@ -1,4 +1,10 @@
-import networkx as nx
+import csv
+import json
+import os
+
+# Directory with the resort definition files
+RESORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resorts")
+LES_ARCS_PATH = os.path.join(RESORTS_DIR, "les_arcs.json")
 
 # Define average speeds (km/h) for each grade
 SLOPE_SPEEDS = {
@@ -21,67 +27,113 @@ def calculate_slope_time(distance, grade):
     return round((distance / (speed / 60)), 1)
 
 def create_les_arcs_graph():
-    # Create a directed graph
-    G = nx.DiGraph()
-
-    # Real nodes (Les Arcs/Peisey-Vallandry locations)
-    node_rows = [
-        ["Comborciere Top", "Mont Blanc Top", "Bois de l'Ours Top", "Transarc Top"],
-        ["Arc 1950",  "La Bulle Restaurant", "Le Derby Top", "Grizzly top" ],
-        ["Comborciere Bottom","Arpette Bottom", "Transarc Middle", "Le Derby Bottom"],
-        ["Arc 1600", "Arc 1800", "Vallandry"] 
-    ]
-    
+    """Load the Les Arcs/Peisey-Vallandry resort, see load_resort."""
+    return load_resort(LES_ARCS_PATH)
+
+def load_resort(path):
+    """
+    Load a resort definition file into a graph.
+
+    Args:
+        path: JSON or CSV file, see read_resort
+    Returns:
+        (G, node_rows): a MultiDiGraph with a "row" attribute on every node
+        and the nodes grouped by row, top row first
+    """
+    return build_resort_graph(read_resort(path))
+
+def read_resort(path):
+    """
+    Read a resort definition from a JSON or CSV file.
+
+    A JSON file holds an object with:
+        node_rows: List of rows of node names, top row first
+        slopes: Objects with start, end, distance (km), grade and name
+        lifts: Objects with start, end, time (minutes) and name
+    and optionally a resort name. A slope may give its own time in minutes
+    instead of the one calculate_slope_time derives from its grade.
+
+    A CSV file has a header row and the columns type, name, start, end,
+    distance, grade, time and row. Type is "node" (with name and row),
+    "slope" or "lift"; columns that do not apply stay empty.
+
+    Args:
+        path: File name ending in .json or .csv
+    Returns:
+        dict with node_rows, slopes and lifts as in the JSON format
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    if extension != ".csv":
+        raise ValueError(f"Unsupported resort file type: {path}")
+
+    rows = {}
+    slopes, lifts = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            kind = record["type"].strip().lower()
+            if kind == "node":
+                rows.setdefault(int(record["row"]), []).append(record["name"])
+            elif kind == "slope":
+                slope = {"start": record["start"], "end": record["end"],
+                         "distance": float(record["distance"]), "grade": record["grade"],
+                         "name": record["name"]}
+                if record.get("time"):
+                    slope["time"] = float(record["time"])
+                slopes.append(slope)
+            elif kind == "lift":
+                lifts.append({"start": record["start"], "end": record["end"],
+                              "time": float(record["time"]), "name": record["name"]})
+            else:
+                raise ValueError(f"Unknown resort record type: {record['type']}")
+    node_rows = [rows[row] for row in sorted(rows)]
+    return {"name": os.path.splitext(os.path.basename(path))[0], "node_rows": node_rows,
+            "slopes": slopes, "lifts": lifts}
+
+def build_resort_graph(data):
+    """
+    Build the resort graph from a definition as returned by read_resort.
+
+    The graph is a directed multigraph, since several slopes can connect
+    the same two points. Edge keys are stable ids: slopes first, then
+    lifts, in the order they are listed.
+
+    Returns:
+        (G, node_rows)
+    """
+    # Imported here so that reading resort files and paths stays cheap
+    import networkx as nx
+
+    G = nx.MultiDiGraph()
+    node_rows = [list(row) for row in data["node_rows"]]
     for row_idx, row in enumerate(node_rows):
         for node in row:
             G.add_node(node, row=row_idx)
 
-    # Add slopes with names
-    slopes = [
-        
-        ("Grizzly top", "Le Derby Bottom", 1.4, 'red', "Myrtilles upper part"),
-        ("La Bulle Restaurant", "Arc 1950", 1.25, 'blue', "Vallee De L'Arc 1 upper part"),
-        ("Arc 1950", "Comborciere Bottom", 1.25, 'blue', "Vallee De L'Arc 1 lower part"),
-        ("Comborciere Top", "Mont Blanc Top", 0.3, 'blue', "Belvedere 4"),
-        ("Le Derby Top", "Le Derby Bottom", 1.2, 'red', "Belette"), #rounded up because Belette is not complete
-        ("Transarc Top", "La Bulle Restaurant", 2.74, 'blue', "Plan des eaux"),
-        ("Le Derby Top", "Transarc Middle", 1.0, 'blue', "Traversee 3"), # Schatting
-        ("Grizzly top", "Vallandry", 2.27, 'red', 'Aigle'),
-        ("Le Derby Top", "Le Derby Bottom", 1.0, 'red', "Belette"),
-        ("Bois de l'Ours Top", "Arc 1950", 1.5, 'black', "Bois de l'Ours"),
-        ("Mont Blanc Top", "Arpette Bottom", 0.73, 'blue', "Belvedere 3"),
-        ("Le Derby Bottom", "Vallandry", 1.1+1.2, 'blue', "Myrtille lower + barmont"),
-        ("Mont Blanc Top", "Arc 1600", 3.7, 'blue', "Mont Blanc slope"),
-        ("Mont Blanc Top", "Arc 1600", 3.6, 'red', "Arolles slope"),
-        ("Bois de l'Ours Top", "Le Derby Bottom", 5, 'blue', "Arpette to Le Derby")
-    ]
-
-    # Add slopes to graph
-    for start, end, distance, grade, name in slopes:
-        G.add_edge(start, end, 
-                  distance=distance,
-                  grade=grade,
-                  time=calculate_slope_time(distance, grade),
-                  name=name)
-
-    # Add lifts with names
-    lifts = [
-        ("Vallandry", "Grizzly top", 7, "Grizzly Lift"),
-        ("Le Derby Bottom", "Le Derby Top", 6, "Derby Chairlift"),
-        ("Arc 1600", "Mont Blanc Top", 5, "Mont Blanc Lift"),
-        ("Arc 1800", "Transarc Middle", 6, "Transarc 1"),
-        ("Transarc Middle", "Transarc Top", 9, "Transarc 2"),
-        ("La Bulle Restaurant", "Transarc Top", 6, "Arcabulle Chairlift"),
-        ("Comborciere Bottom", "Comborciere Top", 6,"Comborciere Chairlift"),
-        ("Comborciere Bottom", "La Bulle Restaurant", 9,"Pre-Saint-Esprit lift"),
-        ("Arc 1950", "Bois de l'Ours Top", 12, "Bois de l'Ours Lift"),
-        ("Arpette Bottom", "Bois de l'Ours Top", 6, "Arpette Chairlift"),
-
-
-    ]
-
-    # Add lifts to graph
-    for start, end, time, name in lifts:
-        G.add_edge(start, end, distance=0, time=time, name=name)
-
-    return G, node_rows 
\ No newline at end of file
+    def check_ends(edge):
+        for end in (edge["start"], edge["end"]):
+            if end not in G:
+                raise ValueError(f"{edge['name']} connects unknown point {end}")
+
+    slopes = data.get("slopes", [])
+    for edge_id, slope in enumerate(slopes):
+        check_ends(slope)
+        if slope["grade"] not in SLOPE_SPEEDS:
+            raise ValueError(f"{slope['name']} has unknown grade {slope['grade']}")
+        time = slope.get("time")
+        if time is None:
+            time = calculate_slope_time(slope["distance"], slope["grade"])
+        G.add_edge(slope["start"], slope["end"], key=edge_id,
+                   distance=slope["distance"],
+                   grade=slope["grade"],
+                   time=time,
+                   name=slope["name"])
+
+    for edge_id, lift in enumerate(data.get("lifts", []), start=len(slopes)):
+        check_ends(lift)
+        G.add_edge(lift["start"], lift["end"], key=edge_id, distance=0, time=lift["time"],
+                   name=lift["name"])
+
+    return G, node_rows
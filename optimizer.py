@@ -1,34 +1,773 @@
-from load_graph import create_les_arcs_graph
-from collections import deque
+from compiled_graph import CompiledGraph, compile_graph
+from search_stats import SearchStats, maybe_phase
+from collections import deque, namedtuple
 import heapq
+import time
 
-def find_max_distance_path(G, start, time_limit, distance_goal):
-    if not G.nodes() or start not in G.nodes() or time_limit <= 0:
+# Maximum number of consecutive uses of the same lift
+MAX_LIFT_REPEATS = 3
+
+# Tolerance for comparing accumulated edge times against the time limit
+TIME_EPSILON = 1e-9
+
+# Labels whose distance bound does not beat the incumbent by this much are pruned
+BOUND_EPSILON = 1e-9
+
+def find_max_distance_path(G, start, time_limit, distance_goal, method="labels",
+                           edge_keys=False, prune=True, stats=False, reduce=False, end=None,
+                           schedules=None, start_time=None):
+    """
+    Find an itinerary that covers as much slope distance as possible.
+
+    With the default "labels" method the result is optimal: if distance_goal
+    can be reached within time_limit, the quickest itinerary reaching it is
+    returned, otherwise the longest itinerary that fits in time_limit.
+    The "dp" method computes the same optimum with a NumPy table over 0.1
+    minute ticks, which is faster for long time limits on small graphs.
+    The "cycle" method is for very long time limits: it repeats the best
+    distance-per-minute loop and only solves the start and end of the day
+    exactly, so its run time barely grows with time_limit; see
+    cycle_solver.long_horizon_search. It is near-optimal, and exact when
+    time_limit is short. The "parallel" method returns exactly what "labels"
+    does, but splits the search over one worker process per CPU, see
+    parallel_search. The "bfs" method is the original breadth-first
+    heuristic, kept for comparison.
+
+    With an end node, such as the hotel base, only itineraries finishing at
+    end count. If none can get back to end in time, (0, []) is returned.
+
+    With lift schedules (see lift_schedules), lift times follow the clock,
+    starting at start_time, and closed lifts are waited for. Only the
+    "labels" method supports them.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph from
+           compile_graph to skip compiling it again
+        start: Starting node
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        method: "labels" (exact), "dp" (exact, table based), "cycle" (long
+            time limits), "parallel" (exact, multi-process) or "bfs"
+            (heuristic)
+        edge_keys: Return the graph's edges, (u, v, key) for multigraphs,
+            instead of edge names, which can be ambiguous for parallel slopes
+        prune: Use branch-and-bound pruning in the "labels" method
+        stats: True, or a SearchStats to set up tracing, to also return
+            the SearchStats of the run
+        reduce: Search a graph reduced for this query, see
+            reduction.reduce_graph; the result is the same
+        end: Node the itinerary has to finish at, or None to finish anywhere
+        schedules: dict mapping lift names to lift_schedules.LiftSchedule,
+            or a lift_schedules.LiftTimetable built for G
+        start_time: Clock time of the start, as minutes after midnight or
+            "HH:MM", required with schedules
+    Returns:
+        (best_distance, best_path) where best_path is a list of edge names,
+        or (best_distance, best_path, stats) when stats is requested
+    """
+    if stats is True:
+        stats = SearchStats()
+    elif stats is False:
+        stats = None
+    with maybe_phase(stats, "compile"):
+        cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+    timetable = None
+    if schedules is not None:
+        from lift_schedules import LiftTimetable, parse_clock
+        if start_time is None:
+            raise ValueError("Lift schedules need a start time")
+        start_time = parse_clock(start_time)
+        timetable = schedules if isinstance(schedules, LiftTimetable) else LiftTimetable(cg, schedules)
+        cg = timetable.cg
+    best_distance, edge_ids = solve_compiled(cg, start, time_limit, distance_goal, method, prune,
+                                             stats, reduce, end, timetable, start_time)
+    if edge_keys:
+        best_path = [cg.edge_keys[e] for e in edge_ids]
+    else:
+        best_path = cg.edge_path_names(edge_ids)
+    if stats is not None:
+        return best_distance, best_path, stats
+    return best_distance, best_path
+
+def solve_compiled(cg, start, time_limit, distance_goal, method="labels", prune=True, stats=None,
+                   reduce=False, end=None, timetable=None, start_time=0):
+    """
+    Run a solver on a compiled graph.
+
+    Args:
+        cg: CompiledGraph from compile_graph
+        start: Starting node name
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        method: "labels", "dp", "cycle", "parallel" or "bfs", see
+            find_max_distance_path
+        prune: Use branch-and-bound pruning in the "labels" method, with
+            bounds computed once per compiled graph; "parallel" always does
+        stats: SearchStats to fill in, or None
+        reduce: Search a graph reduced for this query, reusing the bounds
+            of the full graph
+        end: Node name the itinerary has to finish at, or None
+        timetable: lift_schedules.LiftTimetable built for cg, or None for
+            fixed lift times
+        start_time: Clock time of the start in minutes after midnight, for
+            the timetable
+    Returns:
+        (best_distance, edge_ids) where edge_ids lists compiled edge ids
+    """
+    if method not in ("labels", "dp", "cycle", "parallel", "bfs"):
+        raise ValueError(f"Unknown method: {method}")
+    if timetable is not None and (method != "labels" or reduce):
+        raise ValueError("Lift schedules are only supported by the labels method without reduce")
+    if stats is not None:
+        stats.method = method
+    if not cg.num_nodes or start not in cg.node_index or time_limit <= 0:
         return 0, []
-    
+    if end is not None and end not in cg.node_index:
+        return 0, []
+
+    if reduce:
+        from reduction import reduce_graph
+        with maybe_phase(stats, "reduce"):
+            reduction = reduce_graph(cg, start, time_limit)
+        bounds = None
+        if method == "parallel" or method == "labels" and prune:
+            with maybe_phase(stats, "bounds"):
+                bounds = reduction.map_bounds(_get_bounds(cg))
+        graph = reduction.graph
+        if end is not None and end not in graph.node_index:
+            # Not even reachable in time
+            return 0, []
+        best_distance, edge_ids = _run_method(graph, graph.node_index[start], time_limit,
+                                              distance_goal, method, bounds, stats,
+                                              None if end is None else graph.node_index[end])
+        return best_distance, reduction.expand(edge_ids)
+
+    if timetable is not None:
+        bounds = None
+        if prune:
+            with maybe_phase(stats, "bounds"):
+                bounds = _get_bounds(timetable.graph)
+        search = LabelSearch(cg, cg.node_index[start], time_limit, distance_goal, bounds, stats,
+                             end=None if end is None else cg.node_index[end],
+                             timetable=timetable, start_time=start_time)
+        return _finish_search(search, stats)
+
+    bounds = None
+    if method == "parallel" or method == "labels" and prune:
+        with maybe_phase(stats, "bounds"):
+            bounds = _get_bounds(cg)
+    return _run_method(cg, cg.node_index[start], time_limit, distance_goal, method, bounds, stats,
+                       None if end is None else cg.node_index[end])
+
+def _run_method(cg, start_id, time_limit, distance_goal, method, bounds, stats, end_id=None):
+    if method == "labels":
+        return _label_setting_search(cg, start_id, time_limit, distance_goal, bounds, stats, end_id)
+    if method == "dp":
+        from dp_solver import dp_search
+        with maybe_phase(stats, "search"):
+            return dp_search(cg, start_id, time_limit, distance_goal, end_id)
+    if method == "cycle":
+        from cycle_solver import long_horizon_search
+        with maybe_phase(stats, "search"):
+            result = long_horizon_search(cg, cg.nodes[start_id], time_limit, distance_goal,
+                                         end=None if end_id is None else cg.nodes[end_id])
+        return result.distance, result.path
+    if method == "parallel":
+        from parallel_search import parallel_label_search
+        return parallel_label_search(cg, start_id, time_limit, distance_goal, bounds, stats, end_id)
+    return _bfs_search(cg, start_id, time_limit, distance_goal, stats, end_id)
+
+class LabelSearch:
+    """
+    Exact label-setting search over (node, last lift, lift repeat count).
+
+    Labels are popped in order of time used, so a label is Pareto-dominated
+    exactly when a label already accepted for the same node and lift state
+    covers at least the same distance. A lift state with a lower repeat count
+    for the same lift is at least as good, so it dominates as well. For
+    integer-minute edge times each state accepts at most one label per
+    minute, which bounds the work by O(states * time_limit * out-degree).
+
+    With bounds (a bounds.DistanceBounds), labels that cannot beat the
+    incumbent even at the best distance-per-minute cycle rate are pruned
+    (branch and bound). The bounds are admissible, so the result stays
+    optimal. Labels come out in time order, so the incumbent would only get
+    strong late; it is therefore seeded with a greedy rollout guided by the
+    bounds. If the rollout reaches distance_goal, only labels that could
+    still reach the goal before the rollout does are kept, since the
+    quickest of them is the answer.
+
+    Further candidate itineraries, such as an earlier plan, can be passed as
+    seed_paths. Each is followed as far as it stays valid and then finished
+    greedily, and the best of these rollouts seeds the incumbent.
+
+    With an end node, only itineraries finishing at end count, and edges
+    that leave less time than the quickest way back to end (from
+    bounds.get_times_to) are dropped. Until an itinerary ending at end is
+    found, best_distance is -1. Seed rollouts are cut back to their last
+    visit of end.
+
+    The search is resumable: run() can stop on a deadline, an expansion
+    budget or an improved incumbent, and continue where it left off.
+    Between runs, known_distance can be raised to the distance of an
+    itinerary found elsewhere, such as by another worker; labels that
+    cannot reach it are then pruned as well, while ties are kept.
+
+    With a lift_schedules.LiftTimetable, scheduled lifts take the time their
+    schedule gives for the clock time the label reaches them, start_time
+    plus its time used, waits for closed lifts included. The schedules are
+    FIFO, so an earlier label still dominates a later one and the search
+    is as exact as with fixed times. It runs on the timetable's graph, where
+    scheduled lifts take their fastest time, so bounds and the way back to
+    end stay admissible.
+
+    Drop counters are kept on the branches that drop labels, so they cost
+    next to nothing. The queue peak and trace of a SearchStats are only
+    tracked when one is given.
+    """
+
+    def __init__(self, cg, start, time_limit, distance_goal, bounds=None, stats=None,
+                 seed_paths=(), start_lift=(-1, 0), end=None, timetable=None, start_time=0):
+        self.edge_schedules = None
+        if timetable is not None:
+            cg = timetable.graph
+            self.edge_schedules = timetable.edge_schedules
+            self._edge_times = list(cg.time)
+            self._scheduled_out = [
+                [(e, self.edge_schedules[e]) for e in cg.out_edges(node)
+                 if self.edge_schedules[e] is not None]
+                for node in range(cg.num_nodes)
+            ]
+        self.cg = cg
+        # Clock time in minutes at time used 0, for scheduled lifts
+        self.start_time = start_time
+        # (last lift, repeat count) at the start, for itineraries that
+        # continue after an earlier lift
+        self.start_lift = start_lift
+        self.time_limit = time_limit
+        self.distance_goal = distance_goal
+        self.bounds = bounds
+        self.stats = stats
+        self.end = end
+        self.times_to_end = None
+        if end is not None:
+            from bounds import get_times_to
+            self.times_to_end = get_times_to(cg, end)
+
+        # Accepted labels, stored as parent pointers: (parent index, edge id)
+        self.parents = []
+        self.edges = []
+        # (node, last_lift, lift_count) -> best distance accepted so far
+        self.best_at_state = {}
+
+        self.best_distance = 0 if end is None or end == start else -1
+        self.best_label = -1
+        self.expansions = 0
+        self.pruned = 0
+        self.pops = 0
+        self.dominated = 0
+        self.time_dropped = 0
+        self.lift_repeat_dropped = 0
+        self.queue_peak = 1
+        self.complete = False
+        self._rate = None
+        self.known_distance = -1
+
+        # Greedy seed incumbent; best_label -2 stands for its path. Once it
+        # reaches the goal, nothing slower than it is of interest
+        self.seed_distance = 0
+        self.seed_path = []
+        self.horizon = time_limit
+        if bounds is not None:
+            with maybe_phase(stats, "seed"):
+                self.seed_distance, seed_time, self.seed_path = max(
+                    [self._greedy_rollout(start, path) for path in [()] + list(seed_paths)],
+                    key=self._seed_rank
+                )
+            if self.seed_distance >= distance_goal:
+                self.horizon = min(time_limit, seed_time)
+            elif self.seed_distance > 0:
+                self.best_distance = self.seed_distance
+                self.best_label = -2
+
+        # Heap entries: (time_used, -distance, seq, node, last_lift, lift_count,
+        #                parent label, edge id)
+        self.heap = [(0, 0, 0, start, *start_lift, -1, -1)]
+        self.seq = 1
+
+    def run(self, deadline=None, max_expansions=None, stop_on_improvement=False):
+        """
+        Expand labels until the search is complete or a budget runs out.
+
+        Args:
+            deadline: time.perf_counter() value after which to stop
+            max_expansions: Stop once this many labels have been expanded in total
+            stop_on_improvement: Return as soon as the best distance improves
+        Returns:
+            True if the search is complete and the incumbent is optimal
+        """
+        cg = self.cg
+        indptr, target, edge_time, edge_distance, edge_lift = (
+            cg.indptr, cg.target, cg.time, cg.distance, cg.lift
+        )
+        heap, parents, edges, best_at_state = self.heap, self.parents, self.edges, self.best_at_state
+        time_limit, distance_goal = self.horizon, self.distance_goal
+        best_distance, best_label, expansions, seq, pruned = (
+            self.best_distance, self.best_label, self.expansions, self.seq, self.pruned
+        )
+        pops, dominated, time_dropped, lift_repeat_dropped, queue_peak = (
+            self.pops, self.dominated, self.time_dropped, self.lift_repeat_dropped, self.queue_peak
+        )
+        end, times_to_end = self.end, self.times_to_end
+        scheduled, start_time = None, self.start_time
+        if self.edge_schedules is not None:
+            # Scheduled lift times are filled in for the popped label's clock
+            edge_time, scheduled = self._edge_times, self._scheduled_out
+        bounds = self.bounds
+        if bounds is not None:
+            state_index, rate, potential, fastest = (
+                bounds.state_index, bounds.rate, bounds.potential, bounds.fastest
+            )
+            prune_below = self._prune_below(best_distance)
+        stats = self.stats
+        if stats is not None:
+            trace, trace_every, trace_limit = stats.trace, stats.trace_every, stats.trace_limit
+            t0 = time.perf_counter()
+        start_pops = pops
+
+        while heap:
+            if max_expansions is not None and expansions >= max_expansions:
+                break
+            pops += 1
+            if deadline is not None and (pops - start_pops) % 256 == 0 and time.perf_counter() >= deadline:
+                pops -= 1
+                break
+            if stats is not None and len(heap) > queue_peak:
+                queue_peak = len(heap)
+
+            time_used, neg_distance, _, node, last_lift, lift_count, parent, edge = heapq.heappop(heap)
+            distance = -neg_distance
+
+            if _is_dominated(best_at_state, node, last_lift, lift_count, distance):
+                dominated += 1
+                continue
+
+            time_left = time_limit - time_used
+            if bounds is not None:
+                # The incumbent may have improved since this label was queued
+                state = state_index[(node, last_lift, lift_count)]
+                bound = rate[state] * time_left + potential[state]
+                if fastest * time_left < bound:
+                    bound = fastest * time_left
+                if distance + bound < prune_below:
+                    pruned += 1
+                    continue
+            best_at_state[(node, last_lift, lift_count)] = distance
+
+            label = len(parents)
+            parents.append(parent)
+            edges.append(edge)
+            expansions += 1
+            if stats is not None and trace_every and expansions % trace_every == 0 \
+                    and len(trace) < trace_limit:
+                trace.append((time_used, cg.nodes[node], distance, last_lift, lift_count))
+
+            improved = distance > best_distance and (end is None or node == end)
+            if improved:
+                best_distance = distance
+                best_label = label
+                if bounds is not None:
+                    prune_below = self._prune_below(best_distance)
+
+            # Labels come out in time order, so the first one reaching the goal
+            # is the quickest itinerary that does
+            if distance >= distance_goal and (end is None or node == end):
+                heap.clear()
+                break
+
+            if scheduled is not None:
+                for e, schedule in scheduled[node]:
+                    edge_time[e] = schedule.duration(start_time + time_used)
+
+            for e in range(indptr[node], indptr[node + 1]):
+                if edge_time[e] > time_left + TIME_EPSILON:
+                    time_dropped += 1
+                    continue
+                if times_to_end is not None and \
+                        edge_time[e] + times_to_end[target[e]] > time_left + TIME_EPSILON:
+                    # No way back to end in time
+                    time_dropped += 1
+                    continue
+
+                lift = edge_lift[e]
+                if lift >= 0:
+                    if lift == last_lift:
+                        if lift_count >= MAX_LIFT_REPEATS:
+                            lift_repeat_dropped += 1
+                            continue
+                        new_lift_count = lift_count + 1
+                    else:
+                        new_lift_count = 1
+                    new_last_lift = lift
+                else:
+                    new_lift_count = lift_count
+                    new_last_lift = last_lift
+
+                next_node = target[e]
+                new_distance = distance + edge_distance[e]
+                if _is_dominated(best_at_state, next_node, new_last_lift, new_lift_count, new_distance):
+                    dominated += 1
+                    continue
+
+                if bounds is not None:
+                    new_time_left = time_left - edge_time[e]
+                    state = state_index[(next_node, new_last_lift, new_lift_count)]
+                    bound = rate[state] * new_time_left + potential[state]
+                    if fastest * new_time_left < bound:
+                        bound = fastest * new_time_left
+                    if new_distance + bound < prune_below:
+                        pruned += 1
+                        continue
+
+                heapq.heappush(heap, (
+                    time_used + edge_time[e],
+                    -new_distance,
+                    seq,
+                    next_node,
+                    new_last_lift,
+                    new_lift_count,
+                    label,
+                    e
+                ))
+                seq += 1
+
+            if improved and stop_on_improvement:
+                break
+
+        self.best_distance, self.best_label, self.expansions, self.seq, self.pruned = (
+            best_distance, best_label, expansions, seq, pruned
+        )
+        self.pops, self.dominated, self.time_dropped, self.lift_repeat_dropped, self.queue_peak = (
+            pops, dominated, time_dropped, lift_repeat_dropped, queue_peak
+        )
+        self.complete = not heap
+        if stats is not None:
+            stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - t0
+            self._record_stats()
+        return self.complete
+
+    def _record_stats(self):
+        """Copy the search counters into the SearchStats."""
+        stats = self.stats
+        stats.pops = self.pops
+        stats.expansions = self.expansions
+        stats.dominated = self.dominated
+        stats.bound_pruned = self.pruned
+        stats.time_dropped = self.time_dropped
+        stats.lift_repeat_dropped = self.lift_repeat_dropped
+        stats.pushes = self.seq - 1
+        stats.queue_peak = self.queue_peak
+
+    def path(self):
+        """Return the edge ids of the best itinerary found so far."""
+        if self.best_label == -2:
+            return list(self.seed_path)
+        return _build_path(self.parents, self.edges, self.best_label)
+
+    def incumbent(self):
+        """
+        Best itinerary known so far as (distance, edge ids).
+
+        Unlike best_distance and path(), this includes a seed rollout that
+        reached the goal before the search confirmed a quicker one.
+        """
+        if not self.complete and self.seed_distance > self.best_distance:
+            return self.seed_distance, list(self.seed_path)
+        return self.best_distance, self.path()
+
+    def _prune_below(self, best_distance):
+        """Distance bound under which a label can neither beat the incumbent nor reach the goal."""
+        incumbent = max(best_distance, self.seed_distance)
+        floor = max(incumbent + BOUND_EPSILON, self.known_distance - BOUND_EPSILON)
+        return min(floor, self.distance_goal - BOUND_EPSILON)
+
+    def _greedy_rollout(self, start, path=()):
+        """
+        Build one valid itinerary by always taking the edge with the best bound.
+
+        Args:
+            start: Start node id
+            path: Edge ids to follow first, as far as they stay valid and
+                short of the goal
+        Returns:
+            (distance, time used, edge ids)
+        """
+        cg, bounds, end = self.cg, self.bounds, self.end
+        node, time_left, distance = start, self.time_limit, 0
+        last_lift, lift_count = self.start_lift
+        rollout = []
+        # Longest prefix that ends at end, as (distance, time used, length)
+        finished = (0, 0, 0)
+        given = iter(path)
+        while distance < self.distance_goal:
+            best_edge = -1
+            if given is not None:
+                e = next(given, -1)
+                if cg.indptr[node] <= e < cg.indptr[node + 1] and \
+                        self._fits(e, time_left, self._duration(e, time_left)):
+                    lift = cg.lift[e]
+                    if lift < 0:
+                        best_edge, best_lift_state = e, (last_lift, lift_count)
+                    elif lift != last_lift:
+                        best_edge, best_lift_state = e, (lift, 1)
+                    elif lift_count < MAX_LIFT_REPEATS:
+                        best_edge, best_lift_state = e, (lift, lift_count + 1)
+                if best_edge < 0:
+                    given = None
+
+            if best_edge < 0:
+                best_value = -1
+                for e in cg.out_edges(node):
+                    duration = self._duration(e, time_left)
+                    if not self._fits(e, time_left, duration):
+                        continue
+                    lift = cg.lift[e]
+                    if lift >= 0:
+                        if lift == last_lift and lift_count >= MAX_LIFT_REPEATS:
+                            continue
+                        next_lift_state = (lift, lift_count + 1 if lift == last_lift else 1)
+                    else:
+                        next_lift_state = (last_lift, lift_count)
+                    value = cg.distance[e] + bounds.bound(cg.target[e], *next_lift_state,
+                                                          time_left - duration)
+                    if value > best_value:
+                        best_edge, best_value, best_lift_state = e, value, next_lift_state
+                if best_edge < 0:
+                    break
+
+            last_lift, lift_count = best_lift_state
+            rollout.append(best_edge)
+            distance += cg.distance[best_edge]
+            time_left -= self._duration(best_edge, time_left)
+            node = cg.target[best_edge]
+            if node == end:
+                finished = (distance, self.time_limit - time_left, len(rollout))
+        if end is None:
+            return distance, self.time_limit - time_left, rollout
+        distance, time_used, length = finished
+        return distance, time_used, rollout[:length]
+
+    def _duration(self, e, time_left):
+        """Minutes edge e takes when taken with time_left minutes of the time limit left."""
+        if self.edge_schedules is not None and self.edge_schedules[e] is not None:
+            return self.edge_schedules[e].duration(self.start_time + self.time_limit - time_left)
+        return self.cg.time[e]
+
+    def _fits(self, e, time_left, time_needed):
+        """Whether edge e, taking time_needed, fits in time_left with the way back to the end node."""
+        if self.times_to_end is not None:
+            time_needed += self.times_to_end[self.cg.target[e]]
+        return time_needed <= time_left + TIME_EPSILON
+
+    def _seed_rank(self, seed):
+        """Sort key of seed itineraries: reaching the goal sooner, else covering more."""
+        distance, time_used, _ = seed
+        if distance >= self.distance_goal:
+            return (1, -time_used)
+        return (0, distance)
+
+    def upper_bound(self):
+        """
+        Upper bound on the distance of any itinerary, for gap estimates.
+
+        Each queued label can at most add what its bounds allow for its
+        remaining time, or without bounds, its remaining time times the
+        fastest slope's km per minute.
+        """
+        if self.complete:
+            return self.best_distance
+        if self.bounds is not None:
+            bound = self.best_distance
+            for time_used, neg_distance, _, node, last_lift, lift_count, *_ in self.heap:
+                bound = max(bound, -neg_distance + self.bounds.bound(
+                    node, last_lift, lift_count, self.horizon - time_used))
+            return bound
+        if self._rate is None:
+            self._rate = max((self.cg.distance[e] / self.cg.time[e] for e in range(self.cg.num_edges)
+                              if self.cg.time[e] > 0), default=0)
+        rate = self._rate
+        bound = self.best_distance
+        for time_used, neg_distance, *_ in self.heap:
+            bound = max(bound, -neg_distance + rate * (self.time_limit - time_used))
+        return bound
+
+def _label_setting_search(cg, start, time_limit, distance_goal, bounds=None, stats=None, end=None):
+    search = LabelSearch(cg, start, time_limit, distance_goal, bounds, stats, end=end)
+    return _finish_search(search, stats)
+
+def _finish_search(search, stats):
+    """Run a LabelSearch to the end and return (best_distance, edge_ids)."""
+    search.run()
+    if search.best_distance < 0:
+        # No way back to end in time
+        return 0, []
+    with maybe_phase(stats, "path"):
+        return search.best_distance, search.path()
+
+# A snapshot of an anytime search. upper_bound bounds the distance of any
+# itinerary within the time limit; gap is upper_bound - distance, and 0 once
+# the search is complete
+AnytimeResult = namedtuple(
+    "AnytimeResult",
+    ["distance", "path", "upper_bound", "gap", "complete", "expansions", "seconds"]
+)
+
+def _get_bounds(cg):
+    """Bounds for branch and bound, imported lazily since they need NumPy."""
+    from bounds import get_bounds
+    return get_bounds(cg)
+
+def iter_improvements(G, start, time_limit, distance_goal, deadline_ms=None,
+                      max_expansions=None, edge_keys=False):
+    """
+    Run the exact search as an anytime search, yielding improving plans.
+
+    An AnytimeResult is yielded every time the best itinerary improves, and
+    once more at the end, when the search is complete or the budget is
+    spent. The last result is always the best plan found.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
+        start: Starting node
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        deadline_ms: Wall-clock budget in milliseconds
+        max_expansions: Budget in expanded labels
+        edge_keys: Return graph edges instead of edge names, see
+            find_max_distance_path
+    Yields:
+        AnytimeResult
+    """
+    t0 = time.perf_counter()
+    cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+    if not cg.num_nodes or start not in cg.node_index or time_limit <= 0:
+        yield AnytimeResult(0, [], 0, 0, True, 0, time.perf_counter() - t0)
+        return
+
+    deadline = None if deadline_ms is None else t0 + deadline_ms / 1000
+    search = LabelSearch(cg, cg.node_index[start], time_limit, distance_goal, _get_bounds(cg))
+
+    while True:
+        best_before = search.best_distance
+        search.run(deadline, max_expansions, stop_on_improvement=True)
+        out_of_budget = (
+            (deadline is not None and time.perf_counter() >= deadline) or
+            (max_expansions is not None and search.expansions >= max_expansions)
+        )
+        if search.complete or out_of_budget:
+            yield _anytime_snapshot(search, edge_keys, t0)
+            return
+        if search.best_distance > best_before:
+            yield _anytime_snapshot(search, edge_keys, t0)
+
+def anytime_search(G, start, time_limit, distance_goal, deadline_ms=None,
+                   max_expansions=None, on_improvement=None, edge_keys=False):
+    """
+    Best plan found within a time or expansion budget.
+
+    Args:
+        G, start, time_limit, distance_goal, deadline_ms, max_expansions,
+        edge_keys: See iter_improvements
+        on_improvement: Called with every AnytimeResult as the search improves
+    Returns:
+        The final AnytimeResult
+    """
+    if on_improvement is None:
+        # Nobody watches intermediate plans, so run straight to the budget
+        t0 = time.perf_counter()
+        cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+        if not cg.num_nodes or start not in cg.node_index or time_limit <= 0:
+            return AnytimeResult(0, [], 0, 0, True, 0, time.perf_counter() - t0)
+        search = LabelSearch(cg, cg.node_index[start], time_limit, distance_goal, _get_bounds(cg))
+        search.run(None if deadline_ms is None else t0 + deadline_ms / 1000, max_expansions)
+        return _anytime_snapshot(search, edge_keys, t0)
+
+    result = None
+    for result in iter_improvements(G, start, time_limit, distance_goal, deadline_ms,
+                                    max_expansions, edge_keys):
+        on_improvement(result)
+    return result
+
+def _anytime_snapshot(search, edge_keys, t0):
+    """Package the current state of a LabelSearch as an AnytimeResult."""
+    cg = search.cg
+    distance, edge_ids = search.incumbent()
+    path = [cg.edge_keys[e] for e in edge_ids] if edge_keys else cg.edge_path_names(edge_ids)
+    upper_bound = max(search.upper_bound(), distance)
+    return AnytimeResult(distance, path, upper_bound, upper_bound - distance,
+                         search.complete, search.expansions, time.perf_counter() - t0)
+
+def _is_dominated(best_at_state, node, last_lift, lift_count, distance):
+    """Check whether an accepted label at an equal or freer lift state covers distance."""
+    if best_at_state.get((node, -1, 0), -1) >= distance:
+        return True
+    for count in range(1, lift_count + 1):
+        if best_at_state.get((node, last_lift, count), -1) >= distance:
+            return True
+    return False
+
+def _build_path(parents, edges, label):
+    """Follow parent pointers back from label and return the edge ids in order."""
+    path = []
+    while label > 0:
+        path.append(edges[label])
+        label = parents[label]
+    path.reverse()
+    return path
+
+def _bfs_search(cg, start, time_limit, distance_goal, stats=None, end=None):
+    indptr, target, edge_time, edge_distance, edge_lift = (
+        cg.indptr, cg.target, cg.time, cg.distance, cg.lift
+    )
+    times_to_end = None
+    if end is not None:
+        from bounds import get_times_to
+        times_to_end = get_times_to(cg, end)
     best_distance = 0
-    best_path = []
+    best_path = None
     
+    # Paths are shared linked lists of (edge id, parent path) cells, so
+    # extending a path is O(1) and queued states share their common prefix
     # Queue: (node, time_left, distance, path, last_lift, lift_repeat_count)
-    queue = deque([(start, time_limit, 0, [], None, 0)])
+    queue = deque([(start, time_limit, 0, None, -1, 0)])
     
     # Simple state tracking: (node, time_left // 5) -> distance
     visited = {}
     
+    # Counters for SearchStats
+    pops = dominated = time_dropped = lift_repeat_dropped = pushes = 0
+    queue_peak = 1
+    if stats is not None:
+        t0 = time.perf_counter()
+    
     while queue:
+        if stats is not None and len(queue) > queue_peak:
+            queue_peak = len(queue)
         node, time_left, distance, path, last_lift, lift_count = queue.popleft()
+        pops += 1
         
         # Basic checks
         if time_left < 0:
             continue
             
-        if distance > best_distance:
+        if distance > best_distance and (end is None or node == end):
             best_distance = distance
-            best_path = path.copy()
+            best_path = path
             
         # State-based pruning
         state = (node, time_left // 5)
         if state in visited and visited[state] >= distance:
+            dominated += 1
             continue
         visited[state] = distance
         
@@ -37,20 +776,23 @@ def find_max_distance_path(G, start, time_limit, distance_goal):
             continue
         
         # Explore neighbors
-        for next_node in G.neighbors(node):
-            edge_data = G[node][next_node]
-            
+        for e in range(indptr[node], indptr[node + 1]):
             # Skip if not enough time
-            if edge_data["time"] > time_left:
+            if edge_time[e] > time_left:
+                time_dropped += 1
+                continue
+            if times_to_end is not None and edge_time[e] + times_to_end[target[e]] > time_left:
+                time_dropped += 1
                 continue
             
             # Check lift repetition constraint
-            is_lift = edge_data["distance"] == 0
+            lift = edge_lift[e]
             new_lift_count = 0
             
-            if is_lift:
-                if edge_data["name"] == last_lift:
-                    if lift_count >= 3:  # Already used this lift 3 times
+            if lift >= 0:
+                if lift == last_lift:
+                    if lift_count >= MAX_LIFT_REPEATS:  # Already used this lift 3 times
+                        lift_repeat_dropped += 1
                         continue
                     new_lift_count = lift_count + 1
                 else:
@@ -59,22 +801,38 @@ def find_max_distance_path(G, start, time_limit, distance_goal):
                 new_lift_count = lift_count  # Slopes don't reset the lift counter
             
             # Calculate new state
-            new_time_left = time_left - edge_data["time"]
-            new_distance = distance + edge_data["distance"]
-            new_path = path + [edge_data["name"]]
-            new_last_lift = edge_data["name"] if is_lift else last_lift
+            new_time_left = time_left - edge_time[e]
+            new_distance = distance + edge_distance[e]
+            new_path = (e, path)
+            new_last_lift = lift if lift >= 0 else last_lift
             
             # Add to queue
             queue.append((
-                next_node,
+                target[e],
                 new_time_left,
                 new_distance,
                 new_path,
                 new_last_lift,
                 new_lift_count
             ))
+            pushes += 1
     
-    return best_distance, best_path
+    if stats is not None:
+        stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - t0
+        stats.pops, stats.expansions, stats.dominated = pops, pops - dominated, dominated
+        stats.time_dropped, stats.lift_repeat_dropped = time_dropped, lift_repeat_dropped
+        stats.pushes, stats.queue_peak = pushes, queue_peak
+    with maybe_phase(stats, "path"):
+        return best_distance, _unlink_path(best_path)
+
+def _unlink_path(path):
+    """Materialize a linked (edge id, parent path) chain as a list of edge ids."""
+    edges = []
+    while path is not None:
+        edge, path = path
+        edges.append(edge)
+    edges.reverse()
+    return edges
 
 def print_path_breakdown(G, best_distance, best_path, start_node):
     """
@@ -82,9 +840,11 @@ def print_path_breakdown(G, best_distance, best_path, start_node):
     Only shows edge names, not nodes.
     
     Args:
-        G: NetworkX graph containing the ski resort
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
         best_distance: Total distance of the path
-        best_path: List of edge names representing the path
+        best_path: List of edge names representing the path, or of edges as
+            returned with find_max_distance_path(..., edge_keys=True). Names
+            of parallel slopes are resolved to the first matching edge.
         start_node: Starting node of the path
     """
     print(f"Max distance: {best_distance} km")
@@ -99,29 +859,24 @@ def print_path_breakdown(G, best_distance, best_path, start_node):
         segment_distance = 0
         curr_node = start_node
         
-        for i, edge_name in enumerate(best_path):
+        for i, edge in enumerate(best_path):
             # Find the edge and accumulate distance
-            next_node = None
-            for neighbor in G.neighbors(curr_node):
-                edge_data = G[curr_node][neighbor]
-                if edge_data['name'] == edge_name:
-                    edge_distance = edge_data['distance']
-                    segment_distance += edge_distance
-                    cumulative_distance += edge_distance
-                    
-                    # Store the edge info
-                    current_segment.append({
-                        'name': edge_name,
-                        'distance': edge_distance,
-                        'time': edge_data['time']
-                    })
-                    
-                    next_node = neighbor
-                    break
+            next_node, edge_data = _resolve_edge(G, curr_node, edge)
             
             if next_node is None:
-                print(f"ERROR: Invalid path segment from {curr_node} with edge {edge_name}")
+                print(f"ERROR: Invalid path segment from {curr_node} with edge {edge}")
                 break
+            
+            edge_distance = edge_data['distance']
+            segment_distance += edge_distance
+            cumulative_distance += edge_distance
+            
+            # Store the edge info
+            current_segment.append({
+                'name': edge_data['name'],
+                'distance': edge_distance,
+                'time': edge_data['time']
+            })
                 
             curr_node = next_node
             
@@ -142,15 +897,32 @@ def print_path_breakdown(G, best_distance, best_path, start_node):
     else:
         print("No path found.")
 
-if __name__ == "__main__":
-    G, node_rows = create_les_arcs_graph()
-    start_node = "Vallandry"
-    time_limit = 8*60  # 8 hours in minutes
-    distance_goal = 100
+def _resolve_edge(G, node, edge):
+    """
+    Find an edge leaving node, given by name or as a graph edge tuple.
 
-    best_distance, best_path = find_max_distance_path(
-        G, start_node, time_limit, distance_goal
-    )
-    
-    # Print the result
-    print_path_breakdown(G, best_distance, best_path, start_node)
+    Args:
+        G: NetworkX graph or CompiledGraph
+    Returns:
+        (next_node, edge_data), or (None, None) if there is no such edge
+    """
+    if isinstance(G, CompiledGraph):
+        if node not in G.node_index:
+            return None, None
+        for e in G.out_edges(G.node_index[node]):
+            if G.edge_keys[e] == edge or G.edge_names[e] == edge:
+                data = {'name': G.edge_names[e], 'distance': G.distance[e], 'time': G.time[e]}
+                return G.nodes[G.target[e]], data
+        return None, None
+    if isinstance(edge, tuple):
+        if edge[0] != node or not G.has_edge(*edge):
+            return None, None
+        return edge[1], G.edges[edge]
+    for _, neighbor, edge_data in G.out_edges(node, data=True):
+        if edge_data['name'] == edge:
+            return neighbor, edge_data
+    return None, None
+
+if __name__ == "__main__":
+    from cli import main
+    main()
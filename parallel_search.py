@@ -0,0 +1,152 @@
+"""
+Exact label search of one query spread over worker processes.
+
+Splitting the itineraries on their first moves gives each worker a subtree,
+but the subtrees share most of their states, so without the dominance
+checks between them the workers repeat each other's work. Instead, the
+workers split the range the optimum can lie in. The cost of the label
+search is mostly in proving that nothing beats the incumbent, and that
+proof is cheap once the incumbent is close to the optimum: a search told
+that an itinerary of some distance exists prunes everything that cannot
+reach it, finding the optimum if it is at least that long, and nothing
+otherwise.
+
+So one worker runs the plain search while the others probe levels below
+the upper bound of the distance bounds, from the top down. A failed probe
+lowers the upper bound and stops the probes above it; the first probe to
+succeed has found the optimum. Under a distance goal that the seed rollout
+already reaches, the probes are on the time limit instead, from the
+quickest the bounds allow upwards, since the quickest itinerary reaching
+the goal is wanted. Workers share the best distance found so far through
+a multiprocessing.Value and raise their pruning to it between batches of
+expansions.
+
+Every probe keeps all labels that can reach the optimum, in the same
+order, so the itinerary found is exactly the one the sequential search
+returns.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing
+import os
+
+from optimizer import BOUND_EPSILON, TIME_EPSILON, LabelSearch, _get_bounds, _label_setting_search
+from search_stats import maybe_phase
+
+# Labels a worker expands between looks at the shared incumbent
+CHUNK_EXPANSIONS = 2000
+
+# Probes step down from the upper bound by this fraction of the gap to the
+# incumbent, or by a finer one when there are more workers
+PROBE_STEP = 1 / 8
+
+# Per-process state for pool workers, set by _init_worker
+_worker = None
+
+def parallel_label_search(cg, start, time_limit, distance_goal, bounds=None, stats=None, end=None,
+                          processes=None):
+    """
+    Same result as the sequential "labels" search, found by several processes.
+
+    Args:
+        cg: CompiledGraph from compile_graph
+        start: Start node id
+        time_limit: Available time in minutes
+        distance_goal: Distance in km after which an itinerary is good enough
+        bounds: bounds.DistanceBounds, computed if not given
+        stats: SearchStats to fill in, or None
+        end: Node id the itinerary has to finish at, or None
+        processes: Number of worker processes, None for one per CPU, 0 or 1
+            to search sequentially
+    Returns:
+        (best_distance, edge_ids)
+    """
+    if bounds is None:
+        with maybe_phase(stats, "bounds"):
+            bounds = _get_bounds(cg)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        return _label_setting_search(cg, start, time_limit, distance_goal, bounds, stats, end)
+
+    # Levels grow with the quality of the answer: the distance, or minus the
+    # time to reach the goal. lo is reached by a known itinerary, hi by none
+    search = LabelSearch(cg, start, time_limit, distance_goal, bounds, stats, end=end)
+    by_time = search.seed_distance >= distance_goal
+    if by_time:
+        lo = -search.horizon
+        hi = -distance_goal / bounds.fastest if bounds.fastest > 0 else 0
+    else:
+        lo = search.best_distance
+        hi = min(bounds.bound(start, *search.start_lift, time_limit), distance_goal)
+    hi = max(hi, lo + BOUND_EPSILON)
+    step = min(PROBE_STEP, 1 / processes)
+
+    with maybe_phase(stats, "search"):
+        shared_lo = multiprocessing.Value("d", lo)
+        shared_hi = multiprocessing.Value("d", hi)
+        shared_done = multiprocessing.Value("b", 0)
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(cg, bounds, start, end, time_limit, distance_goal,
+                                           by_time, shared_lo, shared_hi, shared_done)) as pool:
+            # The plain search always succeeds, so the loop always ends
+            running = {pool.submit(_probe, lo): lo}
+            result = None
+            while result is None:
+                lo = max(lo, shared_lo.value)
+                while len(running) < processes:
+                    level = min([hi] + [x for x in running.values() if x > lo]) - (hi - lo) * step
+                    if level <= lo:
+                        break
+                    running[pool.submit(_probe, level)] = level
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    level = running.pop(future)
+                    outcome = future.result()
+                    if outcome is None:
+                        continue
+                    if _succeeded(outcome[0], level, distance_goal, by_time):
+                        result = outcome
+                        shared_done.value = 1
+                        break
+                    hi = min(hi, level)
+                    shared_hi.value = hi
+
+    best_distance, edge_ids = result
+    if best_distance < 0:
+        # No way back to end in time
+        return 0, []
+    return best_distance, edge_ids
+
+def _succeeded(distance, level, distance_goal, by_time):
+    """Whether a probe at level found the optimum, given the distance it found."""
+    if by_time:
+        return distance >= distance_goal
+    return distance >= level - BOUND_EPSILON
+
+def _init_worker(*args):
+    global _worker
+    _worker = args
+
+def _probe(level):
+    """
+    Search for an itinerary reaching level, see the module docstring.
+
+    Returns:
+        (best distance, edge ids) of the search, or None when the probe
+        was abandoned because another one settled the question
+    """
+    (cg, bounds, start, end, time_limit, distance_goal, by_time,
+     shared_lo, shared_hi, shared_done) = _worker
+    search = LabelSearch(cg, start, time_limit, distance_goal, bounds, end=end)
+    if by_time:
+        search.horizon = min(search.horizon, -level + TIME_EPSILON)
+    while not search.complete:
+        if shared_done.value or level >= shared_hi.value:
+            return None
+        if not by_time:
+            search.known_distance = max(level, shared_lo.value)
+        search.run(max_expansions=search.expansions + CHUNK_EXPANSIONS)
+        if not by_time and search.best_distance > shared_lo.value:
+            with shared_lo.get_lock():
+                shared_lo.value = max(shared_lo.value, search.best_distance)
+    return search.best_distance, search.path()
@@ -0,0 +1,270 @@
+from bisect import bisect_right
+from collections import namedtuple
+import heapq
+
+import numpy as np
+
+from compiled_graph import CompiledGraph, compile_graph
+from load_graph import SLOPE_SPEEDS
+from optimizer import MAX_LIFT_REPEATS, TIME_EPSILON, _build_path
+
+# One itinerary of a ParetoFront; grade_distances maps grade to km
+ParetoPlan = namedtuple("ParetoPlan", ["distance", "time", "grade_distances", "path"])
+
+class ParetoFront:
+    """
+    Every itinerary that no other beats on time and on every preference.
+
+    A preference weighs the km of each grade, and an itinerary beats another
+    if it takes no longer and scores at least as well on every preference.
+    It then also scores at least as well on any mix of the preferences with
+    non-negative shares, so for each such weighting and time limit the best
+    plan is on the front and best() finds it exactly. Other weightings are
+    answered from the same front, without that guarantee.
+
+    Queries run on NumPy arrays over the front, in order of time:
+        times: Minutes of every plan
+        grade_distances: km per grade (columns in the order of grades)
+        distances: Total km of every plan
+    """
+
+    def __init__(self, cg, grades, preferences, times, grade_distances, labels, parents, edges):
+        self.cg = cg
+        self.grades = grades
+        self.preferences = preferences
+        self.times = times
+        self.grade_distances = grade_distances
+        self.distances = grade_distances.sum(axis=1)
+        self._labels = labels
+        self._parents = parents
+        self._edges = edges
+
+    def __len__(self):
+        return len(self.times)
+
+    def plan(self, i, edge_keys=False):
+        """
+        Return plan i of the front as a ParetoPlan.
+
+        Args:
+            i: Index into times, grade_distances and distances
+            edge_keys: Return graph edges instead of edge names, see
+                optimizer.find_max_distance_path
+        """
+        cg = self.cg
+        path = _build_path(self._parents, self._edges, self._labels[i])
+        return ParetoPlan(
+            float(self.distances[i]), float(self.times[i]),
+            {grade: float(km) for grade, km in zip(self.grades, self.grade_distances[i])},
+            [cg.edge_keys[e] for e in path] if edge_keys else cg.edge_path_names(path)
+        )
+
+    def best(self, time_limit=float("inf"), weights=None, min_distance=0, edge_keys=False):
+        """
+        Plan with the highest weighted distance that fits in time_limit.
+
+        Ties go to the quicker plan.
+
+        Args:
+            time_limit: Available time in minutes, at most the solved one
+            weights: Dict from grade to weight, such as {"blue": 1, "red":
+                0.5, "black": 0}; missing grades weigh 0, None weighs every
+                grade 1 (maximum distance)
+            min_distance: Only consider plans covering at least this many km
+            edge_keys: See plan
+        Returns:
+            ParetoPlan, or None if no plan qualifies
+        """
+        if weights is None:
+            score = self.distances
+        else:
+            score = self.grade_distances @ np.array([weights.get(g, 0) for g in self.grades],
+                                                    dtype=np.float64)
+        fits = (self.times <= time_limit + TIME_EPSILON) & (self.distances >= min_distance)
+        if not fits.any():
+            return None
+        candidates = np.flatnonzero(fits)
+        # Plans are sorted by time, so the first best score is the quickest
+        return self.plan(int(candidates[np.argmax(score[candidates])]), edge_keys)
+
+    def fastest(self, distance_goal, edge_keys=False):
+        """Quickest plan covering at least distance_goal km, or None."""
+        reached = np.flatnonzero(self.distances >= distance_goal)
+        if not len(reached):
+            return None
+        return self.plan(int(reached[0]), edge_keys)
+
+def easier_grade_preferences(grades):
+    """
+    Default preferences of pareto_front: all km, all but the hardest grade, and so on.
+
+    Grades are ordered from easy to hard as in load_graph.SLOPE_SPEEDS, with
+    unknown grades last. Mixes of these preferences are exactly the
+    weightings that value a grade at least as much as any harder one, from
+    maximum distance to only blues.
+    """
+    known = list(SLOPE_SPEEDS)
+    ordered = sorted(grades, key=lambda g: known.index(g) if g in known else len(known))
+    return [{grade: 1 for grade in ordered[:n]} for n in range(len(ordered), 0, -1)]
+
+def pareto_front(G, start, time_limit, preferences=None):
+    """
+    Compute the ParetoFront of itineraries from start within time_limit.
+
+    One label-correcting sweep over (node, last lift, lift repeat count)
+    states, with labels in order of time used and scored on every
+    preference. A label is dropped when an accepted label at the same
+    state, or at a freer lift state as in optimizer.LabelSearch, scores at
+    least as well on every preference, since it took no longer and every
+    continuation of it does at least as well. The accepted labels are then
+    filtered down to the itineraries no other itinerary beats.
+
+    Total distance is always a preference, so max distance and quickest to
+    a goal are exact. With one preference per grade the front covers every
+    weighting, but it then grows quickly with the time limit, so by default
+    only the easier_grade_preferences are used.
+
+    Slopes without a grade count as grade None. Lifts cover no distance.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
+           compiled with prune_dominated=False
+        start: Starting node
+        time_limit: Longest itinerary of interest in minutes
+        preferences: List of dicts from grade to a non-negative weight
+    Returns:
+        ParetoFront
+    """
+    # Dominated parallel edges are only dominated on total distance: a
+    # slower, shorter slope of another grade can still be on the front
+    cg = G if isinstance(G, CompiledGraph) else compile_graph(G, prune_dominated=False)
+    grades = []
+    for e in range(cg.num_edges):
+        if cg.lift[e] < 0 and cg.edge_grades[e] not in grades:
+            grades.append(cg.edge_grades[e])
+    grades = tuple(grades)
+    if preferences is None:
+        preferences = easier_grade_preferences(grades)
+    # Total distance first, as it orders the labels at each state
+    total = {grade: 1 for grade in grades}
+    preferences = [total] + [p for p in preferences
+                             if [p.get(g, 0) for g in grades] != [1] * len(grades)]
+    if not cg.num_nodes or start not in cg.node_index or time_limit < 0:
+        return ParetoFront(cg, grades, preferences, np.zeros(0), np.zeros((0, len(grades))),
+                           [], [], [])
+
+    indptr, target, edge_time, edge_distance, edge_lift = (
+        cg.indptr, cg.target, cg.time, cg.distance, cg.lift
+    )
+    edge_scores = [
+        tuple(p.get(cg.edge_grades[e], 0) * edge_distance[e] for p in preferences)
+        if edge_lift[e] < 0 else None
+        for e in range(cg.num_edges)
+    ]
+
+    # Heap entries: (time_used, -distance, seq, node, last_lift, lift_count,
+    #                scores, parent label, edge id)
+    heap = [(0, 0, 0, cg.node_index[start], -1, 0, (0.0,) * len(preferences), -1, -1)]
+    seq = 1
+    parents, edges = [], []
+    accepted_times, accepted_scores = [], []
+    # (node, last_lift, lift_count) -> (-distance, scores) of the accepted
+    # labels no later accepted label outscores, longest first
+    front_at_state = {}
+
+    while heap:
+        time_used, _, _, node, last_lift, lift_count, scores, parent, edge = heapq.heappop(heap)
+        if _is_covered(front_at_state, node, last_lift, lift_count, scores):
+            continue
+        _insert(front_at_state.setdefault((node, last_lift, lift_count), []), scores)
+
+        label = len(parents)
+        parents.append(parent)
+        edges.append(edge)
+        accepted_times.append(time_used)
+        accepted_scores.append(scores)
+
+        time_left = time_limit - time_used
+        for e in range(indptr[node], indptr[node + 1]):
+            if edge_time[e] > time_left + TIME_EPSILON:
+                continue
+            lift = edge_lift[e]
+            if lift >= 0:
+                if lift == last_lift:
+                    if lift_count >= MAX_LIFT_REPEATS:
+                        continue
+                    next_lift_state = (lift, lift_count + 1)
+                else:
+                    next_lift_state = (lift, 1)
+                new_scores = scores
+            else:
+                next_lift_state = (last_lift, lift_count)
+                new_scores = tuple(a + b for a, b in zip(scores, edge_scores[e]))
+            next_node = target[e]
+            if _is_covered(front_at_state, next_node, *next_lift_state, new_scores):
+                continue
+            heapq.heappush(heap, (time_used + edge_time[e], -new_scores[0], seq, next_node,
+                                  *next_lift_state, new_scores, label, e))
+            seq += 1
+
+    # Plans ending on a lift are beaten by the same plan without the ride
+    ends = np.array([edge < 0 or edge_lift[edge] < 0 for edge in edges], dtype=bool)
+    times = np.array(accepted_times, dtype=np.float64)
+    scores = np.array(accepted_scores, dtype=np.float64)
+    keep = np.flatnonzero(ends)[_non_dominated(times[ends], scores[ends])]
+
+    # km per grade, only needed for the plans on the front
+    column = {grade: i for i, grade in enumerate(grades)}
+    grade_distances = np.zeros((len(keep), len(grades)))
+    for row, i in enumerate(keep):
+        for e in _build_path(parents, edges, int(i)):
+            if edge_lift[e] < 0:
+                grade_distances[row, column[cg.edge_grades[e]]] += edge_distance[e]
+    return ParetoFront(cg, grades, preferences, times[keep], grade_distances,
+                       [int(i) for i in keep], parents, edges)
+
+def _is_covered(front_at_state, node, last_lift, lift_count, scores):
+    """Check whether an accepted label at an equal or freer lift state scores as well on everything."""
+    if _covers(front_at_state.get((node, -1, 0), ()), scores):
+        return True
+    return any(_covers(front_at_state.get((node, last_lift, count), ()), scores)
+               for count in range(1, lift_count + 1))
+
+def _covers(entries, scores):
+    """Check whether any of the (-distance, scores) entries, longest first, scores as well."""
+    distance = scores[0]
+    for neg_distance, other in entries:
+        if -neg_distance < distance:
+            return False
+        for a, b in zip(other, scores):
+            if a < b:
+                break
+        else:
+            return True
+    return False
+
+def _insert(entries, scores):
+    """
+    Add scores to entries, longest first, dropping the entries it outscores.
+
+    A dropped entry would only ever cover scores that the new one covers too.
+    """
+    entry = (-scores[0], scores)
+    position = bisect_right(entries, entry)
+    entries[position:] = [entry] + [
+        (neg_distance, other) for neg_distance, other in entries[position:]
+        if any(a > b for a, b in zip(other, scores))
+    ]
+
+def _non_dominated(times, scores):
+    """Indices, in time order, of the rows no quicker or equally quick row scores as well as."""
+    order = np.lexsort((-scores[:, 0], times))
+    rows = scores.tolist()
+    kept = []
+    entries = []
+    for i in order.tolist():
+        row = tuple(rows[i])
+        if not _covers(entries, row):
+            kept.append(i)
+            _insert(entries, row)
+    return np.array(kept, dtype=np.int64)
@@ -0,0 +1,237 @@
+"""
+Asynchronous planning service for many concurrent clients.
+
+Run a JSON-lines server on localhost, one query per line, answered by
+results in the order they complete:
+    python cli.py --serve 8765 --processes 4
+    echo '{"id": 1, "start": "Vallandry", "time_limit": 240}' | nc localhost 8765
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import multiprocessing
+import os
+
+import batch_planner
+from compiled_graph import CompiledGraph, compile_graph
+from result_cache import graph_fingerprint
+
+# Queries one connection may have outstanding before the server stops
+# reading from it
+MAX_CONNECTION_QUERIES = 32
+
+class PlanningService:
+    """
+    Plans itineraries for asyncio code without blocking the event loop.
+
+    Solves run on a pool of worker processes, each of which receives the
+    compiled graph once when it starts (see batch_planner). On top of that:
+        - Coalescing: identical queries that arrive while one is being
+          solved wait for that solve instead of starting their own, so a
+          burst of the same query costs one search. Queries are identical
+          when start, time limit, distance goal, method and graph
+          fingerprint all match.
+        - Backpressure: at most max_pending distinct solves are queued or
+          running at once. Further queries wait for a slot, which counts
+          against their timeout.
+        - Timeouts: a query that is not answered within its timeout raises
+          asyncio.TimeoutError. The solve itself is shielded and carries
+          on for the other queries waiting for it.
+
+    Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, G, processes=None, max_pending=None, timeout=None, method="labels"):
+        """
+        Args:
+            G: NetworkX graph containing the ski resort, or a CompiledGraph
+            processes: Number of worker processes, None for one per CPU, 0
+                to solve in a single background thread of this process
+            max_pending: Distinct solves queued or running at once, by
+                default twice the number of workers
+            timeout: Default seconds a query may take, None for no limit
+            method: Default solver method, see optimizer.find_max_distance_path
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+        self.processes = processes
+        self.max_pending = max_pending or 2 * max(processes, 1)
+        self.timeout = timeout
+        self.method = method
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._in_flight = {}
+        self._pool = None
+        self.set_graph(G)
+
+        self.solves = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def set_graph(self, G):
+        """
+        Plan on a new version of the resort, for example with a lift closed.
+
+        Solves on the old graph finish for the queries waiting for them, new
+        queries are solved on the new graph by a fresh pool.
+        """
+        cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+        self.cg = cg
+        self.graph_version = graph_fingerprint(cg)
+        old_pool = self._pool
+        if self.processes > 0:
+            # Forked workers would inherit open client connections and keep
+            # them from closing, so workers start from a clean process
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                             initializer=batch_planner._init_worker,
+                                             initargs=(cg,))
+        else:
+            # The thread is handed the graph with every query, as the
+            # worker state of batch_planner belongs to plan_many here
+            self._pool = ThreadPoolExecutor(max_workers=1)
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)
+
+    async def plan(self, start, time_limit, distance_goal=float("inf"), method=None,
+                   timeout=None):
+        """
+        Plan one itinerary.
+
+        Args:
+            start: Starting node
+            time_limit: Available time in minutes
+            distance_goal: Distance in km after which an itinerary is good enough
+            method: Solver method, by default the service's
+            timeout: Seconds to wait for the result, by default the service's
+        Returns:
+            batch_planner.PlanResult with the edge names of the path
+        Raises:
+            ValueError for an unknown start point, asyncio.TimeoutError if
+            the timeout runs out
+        """
+        if start not in self.cg.node_index:
+            raise ValueError(f"Unknown start point: {start}")
+        method = method or self.method
+        timeout = self.timeout if timeout is None else timeout
+        key = (start, time_limit, distance_goal, method, self.graph_version)
+
+        solve = self._in_flight.get(key)
+        if solve is None:
+            solve = asyncio.ensure_future(self._solve(key, self._pool, self.cg))
+            self._in_flight[key] = solve
+            solve.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(solve), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def _solve(self, key, pool, cg):
+        start, time_limit, distance_goal, method, _ = key
+        async with self._slots:
+            self.solves += 1
+            loop = asyncio.get_running_loop()
+            if self.processes > 0:
+                # Whole-graph tasks: bounds are computed once per worker and
+                # graph version, not per distinct time limit
+                task = (start, time_limit, distance_goal, None, method, False)
+                return await loop.run_in_executor(pool, batch_planner._solve_task, task)
+            return await loop.run_in_executor(pool, batch_planner._solve_on, cg, start,
+                                              time_limit, distance_goal, method)
+
+    async def close(self):
+        """Shut the worker pool down once running solves have finished."""
+        await asyncio.get_running_loop().run_in_executor(None, self._pool.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+async def serve(service, host="127.0.0.1", port=0):
+    """
+    Serve JSON-lines queries over TCP.
+
+    Every line is an object with start, time_limit and optionally
+    distance_goal (default: no goal), method, timeout and id. Each result
+    is written as soon as it is ready, as an object with the id (the
+    query's, or its line number on the connection), distance, path and
+    seconds, or the id and an error message, as with cli.py --stream.
+
+    Args:
+        service: PlanningService
+        host: Address to listen on, localhost by default
+        port: Port, 0 for any free one (see server.sockets)
+    Returns:
+        asyncio.Server, already listening
+    """
+    async def handle(reader, writer):
+        outstanding = asyncio.Semaphore(MAX_CONNECTION_QUERIES)
+        tasks = set()
+
+        async def answer(line_number, line):
+            try:
+                result = await _answer(service, line_number, line)
+                writer.write((json.dumps(result) + "\n").encode())
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                outstanding.release()
+
+        line_number = 0
+        try:
+            while True:
+                # Stop reading while the connection has too many queries
+                # outstanding, so TCP flow control slows the client down
+                await outstanding.acquire()
+                line = await reader.readline()
+                if not line:
+                    outstanding.release()
+                    break
+                line_number += 1
+                if not line.strip():
+                    outstanding.release()
+                    continue
+                task = asyncio.ensure_future(answer(line_number, line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+async def run_server(G, port, processes=None, method="labels", host="127.0.0.1"):
+    """Serve queries on G at host:port until cancelled, see serve."""
+    async with PlanningService(G, processes, method=method) as service:
+        server = await serve(service, host, port)
+        async with server:
+            await server.serve_forever()
+
+async def _answer(service, line_number, line):
+    """Plan one query line and turn the outcome into a result object."""
+    try:
+        query = json.loads(line)
+        query_id = query.get("id", line_number)
+        start = query["start"]
+        time_limit = float(query["time_limit"])
+        distance_goal = float(query.get("distance_goal", float("inf")))
+        method = query.get("method")
+        timeout = query.get("timeout")
+        timeout = None if timeout is None else float(timeout)
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        return {"id": line_number, "error": f"Invalid query: {error}"}
+    try:
+        result = await service.plan(start, time_limit, distance_goal, method, timeout)
+    except asyncio.TimeoutError:
+        return {"id": query_id, "error": "Timed out"}
+    except Exception as error:
+        return {"id": query_id, "error": str(error)}
+    return {"id": query_id, "distance": result.distance, "path": result.path,
+            "seconds": result.seconds}
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from bounds import DistanceBounds, compute_bounds, quickest_edges
+
+# File signature and format version of precomputed table files
+MAGIC = b"SKITABLE"
+FORMAT_VERSION = 1
+
+# magic, format version, little endian flag, node count, state count,
+# fastest km per minute, graph_digest of the graph the tables belong to
+HEADER = struct.Struct("<8sIB3xQQd32s")
+
+class PrecomputedTables:
+    """
+    Dense node-to-node tables of a compiled graph for constant-time lookups.
+
+        times: (num_nodes, num_nodes) array of the minimum time in minutes
+            from each node to each other node, inf where it cannot be
+            reached; lift repeat limits are ignored, so it never
+            overestimates
+        bounds: bounds.DistanceBounds of the graph
+
+    Tables loaded from a file are read-only arrays on the mapped file, so
+    processes loading the same file share its pages. attach_tables makes
+    bounds.get_bounds and bounds.get_times_to answer from them.
+    """
+
+    def __init__(self, times, bounds):
+        self.times = times
+        self.bounds = bounds
+
+    def time_between(self, source, target):
+        """Minimum minutes from node id source to node id target, inf if unreachable."""
+        return float(self.times[source, target])
+
+    def times_to(self, end):
+        """Minimum minutes from every node id to end as a list, as bounds.times_to."""
+        return self.times[:, end].tolist()
+
+    def distance_bound(self, node, time_left):
+        """Upper bound on the km coverable from node id node within time_left minutes."""
+        return self.bounds.bound(node, -1, 0, time_left)
+
+def compute_tables(cg):
+    """
+    Compute the PrecomputedTables of a compiled graph.
+
+    Times come from Dijkstra from every node at once with
+    scipy.sparse.csgraph, over the quickest of any parallel edges.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    times = dijkstra(quickest_edges(cg), directed=True)
+    return PrecomputedTables(times, compute_bounds(cg))
+
+def attach_tables(cg, tables):
+    """Make bounds.get_bounds and bounds.get_times_to of cg use tables."""
+    cg._precomputed = tables
+    cg._distance_bounds = tables.bounds
+    cg.__dict__.pop("_times_to", None)
+
+def graph_digest(cg):
+    """SHA-256 digest of the nodes, adjacency, times and distances of a compiled graph."""
+    digest = hashlib.sha256(json.dumps(cg.nodes).encode())
+    for name in ("indptr", "target", "lift", "time", "distance"):
+        digest.update(memoryview(getattr(cg, name)).cast("B"))
+    return digest.digest()
+
+def save_tables(tables, path, digest=b""):
+    """
+    Write PrecomputedTables to a file that load_tables can map.
+
+    The file is a fixed header followed by the times matrix and the states,
+    rates and potentials of the bounds in native byte order, each aligned to
+    8 bytes. It is written to a temporary file first and renamed, as in
+    snapshot.save_snapshot.
+
+    Args:
+        tables: PrecomputedTables
+        path: File name
+        digest: graph_digest of the graph the tables were computed for
+    """
+    bounds = tables.bounds
+    num_nodes = len(tables.times)
+    states = np.array(list(bounds.state_index), dtype=np.int32).reshape(-1, 3)
+    # DistanceBounds numbers states in insertion order, which the file keeps
+    arrays = (np.ascontiguousarray(tables.times, dtype=np.float64), states,
+              np.array(bounds.rate, dtype=np.float64), np.array(bounds.potential, dtype=np.float64))
+    offsets, end = _layout(num_nodes, len(states))
+
+    buffer = bytearray(end)
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, sys.byteorder == "little",
+                     num_nodes, len(states), bounds.fastest, digest)
+    for data, offset in zip(arrays, offsets):
+        buffer[offset:offset + data.nbytes] = data.tobytes()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def load_tables(path, digest=None):
+    """
+    Memory-map a file written by save_tables as PrecomputedTables.
+
+    Args:
+        path: Table file
+        digest: If given, the graph_digest the tables must belong to
+    Returns:
+        PrecomputedTables
+    Raises:
+        ValueError if the file is not a table file of this format version
+        and byte order, or belongs to a different graph
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise ValueError(f"{path} is not a table file")
+    magic, version, little_endian, num_nodes, num_states, fastest, stored_digest = (
+        HEADER.unpack_from(mapped))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a table file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has table version {version}, expected {FORMAT_VERSION}")
+    if bool(little_endian) != (sys.byteorder == "little"):
+        raise ValueError(f"{path} was written with a different byte order")
+    if digest is not None and stored_digest != digest.ljust(32, b"\0"):
+        raise ValueError(f"{path} was computed for a different graph")
+    offsets, end = _layout(num_nodes, num_states)
+    if end > len(mapped):
+        raise ValueError(f"{path} is truncated or corrupt")
+
+    times = np.frombuffer(mapped, dtype=np.float64, count=num_nodes * num_nodes,
+                          offset=offsets[0]).reshape(num_nodes, num_nodes)
+    states = np.frombuffer(mapped, dtype=np.int32, count=num_states * 3,
+                           offset=offsets[1]).reshape(num_states, 3)
+    rate = np.frombuffer(mapped, dtype=np.float64, count=num_states, offset=offsets[2])
+    potential = np.frombuffer(mapped, dtype=np.float64, count=num_states, offset=offsets[3])
+    state_index = {state: i for i, state in enumerate(map(tuple, states.tolist()))}
+    # The bounds are looked up per label, where lists beat array indexing
+    bounds = DistanceBounds(state_index, rate.tolist(), potential.tolist(), fastest)
+    return PrecomputedTables(times, bounds)
+
+def load_resort_tables(resort_path, cg=None, tables_path=None):
+    """
+    PrecomputedTables of a resort file, cached in a file next to it.
+
+    The tables are recomputed when the file is missing, from another format
+    version, or computed for a graph with a different graph_digest, such as
+    after the resort file changed. They are attached to the compiled graph,
+    see attach_tables.
+
+    Args:
+        resort_path: JSON or CSV resort file, see load_graph.read_resort
+        cg: Compiled graph of the resort, by default
+            snapshot.load_compiled_resort(resort_path)
+        tables_path: Table file, by default the resort file name with the
+            extension .skitables
+    Returns:
+        PrecomputedTables, held in memory if the table file cannot be
+        written, for example in a read-only directory
+    """
+    if cg is None:
+        from snapshot import load_compiled_resort
+        cg = load_compiled_resort(resort_path)
+    if tables_path is None:
+        tables_path = os.path.splitext(resort_path)[0] + ".skitables"
+    digest = graph_digest(cg)
+    try:
+        tables = load_tables(tables_path, digest)
+    except (OSError, ValueError):
+        tables = compute_tables(cg)
+        try:
+            save_tables(tables, tables_path, digest)
+            tables = load_tables(tables_path, digest)
+        except OSError:
+            pass
+    attach_tables(cg, tables)
+    return tables
+
+def _layout(num_nodes, num_states):
+    """Byte offsets of times, states, rate and potential, and the file size."""
+    offsets = []
+    offset = HEADER.size
+    for size in (num_nodes * num_nodes * 8, num_states * 12, num_states * 8, num_states * 8):
+        offset = (offset + 7) // 8 * 8
+        offsets.append(offset)
+        offset += size
+    return offsets, offset
@@ -0,0 +1,162 @@
+from array import array
+
+from compiled_graph import CompiledGraph, shortest_times
+
+class GraphReduction:
+    """
+    A smaller compiled graph for one query, and how to map results back.
+
+    Every itinerary of the reduced graph is an itinerary of the original
+    graph with the same time, distance and lift repeats, and the other way
+    round for itineraries that fit the time limit, so solving the reduced
+    graph gives the same optimum.
+    """
+
+    def __init__(self, graph, original, expansion):
+        self.graph = graph
+        self.original = original
+        # Reduced edge id -> tuple of the original edge ids it stands for
+        self.expansion = expansion
+
+    def expand(self, edge_ids):
+        """Translate reduced edge ids into original edge ids."""
+        return [original for e in edge_ids for original in self.expansion[e]]
+
+    def map_bounds(self, bounds):
+        """
+        Reuse DistanceBounds of the original graph for the reduced graph.
+
+        Bounds hold per (node, last lift, lift repeat count) state, and the
+        reduced graph has at most the itineraries of the original from a
+        state, so the bounds stay admissible once node ids are translated.
+        Nodes left without a way out get a bound of zero, which keeps
+        branch and bound and its greedy seed from aiming at them.
+        """
+        from bounds import DistanceBounds
+        graph = self.graph
+        new_id = {self.original.node_index[node]: i for i, node in enumerate(graph.nodes)}
+        dead_end = len(bounds.rate)
+        state_index = {}
+        for (node, last_lift, lift_count), state in bounds.state_index.items():
+            if node in new_id:
+                node = new_id[node]
+                if graph.indptr[node] == graph.indptr[node + 1]:
+                    state = dead_end
+                state_index[(node, last_lift, lift_count)] = state
+        return DistanceBounds(state_index, bounds.rate + [0.0], bounds.potential + [0.0],
+                              bounds.fastest)
+
+def reduce_graph(cg, start, time_limit, contract=True):
+    """
+    Shrink a compiled graph for searches from start within time_limit.
+
+    Three reductions are applied:
+        - Nodes that cannot be reached from start within time_limit are
+          dropped, and so are edges that cannot be finished in time.
+        - Pass-through nodes are contracted: when a node other than start
+          has a single way in or a single way out, every pair of a way in
+          and a way out becomes a macro-edge, and the node keeps its
+          incoming edges as a place to stop but loses its ways out.
+          Macro-edges contain at most one lift, so they change the lift
+          state exactly like that lift, and lift repeat limits are
+          unaffected. Contraction repeats until no such node is left, so
+          chains become single macro-edges.
+        - Parallel edges dominated by another edge with the same effect on
+          the lift state (at least as fast and at least as long) are
+          removed.
+
+    Args:
+        cg: CompiledGraph
+        start: Starting node name
+        time_limit: Available time in minutes
+        contract: Contract pass-through nodes
+    Returns:
+        GraphReduction
+    """
+    start_id = cg.node_index[start]
+    earliest = shortest_times(cg, start_id, time_limit)
+
+    # Edges as (source, target, time, distance, lift, original edge ids)
+    out_edges = {node: [] for node in earliest}
+    in_edges = {node: [] for node in earliest}
+
+    def add(edge):
+        out_edges[edge[0]].append(edge)
+        in_edges[edge[1]].append(edge)
+
+    def remove(edge):
+        out_edges[edge[0]].remove(edge)
+        in_edges[edge[1]].remove(edge)
+
+    for node, reached in earliest.items():
+        for e in cg.out_edges(node):
+            target = cg.target[e]
+            if target in earliest and reached + cg.time[e] <= time_limit + 1e-9:
+                add((node, target, cg.time[e], cg.distance[e], cg.lift[e], (e,)))
+
+    if contract:
+        pending = list(earliest)
+        while pending:
+            node = pending.pop()
+            incoming, outgoing = in_edges[node], out_edges[node]
+            if node == start_id or not incoming or not outgoing:
+                continue
+            # Contraction replaces the ways out by a macro-edge per way in
+            # and way out, so only do it where that adds few edges
+            if len(incoming) > 1 and len(outgoing) > 1:
+                continue
+            if any(edge[0] == edge[1] for edge in outgoing):
+                continue
+            if any(way_out[4] >= 0 for way_out in outgoing) and any(edge[4] >= 0 for edge in incoming):
+                # A macro-edge would contain two lifts
+                continue
+            for way_out in list(outgoing):
+                remove(way_out)
+                pending.append(way_out[1])
+                for edge in list(incoming):
+                    time = edge[2] + way_out[2]
+                    if earliest[edge[0]] + time > time_limit + 1e-9:
+                        continue
+                    add((edge[0], way_out[1], time, edge[3] + way_out[3],
+                         max(edge[4], way_out[4]), edge[5] + way_out[5]))
+            # The sources may have become pass-through nodes themselves
+            pending.extend(edge[0] for edge in incoming)
+
+    nodes = sorted(earliest)
+    new_id = {node: i for i, node in enumerate(nodes)}
+    indptr = array("i", [0])
+    target, time, distance, is_lift, lift = array("i"), array("d"), array("d"), array("B"), array("i")
+    edge_names, edge_grades, edge_keys, expansion = [], [], [], []
+    for node in nodes:
+        for edge in _without_dominated(out_edges[node]):
+            target.append(new_id[edge[1]])
+            time.append(edge[2])
+            distance.append(edge[3])
+            is_lift.append(1 if edge[4] >= 0 else 0)
+            lift.append(edge[4])
+            originals = edge[5]
+            edge_names.append(" + ".join(cg.edge_names[e] for e in originals))
+            edge_grades.append(cg.edge_grades[originals[0]] if len(originals) == 1 else None)
+            edge_keys.append(tuple(cg.edge_keys[e] for e in originals)
+                             if len(originals) > 1 else cg.edge_keys[originals[0]])
+            expansion.append(originals)
+        indptr.append(len(target))
+
+    graph = CompiledGraph([cg.nodes[node] for node in nodes], indptr, target, time, distance,
+                          is_lift, lift, edge_names, edge_grades, edge_keys, cg.lift_names,
+                          dominated_pruned=True)
+    return GraphReduction(graph, cg, expansion)
+
+def _without_dominated(edges):
+    """Remove edges that another edge to the same node with the same lift dominates."""
+    kept = []
+    for i, edge in enumerate(edges):
+        for j, other in enumerate(edges):
+            if i == j or other[1] != edge[1] or other[4] != edge[4]:
+                continue
+            if other[2] <= edge[2] and other[3] >= edge[3] and (
+                    other[2] < edge[2] or other[3] > edge[3] or j < i):
+                break
+        else:
+            kept.append(edge)
+    return kept
@@ -0,0 +1,383 @@
+"""
+Headless rendering of resort maps with itineraries drawn on top.
+
+The resort map is drawn once per ResortRenderer, with the Agg canvas and
+no pyplot, so no display or global figure state is involved. For PNG
+output, every itinerary restores the cached map pixels and draws only its
+own highlighted edges, start marker and title before the pixels are
+encoded, so one figure is reused for any number of maps. SVG output
+redraws the figure each time, since vector files cannot be composited.
+
+Plan a file of JSON-lines queries (as for cli.py --stream) and write one
+map per query:
+    python render.py queries.jsonl --output maps --processes 8 --format png
+"""
+import argparse
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# Line colors of the edges of the map
+GRADE_COLORS = {"blue": "blue", "red": "red", "black": "black"}
+LIFT_COLOR = "gray"
+
+# Color of the highlighted itinerary
+ITINERARY_COLOR = "#ff8c00"
+
+# Points along each drawn edge curve
+CURVE_POINTS = 16
+
+# One map to draw: output file name, start node, path as returned by
+# find_max_distance_path (edge names or edge keys) and an optional title
+MapJob = namedtuple("MapJob", ["filename", "start", "path", "title"], defaults=[None])
+
+# Per-process renderer for pool workers
+_worker_renderer = None
+
+def wrap_text(text, width=10):
+    """Wrap text at specified width."""
+    words = text.split()
+    lines = []
+    current_line = []
+    current_length = 0
+
+    for word in words:
+        if current_length + len(word) + 1 <= width:
+            current_line.append(word)
+            current_length += len(word) + 1
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+            current_length = len(word)
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return '\n'.join(lines)
+
+def node_positions(node_rows):
+    """
+    Map coordinates of every node: rows from top (y = 1) to bottom (y = 0),
+    nodes spread horizontally around x = 0 within their row.
+    """
+    pos = {}
+    total_rows = len(node_rows)
+    for row_idx, row in enumerate(node_rows):
+        y = 1 - (row_idx / max(total_rows - 1, 1))
+        for col_idx, node in enumerate(row):
+            x = (col_idx - (len(row) - 1) / 2) / max(4, len(row))
+            pos[node] = (x * 1.5, y)
+    return pos
+
+def edge_curvatures(G, pos):
+    """
+    Curvature (arc3 rad) of every edge of the map.
+
+    Edges between the same two nodes are grouped into upward ones (lifts,
+    and slopes that do not go down a row) and downward ones, which bend to
+    opposite sides, with parallel edges bending further out.
+
+    Args:
+        G: NetworkX resort graph with a "row" attribute on every node
+        pos: Node positions, see node_positions
+    Returns:
+        dict mapping every edge (u, v, key) to its curvature
+    """
+    edge_groups = {}
+    for u, v, key, data in G.edges(keys=True, data=True):
+        directions = edge_groups.setdefault(frozenset([u, v]), {'up': [], 'down': []})
+        # A higher row number is a lower altitude
+        if data['distance'] != 0 and G.nodes[v]['row'] > G.nodes[u]['row']:
+            directions['down'].append((u, v, key))
+        else:
+            directions['up'].append((u, v, key))
+
+    curvatures = {}
+    for directions in edge_groups.values():
+        for direction, sign in (('up', 1), ('down', -1)):
+            edges = directions[direction]
+            for i, (u, v, key) in enumerate(edges):
+                # Curve to the side the edge is heading, upward and downward
+                # edges opposite to each other
+                base_rad = 0.4 if pos[u][0] < pos[v][0] else -0.4
+                spread = 0.2 * i if len(edges) > 1 else 0
+                curvatures[(u, v, key)] = sign * (base_rad + spread)
+    return curvatures
+
+def curve_points(start, end, rad, points=CURVE_POINTS):
+    """Points of the arc3 curve between two positions, as an array of shape (points, 2)."""
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    dx, dy = end - start
+    control = (start + end) / 2 + rad * np.array([dy, -dx])
+    t = np.linspace(0, 1, points)[:, None]
+    return (1 - t) ** 2 * start + 2 * (1 - t) * t * control + t ** 2 * end
+
+def write_png(filename, pixels):
+    """
+    Write an RGB image as PNG, quickly rather than small.
+
+    Rows are stored unfiltered with the fastest zlib level: maps are mostly
+    flat color, which compresses well without filtering, at about half the
+    time of matplotlib's or Pillow's adaptive filtering.
+
+    Args:
+        filename: Output file
+        pixels: uint8 array of shape (height, width, 3)
+    """
+    height, width, _ = pixels.shape
+    # Each row starts with its filter type, 0 for none
+    rows = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, -1)
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data)))
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bits per channel, color type 2 (RGB), no interlacing
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 1)))
+        f.write(chunk(b"IEND", b""))
+
+class ResortRenderer:
+    """
+    Draws itinerary maps of one resort, reusing one cached map.
+
+    The figure is kept for the renderer's lifetime and only the itinerary
+    layer changes between maps, so memory stays flat however many maps
+    are written.
+    """
+
+    def __init__(self, G, node_rows=None, size=(12, 8), dpi=100, edge_labels=False,
+                 title="Les Arcs Ski Resort"):
+        """
+        Args:
+            G: NetworkX resort graph from load_graph, with "row" node attributes
+            node_rows: Nodes by row, top row first, by default from the
+                "row" attributes
+            size: Figure size in inches
+            dpi: Pixels per inch of PNG output
+            edge_labels: Draw slope and lift names on the map
+            title: Title of the map, the itinerary's is drawn below it
+        """
+        # Imported here so that the layout helpers stay usable without matplotlib
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        from matplotlib.figure import Figure
+        from matplotlib.lines import Line2D
+
+        if node_rows is None:
+            rows = {}
+            for node, row in G.nodes(data='row'):
+                rows.setdefault(row, []).append(node)
+            node_rows = [rows[row] for row in sorted(rows)]
+        self.G = G
+        self._pos = pos = node_positions(node_rows)
+        self._curves = {edge: curve_points(pos[edge[0]], pos[edge[1]], rad)
+                        for edge, rad in edge_curvatures(G, pos).items()}
+
+        figure = Figure(figsize=size, dpi=dpi, facecolor='white')
+        self.figure = figure
+        self.canvas = FigureCanvasAgg(figure)
+        ax = figure.add_axes([0, 0, 1, 0.94])
+        ax.set_axis_off()
+        xs, ys = zip(*pos.values())
+        ax.set_xlim(min(xs) - 0.25, max(xs) + 0.25)
+        ax.set_ylim(min(ys) - 0.1, max(ys) + 0.1)
+        self.ax = ax
+
+        # Marker areas are in points squared, scaled with the figure
+        node_size = 2000 * (size[0] / 18) ** 2
+        styles = {}
+        for (u, v, key), curve in self._curves.items():
+            data = G.edges[u, v, key]
+            color = LIFT_COLOR if data['distance'] == 0 else GRADE_COLORS[data['grade']]
+            styles.setdefault(color, []).append(curve)
+            if edge_labels:
+                x, y = curve[len(curve) // 4]
+                ax.text(x, y, wrap_text(data['name']), fontsize=6, color=color,
+                        ha='center', va='center', zorder=3,
+                        bbox=dict(facecolor='white', edgecolor=color, alpha=0.7, pad=1))
+        for color, curves in styles.items():
+            ax.add_collection(LineCollection(
+                curves, colors=color, alpha=0.7, linewidths=1.0, zorder=1,
+                linestyles=(0, (2, 2)) if color == LIFT_COLOR else 'solid'))
+        ax.scatter(xs, ys, s=node_size, c='lightblue', alpha=0.7, zorder=2)
+        for node, (x, y) in pos.items():
+            ax.text(x, y, wrap_text(node, width=15), fontsize=7, fontweight='bold',
+                    ha='center', va='center', zorder=4,
+                    bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=2))
+        ax.legend(handles=[
+            Line2D([0], [0], color=LIFT_COLOR, label='Lifts', linewidth=2, linestyle='--'),
+            Line2D([0], [0], color='blue', label='Blue Slopes', linewidth=2),
+            Line2D([0], [0], color='red', label='Red Slopes', linewidth=2),
+            Line2D([0], [0], color='black', label='Black Slopes', linewidth=2),
+            Line2D([0], [0], color=ITINERARY_COLOR, label='Itinerary', linewidth=4),
+        ], loc='lower right', fontsize=8, framealpha=0.8)
+        figure.text(0.5, 0.975, title, ha='center', va='center', size=14)
+
+        # The itinerary layer is animated: left out of normal draws and
+        # drawn on top of the cached map instead, translucent so that the
+        # node names stay readable
+        self._route = LineCollection([], colors=ITINERARY_COLOR, alpha=0.6, zorder=6,
+                                     capstyle='round', animated=True)
+        ax.add_collection(self._route)
+        self._start = ax.scatter([], [], s=node_size / 4, c='green', marker='*', zorder=7,
+                                 animated=True)
+        self._caption = figure.text(0.5, 0.945, '', ha='center', va='center', size=11,
+                                    animated=True)
+        self._layers = (self._route, self._start, self._caption)
+
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(figure.bbox)
+
+    def edge_keys(self, start, path):
+        """
+        Graph edges (u, v, key) of a path given by edge names or edge keys.
+
+        Names of parallel edges resolve to the first matching edge, as in
+        optimizer.print_path_breakdown.
+        """
+        edges = []
+        node = start
+        for step in path:
+            if isinstance(step, (tuple, list)):
+                edge = tuple(step)
+            else:
+                edge = next((key for key in self.G.out_edges(node, keys=True)
+                             if self.G.edges[key]['name'] == step), None)
+            if edge is None or edge[0] != node or edge not in self._curves:
+                raise ValueError(f"No edge {step!r} leaves {node}")
+            edges.append(edge)
+            node = edge[1]
+        return edges
+
+    def render(self, filename, start, path, title=None):
+        """
+        Write a map of one itinerary.
+
+        Edges are highlighted, wider the more often the itinerary takes
+        them (up to five times), and the start is marked.
+
+        Args:
+            filename: Output file, ending in .png or .svg
+            start: Starting node
+            path: As returned by find_max_distance_path, edge names or keys
+            title: Caption, by default the start and the distance
+        """
+        if start not in self._pos:
+            raise ValueError(f"Unknown start node: {start}")
+        edges = self.edge_keys(start, path)
+        if title is None:
+            distance = sum(self.G.edges[edge]['distance'] for edge in edges)
+            title = f"From {start}: {distance:.1f} km"
+        counts = Counter(edges)
+        self._route.set_segments([self._curves[edge] for edge in counts])
+        self._route.set_linewidths([3 + 1.5 * min(count - 1, 4) for count in counts.values()])
+        self._start.set_offsets([self._pos[start]])
+        self._caption.set_text(title)
+
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".svg":
+            for layer in self._layers:
+                layer.set_animated(False)
+            try:
+                self.figure.savefig(filename, format="svg")
+            finally:
+                for layer in self._layers:
+                    layer.set_animated(True)
+        elif extension == ".png":
+            self.canvas.restore_region(self._background)
+            for layer in self._layers:
+                self.figure.draw_artist(layer)
+            write_png(filename, np.asarray(self.canvas.buffer_rgba())[:, :, :3])
+        else:
+            raise ValueError(f"Unsupported map file type: {filename}")
+
+def render_many(G, jobs, node_rows=None, processes=None, chunksize=16, **options):
+    """
+    Write many itinerary maps, spread over a process pool.
+
+    Each worker builds one ResortRenderer when it starts and reuses it for
+    all its maps.
+
+    Args:
+        G: NetworkX resort graph
+        jobs: Iterable of MapJob, or (filename, start, path[, title]) tuples
+        node_rows: See ResortRenderer
+        processes: Number of worker processes, None for one per CPU, 0 or 1
+            to render in the calling process
+        chunksize: Maps sent to a worker at a time
+        options: Further ResortRenderer arguments, such as size or dpi
+    Returns:
+        List of seconds spent on each map, in the order of jobs
+    """
+    jobs = [MapJob(*job) for job in jobs]
+    if not jobs:
+        return []
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        _init_worker(G, node_rows, options)
+        try:
+            return [_render_task(job) for job in jobs]
+        finally:
+            _init_worker(None, None, None)
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(G, node_rows, options)) as pool:
+        return list(pool.map(_render_task, jobs, chunksize=chunksize))
+
+def _init_worker(G, node_rows, options):
+    global _worker_renderer
+    _worker_renderer = None if G is None else ResortRenderer(G, node_rows, **options)
+
+def _render_task(job):
+    t0 = time.perf_counter()
+    _worker_renderer.render(*job)
+    return time.perf_counter() - t0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("queries", help="JSON-lines file of queries with start, time_limit, "
+                                        "and optionally distance_goal and id")
+    parser.add_argument("-o", "--output", default="maps", help="Directory for the maps")
+    parser.add_argument("-f", "--format", default="png", choices=["png", "svg"])
+    parser.add_argument("-r", "--resort", help="Resort JSON or CSV file (default: Les Arcs)")
+    parser.add_argument("-p", "--processes", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    from batch_planner import plan_many
+    from load_graph import LES_ARCS_PATH, load_resort
+
+    G, node_rows = load_resort(args.resort or LES_ARCS_PATH)
+    with open(args.queries) as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    results = plan_many(G, [(query["start"], float(query["time_limit"]),
+                             float(query.get("distance_goal", float("inf"))))
+                            for query in queries], processes=args.processes, edge_keys=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = [MapJob(os.path.join(args.output, f"{query.get('id', i)}.{args.format}"),
+                   query["start"], result.path)
+            for i, (query, result) in enumerate(zip(queries, results), start=1)]
+    t0 = time.perf_counter()
+    seconds = render_many(G, jobs, node_rows, args.processes, dpi=args.dpi)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(jobs)} maps in {elapsed:.2f}s, "
+          f"{1000 * sum(seconds) / max(len(seconds), 1):.1f} ms per map per process",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+
+from compiled_graph import CompiledGraph
+import optimizer
+
+def graph_fingerprint(G):
+    """
+    Content hash of a resort graph: its nodes, edges and edge attributes.
+
+    Any change that can alter a plan, such as a closed lift or a changed
+    slope time, gives a different fingerprint.
+
+    Args:
+        G: NetworkX graph containing the ski resort, or a CompiledGraph
+    Returns:
+        Hex digest string
+    """
+    if isinstance(G, CompiledGraph):
+        nodes = list(G.nodes)
+        edges = sorted(
+            [repr(G.edge_keys[e]), G.edge_names[e], G.time[e], G.distance[e], G.edge_grades[e]]
+            for e in range(G.num_edges)
+        )
+    else:
+        nodes = list(G.nodes())
+        if G.is_multigraph():
+            items = G.edges(keys=True, data=True)
+        else:
+            items = G.edges(data=True)
+        edges = sorted(
+            [repr(item[:-1]), json.dumps(item[-1], sort_keys=True, default=str)]
+            for item in items
+        )
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([sorted(map(repr, nodes)), edges], default=str).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Memoizing cache of find_max_distance_path results.
+
+    Entries are keyed on the graph fingerprint plus the query, so editing
+    the graph (for example removing a closed lift) makes earlier entries
+    unreachable without explicit invalidation. The in-memory tier keeps the
+    maxsize most recently used results; with a path, results are also
+    stored in an SQLite file that survives restarts.
+    """
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def find_max_distance_path(self, G, start, time_limit, distance_goal, method="labels",
+                               edge_keys=False, fingerprint=None, reduce=False, end=None,
+                               schedules=None, start_time=None):
+        """
+        Cached optimizer.find_max_distance_path, with the same arguments.
+
+        Every call returns a fresh path list, so callers may change it
+        without changing the cached result.
+
+        Args:
+            fingerprint: Precomputed graph_fingerprint(G), to skip hashing
+                         the graph on every call
+        """
+        if fingerprint is None:
+            fingerprint = graph_fingerprint(G)
+        key = json.dumps([fingerprint, start, time_limit, distance_goal, method, edge_keys,
+                          reduce, end, _schedules_key(schedules), start_time], default=str)
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            distance, path = self._memory[key]
+            return distance, list(path)
+
+        result = self._load(key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = optimizer.find_max_distance_path(
+                G, start, time_limit, distance_goal, method=method, edge_keys=edge_keys,
+                reduce=reduce, end=end, schedules=schedules, start_time=start_time
+            )
+            self._store(key, result)
+
+        distance, path = result
+        self._remember(key, (distance, tuple(path)))
+        return distance, list(path)
+
+    def stats(self):
+        """Return hit and miss counters and the current in-memory size."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._memory),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        """Drop all entries from both tiers and reset the counters."""
+        self._memory.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        if self._db is not None:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        distance, path = json.loads(row[0])
+        return distance, [tuple(edge) if isinstance(edge, list) else edge for edge in path]
+
+    def _store(self, key, result):
+        if self._db is None:
+            return
+        self._db.execute("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                         (key, json.dumps(result)))
+        self._db.commit()
+
+def _schedules_key(schedules):
+    """Lift schedules as sorted (lift name, clock times, lift times) lists, or None."""
+    if schedules is None:
+        return None
+    from lift_schedules import LiftTimetable
+    if isinstance(schedules, LiftTimetable):
+        cg = schedules.cg
+        schedules = {cg.lift_names[cg.lift[e]]: schedule
+                     for e, schedule in enumerate(schedules.edge_schedules) if schedule is not None}
+    return sorted([name, schedule.clocks, schedule.times] for name, schedule in schedules.items())
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+import time
+
+class SearchStats:
+    """
+    Counters, phase timers and an optional trace of one optimizer run.
+
+    Pass stats=True, or a SearchStats to configure tracing, to
+    find_max_distance_path to get one back next to the result. Counters:
+        pops: Labels taken off the queue
+        expansions: Labels accepted and expanded
+        dominated: Labels dropped because an equal or better label was
+            already accepted for their state (the visited check in "bfs")
+        bound_pruned: Labels dropped by branch and bound
+        time_dropped: Edges skipped because they do not fit in the time left
+        lift_repeat_dropped: Lifts skipped because of MAX_LIFT_REPEATS
+        pushes: Labels put on the queue
+        queue_peak: Largest queue size seen
+    phases maps a phase name ("compile", "reduce", "bounds", "seed",
+    "search", "path") to seconds spent in it. With trace_every, every trace_every-th
+    expanded label is recorded in trace as (time used, node, distance, last
+    lift, lift repeat count), keeping at most trace_limit entries.
+    The "dp" method only reports phases.
+    """
+
+    COUNTERS = ("pops", "expansions", "dominated", "bound_pruned", "time_dropped",
+                "lift_repeat_dropped", "pushes", "queue_peak")
+
+    def __init__(self, trace_every=0, trace_limit=10000):
+        self.trace_every = trace_every
+        self.trace_limit = trace_limit
+        self.method = None
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.phases = {}
+        self.trace = []
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the with block to phases[name]."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - t0
+
+    def as_dict(self):
+        """Plain dict of the method, counters, phases and trace, e.g. for JSON metrics."""
+        result = {"method": self.method}
+        result.update((name, getattr(self, name)) for name in self.COUNTERS)
+        result["phases"] = dict(self.phases)
+        result["trace"] = list(self.trace)
+        return result
+
+    def __repr__(self):
+        counters = ", ".join(f"{name}={getattr(self, name)}" for name in self.COUNTERS)
+        phases = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.phases.items())
+        return f"SearchStats(method={self.method!r}, {counters}, phases: {phases})"
+
+@contextmanager
+def maybe_phase(stats, name):
+    """stats.phase(name) if stats is given, otherwise do nothing."""
+    if stats is None:
+        yield
+    else:
+        with stats.phase(name):
+            yield
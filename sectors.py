@@ -0,0 +1,311 @@
+from collections import namedtuple
+
+import numpy as np
+
+from compiled_graph import CompiledGraph, compile_graph
+from dp_solver import TickTable, _build_transitions, _to_ticks, num_ticks
+from optimizer import MAX_LIFT_REPEATS
+
+# Best distance against time within one sector from a root state, as
+# Pareto breakpoints: exits maps each exit state (node id, last lift, lift
+# repeat count) to arrays (ticks, distance); finish holds the same for
+# itineraries that end anywhere in the sector
+Profile = namedtuple("Profile", ["exits", "finish"])
+
+def partition_sectors(cg, max_size=None):
+    """
+    Split a compiled graph into sectors of nodes.
+
+    All ends of a lift's edges go into one sector, so lift repeats never
+    span sectors. These lift systems are then merged greedily, most closely
+    linked pairs first (edges between them per pair of nodes), as long as
+    the merged sector has at most max_size nodes. Fewer, larger sectors
+    mean fewer portals but longer profile computations.
+
+    Args:
+        cg: CompiledGraph
+        max_size: Largest sector, by default twice the square root of the
+            number of nodes, and at least 8
+    Returns:
+        List of sectors, each a sorted list of node ids
+    """
+    n = cg.num_nodes
+    if max_size is None:
+        max_size = max(8, int(2 * np.sqrt(n)))
+    group = list(range(n))
+
+    def find(node):
+        while group[node] != node:
+            group[node] = group[group[node]]
+            node = group[node]
+        return node
+
+    source = cg.source()
+    lift_node = {}
+    for e in range(cg.num_edges):
+        if cg.lift[e] >= 0:
+            for node in (source[e], cg.target[e]):
+                first = lift_node.setdefault(cg.lift[e], node)
+                group[find(node)] = find(first)
+
+    size = {}
+    for node in range(n):
+        size[find(node)] = size.get(find(node), 0) + 1
+    while True:
+        links = {}
+        for e in range(cg.num_edges):
+            a, b = find(source[e]), find(cg.target[e])
+            if a != b and size[a] + size[b] <= max_size:
+                pair = (min(a, b), max(a, b))
+                links[pair] = links.get(pair, 0) + 1
+        if not links:
+            break
+        a, b = max(links, key=lambda pair: (links[pair] / (size[pair[0]] * size[pair[1]]),
+                                            -pair[0], -pair[1]))
+        group[b] = a
+        size[a] += size.pop(b)
+
+    sectors = {}
+    for node in range(n):
+        sectors.setdefault(find(node), []).append(node)
+    return sorted(sectors.values())
+
+class SectorPlanner:
+    """
+    Hierarchical planner over sectors of a resort joined through portal nodes.
+
+    Every itinerary splits into segments that stay inside one sector,
+    joined by edges between sectors. Entry portals are the nodes such edges
+    lead to, exit portals the nodes they leave from. For every entry
+    portal, a dynamic program over time ticks within its sector (as in
+    dp_solver) gives the best distance against time to every exit portal
+    state and to anywhere in the sector, kept as Pareto breakpoints. These
+    profiles are precomputed up to the horizon.
+
+    A query then runs the same tick dynamic program on the portal level:
+    states are (portal, last lift, lift repeat count), and its transitions
+    are the edges between sectors and the profile breakpoints. Only the
+    segments of the chosen itinerary are expanded into slopes and lifts,
+    by solving those sectors again. Lift states are carried through
+    portals, so the result obeys the lift repeat rule and is as good as
+    dp_solver's on the whole graph. Query time depends on the number of
+    portals and profile breakpoints, not on the size of the sectors.
+    """
+
+    def __init__(self, G, horizon, sectors=None, max_sector_size=None):
+        """
+        Args:
+            G: NetworkX graph containing the ski resort, or a CompiledGraph
+            horizon: Longest time limit of any query in minutes
+            sectors: List of lists of node names, covering every node once,
+                by default partition_sectors
+            max_sector_size: See partition_sectors
+        """
+        cg = G if isinstance(G, CompiledGraph) else compile_graph(G)
+        self.cg = cg
+        self.horizon = horizon
+        if sectors is None:
+            sectors = partition_sectors(cg, max_sector_size)
+        else:
+            sectors = [[cg.node_index[node] for node in sector] for sector in sectors]
+        self.sector_of = np.full(cg.num_nodes, -1, dtype=np.int64)
+        for i, sector in enumerate(sectors):
+            if (self.sector_of[sector] >= 0).any():
+                raise ValueError("A node is in more than one sector")
+            self.sector_of[sector] = i
+        if (self.sector_of < 0).any():
+            raise ValueError(f"{cg.nodes[int(np.argmin(self.sector_of))]} is in no sector")
+        self.sectors = sectors
+
+        edge_id = {key: e for e, key in enumerate(cg.edge_keys)}
+        self._subgraphs = []
+        for sector in sectors:
+            sub = cg.subgraph(sector)
+            nodes = [cg.node_index[node] for node in sub.nodes]
+            edges = [edge_id[key] for key in sub.edge_keys]
+            lifts = {sub.lift[e] for e in range(sub.num_edges) if sub.lift[e] >= 0}
+            self._subgraphs.append((sub, nodes, edges, lifts))
+
+        source = cg.source()
+        self.bridges = [e for e in range(cg.num_edges)
+                        if self.sector_of[source[e]] != self.sector_of[cg.target[e]]]
+        self.exits = sorted({source[e] for e in self.bridges})
+        self.entries = sorted({cg.target[e] for e in self.bridges})
+        self._bridges_from = {}
+        for e in self.bridges:
+            self._bridges_from.setdefault(source[e], []).append(e)
+        bridge_ticks = _to_ticks(cg, np.array(self.bridges, dtype=np.int64))
+        self._bridge_ticks = dict(zip(self.bridges, bridge_ticks.tolist()))
+
+        self._profiles = {}
+        for node in self.entries:
+            self._profile((node, -1, 0))
+
+    @property
+    def num_sectors(self):
+        return len(self.sectors)
+
+    def plan(self, start, time_limit, distance_goal=float("inf"), edge_keys=False):
+        """
+        Best itinerary from start, as optimizer.find_max_distance_path.
+
+        Args:
+            start: Starting node
+            time_limit: Available time in minutes, at most the horizon
+            distance_goal: Distance in km after which an itinerary is good enough
+            edge_keys: Return graph edges instead of edge names
+        Returns:
+            (best_distance, best_path)
+        """
+        cg = self.cg
+        if time_limit > self.horizon + 1e-9:
+            raise ValueError(f"Time limit {time_limit} is beyond the horizon {self.horizon}")
+        if start not in cg.node_index or time_limit <= 0:
+            return 0, []
+
+        # Portal level state graph, state 0 being the start. Transitions
+        # carry what they stand for: ("edge", edge id) or ("segment", root,
+        # exit state of the profile or None for the finish, ticks)
+        states = [(cg.node_index[start], -1, 0)]
+        state_ids = {states[0]: 0}
+        entering = [True]
+        finish = None
+        src, dst, ticks, dist, moves = [], [], [], [], []
+        pending = [0]
+        profiled, bridged = set(), set()
+        limit = num_ticks(time_limit)
+
+        def state_id(state, entry):
+            if state not in state_ids:
+                state_ids[state] = len(states)
+                states.append(state)
+                entering.append(entry)
+                pending.append(state_ids[state])
+            elif entry and not entering[state_ids[state]]:
+                entering[state_ids[state]] = True
+                pending.append(state_ids[state])
+            return state_ids[state]
+
+        def add(i, j, t, d, move):
+            if t <= limit:
+                src.append(i)
+                dst.append(j)
+                ticks.append(t)
+                dist.append(d)
+                moves.append(move)
+
+        while pending:
+            i = pending.pop()
+            node, last_lift, lift_count = states[i]
+            if entering[i] and i not in profiled:
+                profiled.add(i)
+                root = self._root(states[i])
+                profile = self._profile(root)
+                for exit_state, (times, distances) in profile.exits.items():
+                    exit_node, exit_lift, exit_count = exit_state
+                    if exit_lift < 0:
+                        # No lift in the segment, the one before still counts
+                        exit_lift, exit_count = last_lift, lift_count
+                    j = state_id((exit_node, exit_lift, exit_count), False)
+                    for t, d in zip(times.tolist(), distances.tolist()):
+                        add(i, j, t, d, ("segment", root, exit_state, t))
+                times, distances = profile.finish
+                if len(times) and finish is None:
+                    finish = len(states)
+                    states.append(None)
+                    entering.append(False)
+                for t, d in zip(times.tolist(), distances.tolist()):
+                    add(i, finish, t, d, ("segment", root, None, t))
+            if i not in bridged:
+                bridged.add(i)
+                for e in self._bridges_from.get(node, ()):
+                    lift = cg.lift[e]
+                    next_lift_state = (last_lift, lift_count)
+                    if lift >= 0:
+                        if lift == last_lift:
+                            if lift_count >= MAX_LIFT_REPEATS:
+                                continue
+                            next_lift_state = (lift, lift_count + 1)
+                        else:
+                            next_lift_state = (lift, 1)
+                    if self._bridge_ticks[e] <= limit:
+                        j = state_id((cg.target[e], *next_lift_state), True)
+                        add(i, j, self._bridge_ticks[e], cg.distance[e], ("edge", e))
+
+        if not src:
+            return 0, []
+        table = TickTable(np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+                          np.array(ticks, dtype=np.int64), np.array(dist, dtype=np.float64),
+                          len(states), limit)
+        for rows, best in table.blocks():
+            reached = np.nonzero((best >= distance_goal).any(axis=1))[0]
+            if len(reached):
+                best_tick = int(rows[reached[0]])
+                best_state = int(np.argmax(table.row(best_tick)))
+                break
+        else:
+            best_tick, best_state = table.argmax()
+        best_distance = float(table.row(best_tick)[best_state])
+        if best_distance <= 0:
+            return 0, []
+
+        path = []
+        for t in table.transitions_to(best_tick, best_state):
+            move = moves[t]
+            if move[0] == "edge":
+                path.append(move[1])
+            else:
+                path.extend(self._expand(*move[1:]))
+        if edge_keys:
+            return best_distance, [cg.edge_keys[e] for e in path]
+        return best_distance, cg.edge_path_names(path)
+
+    def _root(self, state):
+        """Root of the profile to use after entering a sector in state."""
+        node, last_lift, lift_count = state
+        # Lifts of other sectors cannot be repeated inside this one
+        if last_lift not in self._subgraphs[self.sector_of[node]][3]:
+            return (node, -1, 0)
+        return state
+
+    def _sector_table(self, root, limit):
+        """Tick table of the sector of root from root, with the transition data."""
+        node, last_lift, lift_count = root
+        sub, nodes, edges, _ = self._subgraphs[self.sector_of[node]]
+        src, dst, ticks, dist, sub_edges, sub_states = _build_transitions(
+            sub, sub.node_index[self.cg.nodes[node]], last_lift, lift_count)
+        states = [(nodes[n], l, c) for n, l, c in sub_states]
+        table = TickTable(src, dst, ticks, dist, len(states), limit)
+        table.fill()
+        return table, states, [edges[e] for e in sub_edges.tolist()]
+
+    def _profile(self, root):
+        """Profile of a root state, computing it on first use."""
+        if root in self._profiles:
+            return self._profiles[root]
+        table, states, _ = self._sector_table(root, num_ticks(self.horizon))
+        distances = table.table[table.pad:]
+        exits = {}
+        exit_nodes = set(self.exits)
+        for i, state in enumerate(states):
+            if state[0] in exit_nodes:
+                breakpoints = _breakpoints(distances[:, i])
+                if len(breakpoints[0]):
+                    exits[state] = breakpoints
+        profile = Profile(exits, _breakpoints(distances.max(axis=1)))
+        self._profiles[root] = profile
+        return profile
+
+    def _expand(self, root, exit_state, ticks):
+        """Edge ids of the segment from root to exit_state (None: anywhere) in ticks."""
+        table, states, edges = self._sector_table(root, ticks)
+        state = int(np.argmax(table.row(ticks))) if exit_state is None else states.index(exit_state)
+        return [edges[t] for t in table.transitions_to(ticks, state)]
+
+def _breakpoints(distances):
+    """Ticks (from 1) where a distance is first reached or beats all earlier ones, and the distances."""
+    best_before = np.maximum.accumulate(np.r_[-np.inf, distances[:-1]])
+    improves = distances > best_before
+    improves[0] = False
+    ticks = np.flatnonzero(improves)
+    return ticks, distances[ticks]
@@ -0,0 +1,166 @@
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from compiled_graph import CompiledGraph, compile_graph
+
+# File signature and format version of compiled graph snapshots
+MAGIC = b"SKIGRAPH"
+FORMAT_VERSION = 1
+
+# magic, format version, little endian flag, node count, edge count,
+# metadata offset and length, SHA-256 of the resort file it was built from
+HEADER = struct.Struct("<8sIB3xQQQQ32s")
+
+# Array fields in file order with their typecodes; each starts on an 8 byte boundary
+ARRAYS = (("indptr", "i"), ("target", "i"), ("lift", "i"), ("time", "d"), ("distance", "d"),
+          ("is_lift", "B"))
+
+def save_snapshot(cg, path, source_hash=b""):
+    """
+    Write a compiled graph to a snapshot file that load_snapshot can map.
+
+    The file is a fixed header, the typed arrays of the CompiledGraph in
+    native byte order, each aligned to 8 bytes, and a JSON block with the
+    node names, edge names, grades, edge keys and lift names. It is written
+    to a temporary file first and renamed, so readers never see a partial
+    snapshot.
+
+    Args:
+        cg: CompiledGraph
+        path: Snapshot file name
+        source_hash: SHA-256 digest of the resort file, see file_hash
+    """
+    offsets, meta_offset = _layout(cg.num_nodes, cg.num_edges)
+    meta = json.dumps({
+        "nodes": cg.nodes,
+        "edge_names": cg.edge_names,
+        "edge_grades": cg.edge_grades,
+        "edge_keys": cg.edge_keys,
+        "lift_names": cg.lift_names,
+        "dominated_pruned": cg.dominated_pruned,
+    }).encode()
+
+    buffer = bytearray(meta_offset + len(meta))
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, sys.byteorder == "little",
+                     cg.num_nodes, cg.num_edges, meta_offset, len(meta), source_hash)
+    for (name, typecode), offset in zip(ARRAYS, offsets):
+        data = array(typecode, getattr(cg, name)).tobytes()
+        buffer[offset:offset + len(data)] = data
+    buffer[meta_offset:] = meta
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer)
+        # mkstemp files are private, but workers of other users may map it
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def load_snapshot(path, source_hash=None):
+    """
+    Memory-map a snapshot file as a CompiledGraph.
+
+    The typed arrays of the result are read-only memoryviews of the mapped
+    file, so processes that load the same snapshot share its pages.
+
+    Args:
+        path: Snapshot file written by save_snapshot
+        source_hash: If given, the resort file digest the snapshot must
+            have been built from
+    Returns:
+        CompiledGraph
+    Raises:
+        ValueError if the file is not a snapshot of this format version and
+        byte order, or was built from a different resort file
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise ValueError(f"{path} is not a graph snapshot")
+    magic, version, little_endian, num_nodes, num_edges, meta_offset, meta_length, stored_hash = (
+        HEADER.unpack_from(mapped))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a graph snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has snapshot version {version}, expected {FORMAT_VERSION}")
+    if bool(little_endian) != (sys.byteorder == "little"):
+        raise ValueError(f"{path} was written with a different byte order")
+    if source_hash is not None and stored_hash != source_hash.ljust(32, b"\0"):
+        raise ValueError(f"{path} was built from a different resort file")
+
+    offsets, expected_meta_offset = _layout(num_nodes, num_edges)
+    if meta_offset != expected_meta_offset or meta_offset + meta_length > len(mapped):
+        raise ValueError(f"{path} is truncated or corrupt")
+
+    view = memoryview(mapped)
+    arrays = {}
+    for (name, typecode), offset in zip(ARRAYS, offsets):
+        count = num_nodes + 1 if name == "indptr" else num_edges
+        arrays[name] = view[offset:offset + count * array(typecode).itemsize].cast(typecode)
+    meta = json.loads(bytes(view[meta_offset:meta_offset + meta_length]))
+
+    cg = CompiledGraph(meta["nodes"], arrays["indptr"], arrays["target"], arrays["time"],
+                       arrays["distance"], arrays["is_lift"], arrays["lift"], meta["edge_names"],
+                       meta["edge_grades"], [tuple(key) for key in meta["edge_keys"]],
+                       meta["lift_names"], meta.get("dominated_pruned", True))
+    cg.snapshot_path = os.path.abspath(path)
+    return cg
+
+def load_compiled_resort(resort_path, snapshot_path=None):
+    """
+    Compiled graph of a resort file, cached as a snapshot next to it.
+
+    The snapshot is rebuilt when it is missing, from another format
+    version, or built from an older version of the resort file. Otherwise
+    loading costs a hash of the resort file and a memory map; NetworkX is
+    not even imported.
+
+    Args:
+        resort_path: JSON or CSV resort file, see load_graph.read_resort
+        snapshot_path: Snapshot file, by default the resort file name with
+            the extension .skigraph
+    Returns:
+        CompiledGraph backed by the snapshot, or held in memory if the
+        snapshot cannot be written, for example in a read-only directory
+    """
+    if snapshot_path is None:
+        snapshot_path = os.path.splitext(resort_path)[0] + ".skigraph"
+    source_hash = file_hash(resort_path)
+    try:
+        return load_snapshot(snapshot_path, source_hash)
+    except (OSError, ValueError):
+        pass
+
+    from load_graph import load_resort
+    G, _ = load_resort(resort_path)
+    cg = compile_graph(G)
+    try:
+        save_snapshot(cg, snapshot_path, source_hash)
+    except OSError:
+        return cg
+    return load_snapshot(snapshot_path, source_hash)
+
+def file_hash(path):
+    """SHA-256 digest of a file's contents."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+def _layout(num_nodes, num_edges):
+    """Byte offsets of the arrays and of the metadata block."""
+    offsets = []
+    offset = HEADER.size
+    for name, typecode in ARRAYS:
+        offset = (offset + 7) // 8 * 8
+        offsets.append(offset)
+        offset += (num_nodes + 1 if name == "indptr" else num_edges) * array(typecode).itemsize
+    return offsets, offset
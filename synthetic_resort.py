@@ -0,0 +1,86 @@
+import random
+
+import networkx as nx
+
+from load_graph import calculate_slope_time
+
+# Share of slopes of each grade
+GRADE_WEIGHTS = {
+    'blue': 0.5,
+    'red': 0.35,
+    'black': 0.15
+}
+
+def create_synthetic_resort(num_nodes=100, num_rows=5, seed=0, slopes_per_node=2,
+                            lift_probability=0.3):
+    """
+    Generate a random ski area shaped like create_les_arcs_graph.
+
+    Nodes are laid out in rows from the summits (row 0) down to the valley
+    (last row). Every node above the valley gets slopes down to nearby
+    nodes one or two rows lower, every valley node gets a lift up, and
+    other nodes get a lift with probability lift_probability. Slope times
+    come from calculate_slope_time; lifts take a whole number of minutes.
+    The same arguments always produce the same graph.
+
+    Args:
+        num_nodes: Number of nodes, spread evenly over the rows
+        num_rows: Number of altitude rows (at least 2)
+        seed: Random seed
+        slopes_per_node: Slopes leaving each node above the valley
+        lift_probability: Chance that a node above the valley has a lift
+    Returns:
+        (G, node_rows) like create_les_arcs_graph
+    """
+    if num_rows < 2 or num_nodes < num_rows:
+        raise ValueError("Need at least 2 rows and one node per row")
+    rng = random.Random(seed)
+
+    node_rows = []
+    for row_idx in range(num_rows):
+        size = num_nodes // num_rows + (1 if row_idx < num_nodes % num_rows else 0)
+        node_rows.append([f"R{row_idx}N{col}" for col in range(size)])
+
+    G = nx.MultiDiGraph()
+    for row_idx, row in enumerate(node_rows):
+        for node in row:
+            G.add_node(node, row=row_idx)
+
+    def nearby(row_from, col, row_to):
+        # Pick a node at about the same horizontal position in another row
+        row = node_rows[row_to]
+        center = col * len(row) / len(node_rows[row_from])
+        spread = max(2, len(row) // 10)
+        return row[min(len(row) - 1, max(0, int(center + rng.uniform(-spread, spread))))]
+
+    grades = list(GRADE_WEIGHTS)
+    weights = list(GRADE_WEIGHTS.values())
+    edge_id = 0
+    for row_idx, row in enumerate(node_rows[:-1]):
+        for col, node in enumerate(row):
+            for _ in range(slopes_per_node):
+                drop = 1 if row_idx == num_rows - 2 or rng.random() < 0.7 else 2
+                end = nearby(row_idx, col, row_idx + drop)
+                distance = round(rng.uniform(0.5, 2.5) * drop, 2)
+                grade = rng.choices(grades, weights)[0]
+                G.add_edge(node, end, key=edge_id,
+                           distance=distance,
+                           grade=grade,
+                           time=calculate_slope_time(distance, grade),
+                           name=f"Slope {edge_id}")
+                edge_id += 1
+
+    for row_idx, row in enumerate(node_rows):
+        if row_idx == 0:
+            continue
+        for col, node in enumerate(row):
+            if row_idx < num_rows - 1 and rng.random() >= lift_probability:
+                continue
+            climb = rng.randint(1, min(row_idx, 2))
+            end = nearby(row_idx, col, row_idx - climb)
+            G.add_edge(node, end, key=edge_id, distance=0,
+                       time=rng.randint(4, 9) * climb,
+                       name=f"Lift {edge_id}")
+            edge_id += 1
+
+    return G, node_rows
@@ -0,0 +1,97 @@
+import itertools
+import unittest
+from collections import Counter
+import networkx as nx
+from alternatives import iter_alternatives
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+
+class TestAlternatives(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.DiGraph()
+        self.G.add_edge("Base", "Top", distance=0, time=4, name="LiftA")
+        self.G.add_edge("Top", "Base", distance=2.5, time=6, name="Long", grade="blue")
+        self.G.add_edge("Top", "Mid", distance=1, time=2, name="Short", grade="red")
+        self.G.add_edge("Mid", "Base", distance=0.5, time=1, name="Link", grade="blue")
+        self.G.add_edge("Mid", "Top", distance=0, time=3, name="LiftB")
+
+    def test_matches_enumeration(self):
+        """Test that the k best distances match enumerating every itinerary"""
+        for time_limit in (12, 25, 40):
+            expected = sorted(self._all_plans(time_limit).values(), reverse=True)[:15]
+            distances = [a.distance for a in iter_alternatives(self.G, "Base", time_limit, k=15)]
+            self.assertEqual(len(distances), len(expected))
+            for distance, best in zip(distances, expected):
+                self.assertAlmostEqual(distance, best)
+
+    def test_dominated_parallel_slope(self):
+        """Test that a runner-up differing only by a dominated parallel slope is found"""
+        G = nx.MultiDiGraph()
+        G.add_edge("Bottom", "Top", distance=0, time=3, name="Lift")
+        G.add_edge("Top", "Bottom", distance=2.0, time=4, name="Fast", grade="red")
+        G.add_edge("Top", "Bottom", distance=1.9, time=5, name="Slow", grade="blue")
+        plans = list(iter_alternatives(G, "Bottom", 8, k=2, edge_keys=True))
+        self.assertEqual([plan.path for plan in plans],
+                         [[("Bottom", "Top", 0), ("Top", "Bottom", 0)],
+                          [("Bottom", "Top", 0), ("Top", "Bottom", 1)]])
+        self.assertEqual([plan.distance for plan in plans], [2.0, 1.9])
+
+    def test_plans_are_distinct_and_valid(self):
+        """Test that every plan is a different itinerary with its stated distance"""
+        plans = self._all_plans(40)
+        seen = set()
+        for alternative in iter_alternatives(self.G, "Base", 40, k=15):
+            path = tuple(alternative.path)
+            self.assertNotIn(path, seen)
+            seen.add(path)
+            self.assertAlmostEqual(plans[path], alternative.distance)
+
+    def test_best_first(self):
+        """Test that the first plan is optimal and distances never increase"""
+        G, _ = create_les_arcs_graph()
+        expected, _ = find_max_distance_path(G, "Vallandry", 240, float("inf"))
+        distances = [a.distance for a in iter_alternatives(G, "Vallandry", 240, k=12)]
+        self.assertEqual(len(distances), 12)
+        self.assertAlmostEqual(distances[0], expected)
+        self.assertEqual(distances, sorted(distances, reverse=True))
+
+    def test_min_difference(self):
+        """Test that diverse plans differ by at least min_difference slope runs"""
+        G, _ = create_les_arcs_graph()
+        plans = list(iter_alternatives(G, "Vallandry", 240, k=4, min_difference=3, end="Vallandry"))
+        self.assertEqual(len(plans), 4)
+        runs = []
+        for plan in plans:
+            runs.append(Counter(name for name in plan.path if name in self._slope_names(G)))
+        for a, b in itertools.combinations(runs, 2):
+            self.assertGreaterEqual(sum(((a - b) + (b - a)).values()), 3)
+
+    def _slope_names(self, G):
+        return {d["name"] for _, _, d in G.edges(data=True) if d["distance"] > 0}
+
+    def _all_plans(self, time_limit):
+        """Distance of every itinerary that does not end on a lift, by edge names"""
+        plans = {}
+        stack = [("Base", 0, 0, None, 0, ())]
+        while stack:
+            node, time_used, distance, last_lift, lift_count, path = stack.pop()
+            if path and self.G.edges[self._edge(path[-1])]["distance"] > 0:
+                plans[path] = distance
+            for _, next_node, data in self.G.out_edges(node, data=True):
+                if time_used + data["time"] > time_limit:
+                    continue
+                count, lift = lift_count, last_lift
+                if data["distance"] == 0:
+                    count = lift_count + 1 if data["name"] == last_lift else 1
+                    lift = data["name"]
+                    if count > 3:
+                        continue
+                stack.append((next_node, time_used + data["time"], distance + data["distance"],
+                              lift, count, path + (data["name"],)))
+        return plans
+
+    def _edge(self, name):
+        return next((u, v) for u, v, d in self.G.edges(data=True) if d["name"] == name)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import time
+import unittest
+from load_graph import create_les_arcs_graph
+from optimizer import anytime_search, find_max_distance_path, iter_improvements
+
+class TestAnytimeSearch(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+
+    def test_unlimited_budget_is_exact(self):
+        """Test that without a budget the anytime search completes with the exact optimum"""
+        result = anytime_search(self.G, "Vallandry", 180, 1000)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.gap, 0)
+        self.assertEqual((result.distance, result.path),
+                         find_max_distance_path(self.G, "Vallandry", 180, 1000))
+
+    def test_expansion_budget(self):
+        """Test that the expansion budget stops the search with a valid gap estimate"""
+        exact, _ = find_max_distance_path(self.G, "Vallandry", 480, 1000)
+        result = anytime_search(self.G, "Vallandry", 480, 1000, max_expansions=300)
+        self.assertFalse(result.complete)
+        self.assertEqual(result.expansions, 300)
+        self.assertLessEqual(result.distance, exact)
+        self.assertGreaterEqual(result.upper_bound, exact)
+        self.assertAlmostEqual(result.gap, result.upper_bound - result.distance)
+
+    def test_deadline(self):
+        """Test that a short deadline is respected"""
+        t0 = time.perf_counter()
+        result = anytime_search(self.G, "Vallandry", 20 * 60, 1000, deadline_ms=20)
+        self.assertLess(time.perf_counter() - t0, 0.5)
+        self.assertGreater(result.distance, 0)
+
+    def test_improvements_increase(self):
+        """Test that yielded plans improve and the last one is final"""
+        results = list(iter_improvements(self.G, "Vallandry", 120, 1000))
+        distances = [r.distance for r in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(results[-1].complete)
+        self.assertFalse(any(r.complete for r in results[:-1]))
+
+        seen = []
+        final = anytime_search(self.G, "Vallandry", 120, 1000, on_improvement=seen.append)
+        self.assertEqual(seen[-1], final)
+        self.assertEqual(len(seen), len(results))
+
+if __name__ == '__main__':
+    unittest.main()
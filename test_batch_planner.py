@@ -0,0 +1,40 @@
+import unittest
+from batch_planner import plan_many
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+
+class TestBatchPlanner(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+        self.queries = [
+            ("Vallandry", 120, 1000),
+            ("Arc 1600", 60, 10),
+            ("Vallandry", 30, 1000),
+            ("Nowhere", 60, 10),
+            ("Arc 1800", 90, 15),
+        ]
+
+    def test_results_match_single_queries_in_order(self):
+        """Test that batch results equal one-off solves, in input order"""
+        results = plan_many(self.G, self.queries, processes=0)
+        self.assertEqual(len(results), len(self.queries))
+        for (start, time_limit, goal), result in zip(self.queries, results):
+            self.assertEqual((result.distance, result.path),
+                             find_max_distance_path(self.G, start, time_limit, goal))
+            self.assertGreaterEqual(result.seconds, 0)
+
+    def test_process_pool(self):
+        """Test that a process pool gives the same results as in-process solving"""
+        cg = compile_graph(self.G)
+        expected = plan_many(cg, self.queries, processes=0)
+        results = plan_many(cg, self.queries, processes=2)
+        self.assertEqual([(r.distance, r.path) for r in results],
+                         [(r.distance, r.path) for r in expected])
+
+    def test_empty_batch(self):
+        """Test that an empty batch returns no results"""
+        self.assertEqual(plan_many(self.G, [], processes=2), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import networkx as nx
+from bounds import compute_bounds
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path, solve_compiled
+
+class TestBounds(unittest.TestCase):
+    def test_two_lift_loop_rate(self):
+        """Test that the cycle rate is the best repeatable loop"""
+        G = nx.DiGraph()
+        G.add_edge("Base", "Top1", distance=0, time=5, name="Lift1")
+        G.add_edge("Top1", "Base", distance=2, time=3, name="Slope1", grade="red")
+        G.add_edge("Base", "Top2", distance=0, time=4, name="Lift2")
+        G.add_edge("Top2", "Base", distance=1, time=3, name="Slope2", grade="red")
+        bounds = compute_bounds(compile_graph(G))
+        # Lift1 + Slope1 alone is 2 km in 8 min but cannot repeat forever;
+        # the best endless pattern is three Lift1 loops and one Lift2 loop
+        expected = (3 * 2 + 1) / (3 * 8 + 7)
+        rate = bounds.rate[bounds.state_index[(0, -1, 0)]]
+        self.assertGreaterEqual(rate, expected)
+        self.assertAlmostEqual(rate, expected, places=3)
+
+    def test_times_to_end(self):
+        """Test that the reverse time table uses the quickest of parallel edges"""
+        from bounds import times_to
+        G = nx.MultiDiGraph()
+        G.add_edge("Top", "Base", distance=2, time=6, name="Slow", grade="blue")
+        G.add_edge("Top", "Base", distance=1, time=3, name="Fast", grade="red")
+        G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        G.add_edge("Side", "Top", distance=0, time=2, name="Lift2")
+        cg = compile_graph(G, prune_dominated=False)
+        times = times_to(cg, cg.node_index["Base"])
+        self.assertEqual([times[cg.node_index[node]] for node in ("Base", "Top", "Side")],
+                         [0, 3, 5])
+        # Nothing leads back to Side
+        self.assertEqual(times_to(cg, cg.node_index["Side"])[cg.node_index["Base"]], float("inf"))
+
+    def test_single_lift_loop_has_no_cycle(self):
+        """Test that a loop over one lift does not count as repeatable"""
+        G = nx.DiGraph()
+        G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        G.add_edge("Top", "Base", distance=2, time=3, name="Slope1", grade="red")
+        cg = compile_graph(G)
+        bounds = compute_bounds(cg)
+        base = cg.node_index["Base"]
+        self.assertEqual(bounds.rate[bounds.state_index[(base, -1, 0)]], 0)
+        # Three loops are all that is possible
+        self.assertGreaterEqual(bounds.bound(base, -1, 0, 1000), 6)
+        self.assertLess(bounds.bound(base, -1, 0, 1000), 6.5)
+
+    def test_bounds_are_admissible(self):
+        """Test that no itinerary covers more than the bound allows"""
+        G, _ = create_les_arcs_graph()
+        cg = compile_graph(G)
+        bounds = compute_bounds(cg)
+        for start in ("Vallandry", "Arc 1600", "Transarc Top"):
+            for time_limit in (30, 90, 240):
+                distance, _ = solve_compiled(cg, start, time_limit, 1e9, prune=False)
+                self.assertLessEqual(distance, bounds.bound(cg.node_index[start], -1, 0, time_limit) + 1e-9)
+
+    def test_pruning_keeps_optimum(self):
+        """Test that branch and bound returns the same optimum as the plain search"""
+        G, _ = create_les_arcs_graph()
+        cg = compile_graph(G)
+        for time_limit, goal in ((120, 1000), (300, 1000), (480, 100), (90, 20)):
+            pruned, path = find_max_distance_path(cg, "Vallandry", time_limit, goal)
+            plain, _ = find_max_distance_path(cg, "Vallandry", time_limit, goal, prune=False)
+            self.assertAlmostEqual(pruned, plain)
+            self.assertAlmostEqual(sum(G.edges[e]["distance"] for e in
+                                       find_max_distance_path(cg, "Vallandry", time_limit, goal,
+                                                              edge_keys=True)[1]), pruned)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from cli import stream
+from load_graph import LES_ARCS_PATH
+from snapshot import load_compiled_resort
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds `import cli` may take in a fresh interpreter. Importing NetworkX
+# alone takes longer than this.
+IMPORT_BUDGET = 0.1
+
+HEAVY_MODULES = ("networkx", "matplotlib", "numpy", "scipy")
+
+def _run_python(code):
+    """Run code in a fresh interpreter in this directory and parse its JSON output."""
+    output = subprocess.run([sys.executable, "-c", code], cwd=HERE, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output)
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resort_path = os.path.join(self.directory, "les_arcs.json")
+        shutil.copy(LES_ARCS_PATH, self.resort_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_import_is_light(self):
+        """Test that importing the CLI stays within its startup budget and skips heavy modules"""
+        timings = []
+        for _ in range(3):
+            seconds, loaded = _run_python(
+                "import json, sys, time\n"
+                "t0 = time.perf_counter()\n"
+                "import cli\n"
+                "seconds = time.perf_counter() - t0\n"
+                f"print(json.dumps([seconds, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))"
+            )
+            self.assertEqual(loaded, [])
+            timings.append(seconds)
+        self.assertLess(min(timings), IMPORT_BUDGET)
+
+    def test_snapshot_query_skips_networkx(self):
+        """Test that answering a query from a snapshot never imports NetworkX or matplotlib"""
+        load_compiled_resort(self.resort_path)
+        result, loaded = _run_python(
+            "import contextlib, io, json, sys\n"
+            "import cli\n"
+            "out = io.StringIO()\n"
+            "with contextlib.redirect_stdout(out):\n"
+            f"    cli.main(['Arc 1600', '-t', '60', '-g', '10', '--json', '-r', {self.resort_path!r}])\n"
+            "print(json.dumps([json.loads(out.getvalue()),"
+            " [m for m in ('networkx', 'matplotlib') if m in sys.modules]]))"
+        )
+        self.assertEqual(loaded, [])
+        self.assertAlmostEqual(result["distance"], 10.8)
+
+    def test_stream(self):
+        """Test that streamed queries get one result line each, errors included"""
+        cg = load_compiled_resort(self.resort_path)
+        queries = [
+            json.dumps({"id": "a", "start": "Arc 1600", "time_limit": 60, "distance_goal": 10}),
+            "",
+            json.dumps({"start": "Nowhere", "time_limit": 60}),
+            "not json",
+        ]
+        out = io.StringIO()
+        stream(cg, queries, out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["id"] for r in results], ["a", 3, 4])
+        self.assertAlmostEqual(results[0]["distance"], 10.8)
+        self.assertIn("error", results[1])
+        self.assertIn("error", results[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import networkx as nx
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+
+class TestCompiledGraph(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.DiGraph()
+        self.G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        self.G.add_edge("Top", "Base", distance=2, time=3, name="Slope1", grade="red")
+        self.G.add_edge("Top", "Mid", distance=1, time=2, name="Slope2", grade="blue")
+        self.G.add_edge("Mid", "Top", distance=0, time=4, name="Lift1")
+
+    def test_csr_adjacency(self):
+        """Test that out-edges of each node map back to the original edges"""
+        cg = compile_graph(self.G)
+        self.assertEqual(cg.num_nodes, 3)
+        self.assertEqual(cg.num_edges, 4)
+        for node in self.G.nodes():
+            compiled = {(cg.nodes[cg.target[e]], cg.edge_names[e], cg.time[e], cg.distance[e])
+                        for e in cg.out_edges(cg.node_index[node])}
+            expected = {(v, d["name"], d["time"], d["distance"])
+                        for _, v, d in self.G.out_edges(node, data=True)}
+            self.assertEqual(compiled, expected)
+
+    def test_lifts_share_ids_by_name(self):
+        """Test that lifts with the same name get the same lift id"""
+        cg = compile_graph(self.G)
+        lift_edges = [e for e in range(cg.num_edges) if cg.is_lift[e]]
+        self.assertEqual(len(lift_edges), 2)
+        self.assertEqual({cg.lift[e] for e in lift_edges}, {0})
+        self.assertEqual(cg.lift_names, ["Lift1"])
+        self.assertTrue(all(cg.lift[e] == -1 for e in range(cg.num_edges) if not cg.is_lift[e]))
+
+    def test_compiled_graph_can_be_reused(self):
+        """Test that solving on a compiled graph gives the same result as on the DiGraph"""
+        G, _ = create_les_arcs_graph()
+        cg = compile_graph(G)
+        for method in ("labels", "dp", "bfs"):
+            self.assertEqual(
+                find_max_distance_path(cg, "Vallandry", 120, 1000, method=method),
+                find_max_distance_path(G, "Vallandry", 120, 1000, method=method)
+            )
+
+    def test_parallel_edges_are_kept(self):
+        """Test that parallel slopes of a multigraph both reach the solver"""
+        G = nx.MultiDiGraph()
+        G.add_edge("Top", "Bottom", key=0, distance=2, time=4, name="Fast", grade="red")
+        G.add_edge("Top", "Bottom", key=1, distance=3, time=9, name="Long", grade="blue")
+        cg = compile_graph(G)
+        self.assertEqual(cg.num_edges, 2)
+        self.assertEqual(set(cg.edge_keys), {("Top", "Bottom", 0), ("Top", "Bottom", 1)})
+
+        self.assertEqual(find_max_distance_path(G, "Top", 5, 100), (2, ["Fast"]))
+        self.assertEqual(find_max_distance_path(G, "Top", 10, 100), (3, ["Long"]))
+
+    def test_dominated_parallel_edges_are_pruned(self):
+        """Test that slower and shorter parallel slopes are dropped, lifts of other names are not"""
+        G = nx.MultiDiGraph()
+        G.add_edge("Top", "Bottom", key=0, distance=2, time=4, name="Good", grade="red")
+        G.add_edge("Top", "Bottom", key=1, distance=1.5, time=5, name="Worse", grade="red")
+        G.add_edge("Top", "Bottom", key=2, distance=2, time=4, name="Copy", grade="red")
+        G.add_edge("Bottom", "Top", key=3, distance=0, time=5, name="LiftA")
+        G.add_edge("Bottom", "Top", key=4, distance=0, time=6, name="LiftB")
+        G.add_edge("Bottom", "Top", key=5, distance=0, time=7, name="LiftA")
+
+        cg = compile_graph(G)
+        self.assertEqual(sorted(cg.edge_names), ["Good", "LiftA", "LiftB"])
+        self.assertEqual(compile_graph(G, prune_dominated=False).num_edges, 6)
+
+    def test_les_arcs_keeps_parallel_slopes(self):
+        """Test that both Belette runs and both Mont Blanc Top descents are loaded"""
+        G, _ = create_les_arcs_graph()
+        self.assertEqual(G.number_of_edges("Le Derby Top", "Le Derby Bottom"), 2)
+        names = {d["name"] for _, _, d in G.edges("Mont Blanc Top", data=True)}
+        self.assertTrue({"Mont Blanc slope", "Arolles slope"} <= names)
+
+    def test_edge_keys_path(self):
+        """Test that paths can be returned as unambiguous graph edges"""
+        G, _ = create_les_arcs_graph()
+        distance, path = find_max_distance_path(G, "Vallandry", 120, 1000, edge_keys=True)
+        node = "Vallandry"
+        total = 0
+        for u, v, k in path:
+            self.assertEqual(u, node)
+            total += G.edges[u, v, k]["distance"]
+            node = v
+        self.assertAlmostEqual(total, distance)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import networkx as nx
+from compiled_graph import compile_graph
+from cycle_solver import best_cycle, long_horizon_search
+from load_graph import create_les_arcs_graph
+from optimizer import MAX_LIFT_REPEATS, find_max_distance_path
+
+class TestCycleSolver(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.MultiDiGraph()
+        self.G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        self.G.add_edge("Top", "Middle", distance=2, time=3, name="Upper", grade="red")
+        self.G.add_edge("Middle", "Base", distance=5, time=10, name="Lower", grade="blue")
+        self.G.add_edge("Base", "Other", distance=0, time=4, name="Lift2")
+        self.G.add_edge("Other", "Base", distance=1, time=3, name="Short", grade="red")
+        self.les_arcs = compile_graph(create_les_arcs_graph()[0])
+
+    def assert_valid(self, cg, start, path, time_limit, distance):
+        """Check that path is a connected itinerary within the time and lift rules"""
+        node = cg.node_index[start]
+        last_lift, lift_count, time_used, covered = -1, 0, 0, 0
+        for e in path:
+            self.assertIn(e, list(cg.out_edges(node)))
+            lift = cg.lift[e]
+            if lift >= 0:
+                lift_count = lift_count + 1 if lift == last_lift else 1
+                last_lift = lift
+                self.assertLessEqual(lift_count, MAX_LIFT_REPEATS)
+            node = cg.target[e]
+            time_used += cg.time[e]
+            covered += cg.distance[e]
+        self.assertLessEqual(time_used, time_limit + 1e-6)
+        self.assertAlmostEqual(covered, distance, places=6)
+
+    def test_best_cycle_follows_lift_rule(self):
+        """Test that the best loop uses another lift after MAX_LIFT_REPEATS rides"""
+        cg = compile_graph(self.G)
+        cycle = best_cycle(cg, cg.node_index["Base"])
+        names = cg.edge_path_names(cycle.edges)
+        self.assertEqual(sorted(names), sorted(["Lift1", "Upper", "Lower"] * 3 + ["Lift2", "Short"]))
+        self.assertEqual((cycle.time, cycle.distance), (61, 22))
+
+    def test_short_limits_exact(self):
+        """Test that time limits within the window give the exact optimum"""
+        for time_limit in (60, 240):
+            expected, _ = find_max_distance_path(self.les_arcs, "Vallandry", time_limit, 1000)
+            result = long_horizon_search(self.les_arcs, "Vallandry", time_limit)
+            self.assertAlmostEqual(result.distance, expected, places=6)
+            self.assertEqual(result.gap, 0)
+
+    def test_certified_gap(self):
+        """Test that long-day answers are valid and the upper bound holds"""
+        for time_limit in (600, 1200):
+            expected, _ = find_max_distance_path(self.les_arcs, "Vallandry", time_limit, float("inf"))
+            result = long_horizon_search(self.les_arcs, "Vallandry", time_limit)
+            self.assert_valid(self.les_arcs, "Vallandry", result.path, time_limit, result.distance)
+            self.assertGreater(result.repeats, 0)
+            self.assertLessEqual(result.distance, expected + 1e-6)
+            self.assertGreaterEqual(result.upper_bound, expected - 1e-6)
+            self.assertLess(result.gap, 0.01 * expected)
+
+    def test_long_horizon(self):
+        """Test a week of skiing without an exact search over the whole week"""
+        time_limit = 7 * 24 * 60
+        result = long_horizon_search(self.les_arcs, "Vallandry", time_limit)
+        self.assert_valid(self.les_arcs, "Vallandry", result.path, time_limit, result.distance)
+        self.assertLess(result.gap / result.upper_bound, 1e-3)
+
+    def test_goal(self):
+        """Test that a reachable goal gives the quickest itinerary, as the exact method"""
+        expected = find_max_distance_path(self.les_arcs, "Vallandry", 3000, 60)
+        self.assertEqual(find_max_distance_path(self.les_arcs, "Vallandry", 3000, 60, method="cycle"),
+                         expected)
+
+    def test_goal_with_end(self):
+        """Test that a long plan with an end is cut at the first visit to end after the goal"""
+        end = self.les_arcs.node_index["Arc 1600"]
+        result = long_horizon_search(self.les_arcs, "Vallandry", 900, 150, end="Arc 1600")
+        self.assert_valid(self.les_arcs, "Vallandry", result.path, 900, result.distance)
+        self.assertEqual(self.les_arcs.target[result.path[-1]], end)
+        self.assertGreaterEqual(result.distance, 150)
+        covered = 0
+        for e in result.path[:-1]:
+            covered += self.les_arcs.distance[e]
+            self.assertFalse(covered >= 150 and self.les_arcs.target[e] == end)
+
+if __name__ == "__main__":
+    unittest.main()
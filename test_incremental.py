@@ -0,0 +1,113 @@
+import unittest
+from compiled_graph import compile_graph
+from incremental import IncrementalPlanner
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from search_stats import SearchStats
+
+class TestIncrementalPlanner(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+        self.planner = IncrementalPlanner(self.G)
+
+    def _expected(self, G, start, time_left, distance_goal):
+        return find_max_distance_path(G, start, time_left, distance_goal)[0]
+
+    def _without(self, name):
+        G = self.G.copy()
+        G.remove_edges_from([edge for edge in G.edges(keys=True)
+                             if G.edges[edge]["name"] == name])
+        return G
+
+    def test_first_plan_is_exact(self):
+        """Test that the first plan matches a full solve"""
+        distance, _ = self.planner.plan("Vallandry", 240, 1000)
+        self.assertAlmostEqual(distance, self._expected(self.G, "Vallandry", 240, 1000))
+
+    def test_lift_closure(self):
+        """Test that closing a lift used by the plan re-plans exactly by repairing the search"""
+        _, path = self.planner.plan("Vallandry", 240, 1000)
+        self.assertIn("Derby Chairlift", path)
+        self.assertEqual(self.planner.close_edge("Derby Chairlift"), 1)
+
+        distance, path = self.planner.plan("Vallandry", 240, 1000)
+        self.assertNotIn("Derby Chairlift", path)
+        expected = self._expected(self._without("Derby Chairlift"), "Vallandry", 240, 1000)
+        self.assertAlmostEqual(distance, expected)
+        self.assertEqual(self.planner.bounds_computations, 2)
+        self.assertEqual(self.planner.searches, 2)
+        self.assertEqual(self.planner.repairs, 1)
+
+    def test_repair_beats_cold_solve(self):
+        """Test that re-planning after a closure expands fewer labels than a cold solve"""
+        _, path = self.planner.plan("Vallandry", 240, 1000)
+        self.assertIn("Arpette to Le Derby", path)
+        self.planner.close_edge("Arpette to Le Derby")
+        stats = SearchStats()
+        distance, _ = self.planner.plan("Vallandry", 240, 1000, stats=stats)
+
+        cold_distance, _, cold = find_max_distance_path(self._without("Arpette to Le Derby"),
+                                                        "Vallandry", 240, 1000, stats=SearchStats())
+        self.assertAlmostEqual(distance, cold_distance)
+        self.assertEqual(stats.method, "incremental")
+        self.assertLess(stats.expansions, cold.expansions)
+
+    def test_unaffected_plan_is_reused(self):
+        """Test that plans not using a closed edge stay memoized"""
+        _, path = self.planner.plan("Arc 1600", 60, 1000)
+        self.assertNotIn("Grizzly Lift", path)
+        self.planner.close_edge("Grizzly Lift")
+        self.planner.plan("Arc 1600", 60, 1000)
+        self.assertEqual(self.planner.cache_hits, 1)
+        self.assertEqual(self.planner.searches, 1)
+
+    def test_slower_and_faster_edges(self):
+        """Test that time changes re-plan exactly and recompute the bounds"""
+        G = self.G.copy()
+        self.planner.plan("Vallandry", 180, 1000)
+        self.planner.set_edge_time("Grizzly Lift", 15)
+        for edge in G.edges(keys=True):
+            if G.edges[edge]["name"] == "Grizzly Lift":
+                G.edges[edge]["time"] = 15
+        distance, _ = self.planner.plan("Vallandry", 180, 1000)
+        self.assertAlmostEqual(distance, self._expected(G, "Vallandry", 180, 1000))
+        self.assertEqual(self.planner.bounds_computations, 2)
+
+        self.planner.reopen_edge("Grizzly Lift")
+        distance, _ = self.planner.plan("Vallandry", 180, 1000)
+        self.assertAlmostEqual(distance, self._expected(self.G, "Vallandry", 180, 1000))
+        self.assertEqual(self.planner.bounds_computations, 3)
+
+    def test_parallel_slope_takes_over(self):
+        """Test that closing one of two parallel slopes makes the other one usable"""
+        _, path = self.planner.plan("Le Derby Top", 10, 1000, edge_keys=True)
+        used = [edge for edge in path if self.G.edges[edge]["name"] == "Belette"]
+        self.assertTrue(used)
+        self.planner.close_edge(used[0])
+        _, path = self.planner.plan("Le Derby Top", 10, 1000, edge_keys=True)
+        self.assertNotIn(used[0], path)
+        self.assertIn("Belette", [self.G.edges[edge]["name"] for edge in path])
+
+    def test_position_update(self):
+        """Test re-planning from a later point of the day's plan"""
+        _, path = self.planner.plan("Vallandry", 480, 100, edge_keys=True)
+        node = path[5][1]
+        time_left = 480 - sum(self.G.edges[edge]["time"] for edge in path[:6])
+        distance, _ = self.planner.plan(node, time_left, 50)
+        self.assertAlmostEqual(distance, self._expected(self.G, node, time_left, 50))
+
+    def test_pruned_compiled_graph(self):
+        """Test that a compiled graph without its dominated parallel edges is refused"""
+        with self.assertRaises(ValueError):
+            IncrementalPlanner(compile_graph(self.G))
+        planner = IncrementalPlanner(compile_graph(self.G, prune_dominated=False))
+        distance, _ = planner.plan("Vallandry", 240, 1000)
+        self.assertAlmostEqual(distance, self._expected(self.G, "Vallandry", 240, 1000))
+
+    def test_unknown_edge(self):
+        """Test that closing an unknown edge is an error"""
+        with self.assertRaises(KeyError):
+            self.planner.close_edge("Nonexistent Lift")
+
+if __name__ == '__main__':
+    unittest.main()
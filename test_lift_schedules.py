@@ -0,0 +1,119 @@
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from compiled_graph import compile_graph
+from lift_schedules import LiftSchedule, LiftTimetable, parse_clock, read_lift_schedules
+from load_graph import RESORTS_DIR, create_les_arcs_graph
+from optimizer import MAX_LIFT_REPEATS, find_max_distance_path
+
+class TestLiftSchedules(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+        self.cg = compile_graph(self.G)
+        self.schedules = read_lift_schedules(os.path.join(RESORTS_DIR, "les_arcs_lifts.csv"))
+
+    def test_schedule(self):
+        """Test interpolated lift times, waits for closed lifts and the FIFO check"""
+        schedule = LiftSchedule([540, 600, 720, 780, 960], [6, 12, None, 8, None])
+        self.assertEqual(schedule.duration(500), 40 + 6)
+        self.assertEqual(schedule.duration(570), 9)
+        self.assertEqual(schedule.duration(700), 12)
+        self.assertEqual(schedule.arrival(750), 780 + 8)
+        self.assertEqual(schedule.arrival(959), 967)
+        self.assertEqual(schedule.arrival(960), math.inf)
+        self.assertEqual(schedule.fastest, 6)
+
+        with self.assertRaises(ValueError):
+            LiftSchedule([540, 550], [20, 5])
+        with self.assertRaises(ValueError):
+            LiftSchedule([540, 600, 610], [20, None, 1])
+        with self.assertRaises(ValueError):
+            LiftTimetable(self.cg, {"Nowhere Lift": schedule})
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "lifts.csv")
+            with open(path, "w") as f:
+                f.write("name,clock,time\nGrizzly Lift,16:30,closed\nGrizzly Lift,08:45,7\n")
+            grizzly = read_lift_schedules(path)["Grizzly Lift"]
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(grizzly.clocks, [parse_clock("08:45"), 990])
+        self.assertEqual(grizzly.arrival(600), 607)
+
+    def test_matches_exhaustive_search(self):
+        """Test the scheduled search against all itineraries at several start times"""
+        timetable = LiftTimetable(self.cg, self.schedules)
+        for start_time in ("08:20", "10:05", "12:10", "16:10"):
+            for time_limit, distance_goal in ((50, float("inf")), (70, 12)):
+                distance, path = find_max_distance_path(
+                    self.G, "Vallandry", time_limit, distance_goal, edge_keys=True,
+                    schedules=timetable, start_time=start_time)
+                best = self._exhaustive("Vallandry", parse_clock(start_time), time_limit,
+                                        distance_goal)
+                elapsed = self._elapsed(path, parse_clock(start_time))
+                self.assertLessEqual(elapsed, time_limit + 1e-9)
+                if best[0] >= distance_goal:
+                    self.assertGreaterEqual(distance, distance_goal)
+                    self.assertAlmostEqual(elapsed, best[1])
+                else:
+                    self.assertAlmostEqual(distance, best[0])
+
+    def test_constant_schedules_match_fixed_times(self):
+        """Test that schedules giving the fixed lift times change nothing"""
+        schedules = {}
+        for e in range(self.cg.num_edges):
+            if self.cg.lift[e] >= 0:
+                schedules[self.cg.edge_names[e]] = LiftSchedule([0], [self.cg.time[e]])
+        for end in (None, "Arc 1600"):
+            self.assertEqual(
+                find_max_distance_path(self.G, "Vallandry", 240, 60, end=end, schedules=schedules,
+                                       start_time="09:00"),
+                find_max_distance_path(self.G, "Vallandry", 240, 60, end=end))
+        with self.assertRaises(ValueError):
+            find_max_distance_path(self.G, "Vallandry", 240, 60, method="dp", schedules=schedules,
+                                   start_time=0)
+
+    def _elapsed(self, path, clock):
+        """Minutes an itinerary of edge keys takes when started at clock."""
+        start = clock
+        for key in path:
+            data = self.G.edges[key]
+            schedule = self.schedules.get(data["name"]) if data["distance"] == 0 else None
+            clock = data["time"] + clock if schedule is None else schedule.arrival(clock)
+        return clock - start
+
+    def _exhaustive(self, start, clock, time_limit, distance_goal):
+        """(best distance, quickest time reaching the goal) over all itineraries."""
+        best = [0, math.inf]
+
+        def extend(node, elapsed, distance, last_lift, repeats):
+            best[0] = max(best[0], distance)
+            if distance >= distance_goal:
+                best[1] = min(best[1], elapsed)
+                return
+            for _, target, data in self.G.out_edges(node, data=True):
+                name = data["name"]
+                lift = data["distance"] == 0
+                if lift and name == last_lift and repeats >= MAX_LIFT_REPEATS:
+                    continue
+                schedule = self.schedules.get(name) if lift else None
+                if schedule is None:
+                    arrival = clock + elapsed + data["time"]
+                else:
+                    arrival = schedule.arrival(clock + elapsed)
+                if arrival - clock > time_limit + 1e-9:
+                    continue
+                if lift:
+                    extend(target, arrival - clock, distance, name,
+                           repeats + 1 if name == last_lift else 1)
+                else:
+                    extend(target, arrival - clock, distance + data["distance"], last_lift, repeats)
+
+        extend(start, 0, 0, None, 0)
+        return best
+
+if __name__ == "__main__":
+    unittest.main()
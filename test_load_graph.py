@@ -0,0 +1,38 @@
+import csv
+import os
+import tempfile
+import unittest
+from load_graph import build_resort_graph, create_les_arcs_graph, load_resort, read_resort, LES_ARCS_PATH
+
+class TestLoadGraph(unittest.TestCase):
+    def test_csv_matches_json(self):
+        """Test that a CSV resort file loads the same graph as its JSON version"""
+        data = read_resort(LES_ARCS_PATH)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "les_arcs.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["type", "name", "start", "end", "distance", "grade", "time", "row"])
+                for row_idx, row in enumerate(data["node_rows"]):
+                    for node in row:
+                        writer.writerow(["node", node, "", "", "", "", "", row_idx])
+                for slope in data["slopes"]:
+                    writer.writerow(["slope", slope["name"], slope["start"], slope["end"],
+                                     slope["distance"], slope["grade"], "", ""])
+                for lift in data["lifts"]:
+                    writer.writerow(["lift", lift["name"], lift["start"], lift["end"], "", "",
+                                     lift["time"], ""])
+            G, node_rows = load_resort(path)
+
+        expected, expected_rows = create_les_arcs_graph()
+        self.assertEqual(node_rows, expected_rows)
+        self.assertEqual(list(G.edges(keys=True, data=True)), list(expected.edges(keys=True, data=True)))
+
+    def test_unknown_point(self):
+        """Test that an edge to an undefined point is rejected"""
+        with self.assertRaises(ValueError):
+            build_resort_graph({"node_rows": [["A"]],
+                                "lifts": [{"start": "A", "end": "B", "time": 5, "name": "Lift"}]})
+
+if __name__ == '__main__':
+    unittest.main()
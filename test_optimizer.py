@@ -148,5 +148,150 @@ class TestSkiOptimizer(unittest.TestCase):
         self.assertGreater(lift1_count + lift2_count, 6, 
             "Should be able to use different lifts more than 3 times each")
 
+    def test_label_search_is_optimal(self):
+        """Test that the label-setting search matches exhaustive enumeration"""
+        G = nx.DiGraph()
+        G.add_edge("Base", "Top", distance=0, time=4, name="LiftA")
+        G.add_edge("Top", "Base", distance=2.5, time=6, name="Long")
+        G.add_edge("Top", "Mid", distance=1, time=2, name="Short")
+        G.add_edge("Mid", "Base", distance=0.5, time=1, name="Link")
+        G.add_edge("Mid", "Top", distance=0, time=3, name="LiftB")
+
+        for time_limit in (10, 25, 40, 60):
+            expected = self._exhaustive_best(G, "Base", time_limit, 1000)
+            distance, path = find_max_distance_path(
+                G, "Base", time_limit, distance_goal=1000
+            )
+            self.assertAlmostEqual(distance, expected)
+            self.assertAlmostEqual(self._path_distance(G, "Base", path), distance)
+
+    def test_label_search_returns_quickest_plan_reaching_goal(self):
+        """Test that the quickest itinerary reaching the goal is preferred"""
+        G = nx.DiGraph()
+        G.add_edge("Top", "Bottom", distance=3, time=10, name="Slow")
+        G.add_edge("Top", "Side", distance=2, time=2, name="Fast")
+        G.add_edge("Side", "Bottom", distance=2, time=2, name="Fast2")
+
+        distance, path = find_max_distance_path(G, "Top", time_limit=30, distance_goal=3)
+        self.assertEqual(path, ["Fast", "Fast2"])
+        self.assertEqual(distance, 4)
+
+    def test_label_search_not_worse_than_bfs(self):
+        """Test that the exact search never returns less distance than the heuristic"""
+        for time_limit in (30, 60, 120):
+            exact, _ = find_max_distance_path(self.G, "Start", time_limit, 1000)
+            heuristic, _ = find_max_distance_path(
+                self.G, "Start", time_limit, 1000, method="bfs"
+            )
+            self.assertGreaterEqual(exact, heuristic)
+
+    def test_dp_matches_label_search(self):
+        """Test that the table-based solver finds the same optimum as the label search"""
+        from load_graph import create_les_arcs_graph
+        G, _ = create_les_arcs_graph()
+
+        for time_limit, distance_goal in ((60, 1000), (180, 1000), (240, 40)):
+            expected, _ = find_max_distance_path(G, "Vallandry", time_limit, distance_goal)
+            distance, path = find_max_distance_path(
+                G, "Vallandry", time_limit, distance_goal, method="dp"
+            )
+            self.assertAlmostEqual(distance, expected)
+            self.assertAlmostEqual(self._path_distance(G, "Vallandry", path), distance)
+
+    def test_dp_rejects_off_grid_times(self):
+        """Test that the table-based solver refuses times it cannot discretize"""
+        G = nx.DiGraph()
+        G.add_edge("A", "B", distance=1, time=2.25, name="Odd", grade="blue")
+        with self.assertRaises(ValueError):
+            find_max_distance_path(G, "A", 10, 5, method="dp")
+
+    def test_bfs_path_matches_distance(self):
+        """Test that the linked paths of the heuristic search materialize in order"""
+        distance, path = find_max_distance_path(
+            self.G, "Start", time_limit=60, distance_goal=1000, method="bfs"
+        )
+        self.assertGreater(len(path), 0)
+        self.assertAlmostEqual(self._path_distance(self.G, "Start", path), distance)
+
+    def test_unknown_method(self):
+        """Test that an unknown solver method is rejected"""
+        with self.assertRaises(ValueError):
+            find_max_distance_path(self.G, "Start", 30, 5, method="magic")
+
+    def test_end_node(self):
+        """Test that itineraries finish at the end node and stay optimal"""
+        G = nx.DiGraph()
+        G.add_edge("Base", "Top", distance=0, time=4, name="LiftA")
+        G.add_edge("Top", "Base", distance=2.5, time=6, name="Long")
+        G.add_edge("Top", "Mid", distance=1, time=2, name="Short")
+        G.add_edge("Mid", "Base", distance=0.5, time=1, name="Link")
+        G.add_edge("Mid", "Top", distance=0, time=3, name="LiftB")
+        G.add_edge("Top", "Far", distance=3, time=2, name="Stranding")
+
+        for time_limit in (7, 10, 25, 40):
+            expected = self._exhaustive_best(G, "Base", time_limit, 1000, end="Base")
+            for method in ("labels", "dp"):
+                distance, path = find_max_distance_path(G, "Base", time_limit, 1000,
+                                                        method=method, end="Base")
+                self.assertAlmostEqual(distance, expected)
+                self.assertAlmostEqual(self._path_distance(G, "Base", path), distance)
+                self.assertNotIn("Stranding", path)
+            distance, _ = find_max_distance_path(G, "Base", time_limit, 1000, reduce=True, end="Base")
+            self.assertAlmostEqual(distance, expected)
+            distance, path = find_max_distance_path(G, "Base", time_limit, 1000, method="bfs",
+                                                    end="Base")
+            self.assertLessEqual(distance, expected)
+            self.assertNotIn("Stranding", path)
+
+    def test_end_node_with_goal(self):
+        """Test that the goal only counts once the itinerary is back at the end node"""
+        from load_graph import create_les_arcs_graph
+        G, _ = create_les_arcs_graph()
+        for method in ("labels", "dp"):
+            distance, path = find_max_distance_path(G, "Vallandry", 240, 30, method=method,
+                                                    edge_keys=True, end="Arc 1600")
+            self.assertGreaterEqual(distance, 30)
+            self.assertEqual(path[-1][1], "Arc 1600")
+        self.assertEqual(
+            find_max_distance_path(G, "Vallandry", 240, 30, end="Arc 1600")[0],
+            find_max_distance_path(G, "Vallandry", 240, 30, method="dp", end="Arc 1600")[0])
+
+    def test_end_node_out_of_reach(self):
+        """Test that no itinerary is returned when the end node cannot be reached in time"""
+        for method in ("labels", "dp", "bfs"):
+            self.assertEqual(find_max_distance_path(self.G, "Start", 4, 1000, method=method,
+                                                    end="End"), (0, []))
+
+    def _path_distance(self, G, start, path):
+        node = start
+        total = 0
+        for name in path:
+            node, data = next((v, d) for _, v, d in G.out_edges(node, data=True)
+                              if d["name"] == name)
+            total += data["distance"]
+        return total
+
+    def _exhaustive_best(self, G, start, time_limit, distance_goal, end=None):
+        best = 0
+        stack = [(start, 0, 0, None, 0)]
+        while stack:
+            node, time_used, distance, last_lift, lift_count = stack.pop()
+            if end is None or node == end:
+                best = max(best, distance)
+            if distance >= distance_goal:
+                continue
+            for _, next_node, data in G.out_edges(node, data=True):
+                if time_used + data["time"] > time_limit:
+                    continue
+                count, lift = lift_count, last_lift
+                if data["distance"] == 0:
+                    count = lift_count + 1 if data["name"] == last_lift else 1
+                    lift = data["name"]
+                    if count > 3:
+                        continue
+                stack.append((next_node, time_used + data["time"],
+                              distance + data["distance"], lift, count))
+        return best
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
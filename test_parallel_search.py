@@ -0,0 +1,36 @@
+import unittest
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import _get_bounds, find_max_distance_path, solve_compiled
+from parallel_search import parallel_label_search
+from synthetic_resort import create_synthetic_resort
+
+class TestParallelSearch(unittest.TestCase):
+    def test_same_itinerary_as_sequential(self):
+        """Test that the parallel search returns exactly the sequential itinerary"""
+        G, _ = create_les_arcs_graph()
+        cg = compile_graph(G)
+        for start in ("Vallandry", "Arc 1800"):
+            for time_limit, distance_goal in ((45, float("inf")), (240, 30), (240, float("inf"))):
+                for end in (None, "Arc 1600"):
+                    expected = solve_compiled(cg, start, time_limit, distance_goal, end=end)
+                    result = parallel_label_search(
+                        cg, cg.node_index[start], time_limit, distance_goal, _get_bounds(cg),
+                        end=None if end is None else cg.node_index[end], processes=3)
+                    self.assertEqual(result, expected)
+
+    def test_synthetic_resort(self):
+        """Test the parallel method on a generated resort, with and without a reachable goal"""
+        G, node_rows = create_synthetic_resort(num_nodes=400, seed=0)
+        start = node_rows[-1][0]
+        for distance_goal in (30, float("inf")):
+            expected = find_max_distance_path(G, start, 240, distance_goal)
+            cg = compile_graph(G)
+            result = parallel_label_search(cg, cg.node_index[start], 240, distance_goal,
+                                           processes=4)
+            self.assertEqual((result[0], cg.edge_path_names(result[1])), expected)
+        self.assertEqual(find_max_distance_path(G, start, 240, 30, method="parallel"),
+                         find_max_distance_path(G, start, 240, 30))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import networkx as nx
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from pareto import pareto_front
+
+class TestParetoFront(unittest.TestCase):
+    def setUp(self):
+        # A quick red run and a slower, longer blue run from the same lift
+        self.G = nx.DiGraph()
+        self.G.add_edge("Base", "Top", distance=0, time=4, name="LiftA")
+        self.G.add_edge("Top", "Base", distance=2.5, time=9, name="Long", grade="blue")
+        self.G.add_edge("Top", "Mid", distance=1.5, time=2, name="Steep", grade="red")
+        self.G.add_edge("Mid", "Base", distance=0.5, time=1, name="Link", grade="blue")
+        self.G.add_edge("Mid", "Top", distance=0, time=3, name="LiftB")
+
+    def test_exact_front(self):
+        """Test that one preference per grade gives exactly the non-dominated itineraries"""
+        front = pareto_front(self.G, "Base", 40, preferences=[{"blue": 1}, {"red": 1}])
+        plans = self._all_plans(40)
+        expected = {
+            plan for plan in plans
+            if not any(other != plan and other[0] <= plan[0]
+                       and all(a >= b for a, b in zip(other[1], plan[1])) for other in plans)
+        }
+        found = {(float(t), tuple(round(km, 6) for km in row))
+                 for t, row in zip(front.times, front.grade_distances)}
+        self.assertEqual(found, expected)
+
+    def test_queries(self):
+        """Test that one front answers max distance, finish early and grade preferences"""
+        front = pareto_front(self.G, "Base", 40)
+        for time_limit in (10, 25, 40):
+            expected, _ = find_max_distance_path(self.G, "Base", time_limit, float("inf"))
+            self.assertAlmostEqual(front.best(time_limit).distance, expected)
+            for weights in ({"blue": 1}, {"blue": 1, "red": 0.5}):
+                plan = front.best(time_limit, weights)
+                score = sum(weights.get(g, 0) * km for g, km in plan.grade_distances.items())
+                best = max(weights["blue"] * blue + weights.get("red", 0) * red
+                           for t, (blue, red) in self._all_plans(time_limit))
+                self.assertAlmostEqual(score, best)
+        expected = find_max_distance_path(self.G, "Base", 40, 6)
+        plan = front.fastest(6)
+        self.assertEqual((plan.distance, plan.path), expected)
+        self.assertIsNone(front.fastest(1000))
+
+    def test_les_arcs(self):
+        """Test max-distance and goal queries on the default front of a real resort"""
+        G, _ = create_les_arcs_graph()
+        front = pareto_front(G, "Vallandry", 120)
+        for time_limit in (45, 90, 120):
+            expected, _ = find_max_distance_path(G, "Vallandry", time_limit, float("inf"))
+            plan = front.best(time_limit)
+            self.assertAlmostEqual(plan.distance, expected)
+            self.assertAlmostEqual(sum(plan.grade_distances.values()), plan.distance)
+            self.assertLessEqual(plan.time, time_limit)
+        _, path = find_max_distance_path(G, "Vallandry", 120, 25, edge_keys=True)
+        self.assertAlmostEqual(front.fastest(25).time, sum(G.edges[key]["time"] for key in path))
+
+    def test_parallel_slopes_of_different_grades(self):
+        """Test that a slower, shorter slope of another grade is not pruned from the front"""
+        G = nx.MultiDiGraph()
+        G.add_edge("Bottom", "Top", distance=0, time=3, name="Lift")
+        G.add_edge("Top", "Bottom", distance=2.0, time=4, name="RedRun", grade="red")
+        G.add_edge("Top", "Bottom", distance=1.9, time=5, name="BlueRun", grade="blue")
+        front = pareto_front(G, "Bottom", 20, preferences=[{"blue": 1}, {"red": 1}])
+        self.assertEqual(set(front.grades), {"red", "blue"})
+        plan = front.best(20, weights={"blue": 1})
+        self.assertEqual(plan.path, ["Lift", "BlueRun", "Lift", "BlueRun"])
+        self.assertAlmostEqual(plan.grade_distances["blue"], 3.8)
+        self.assertAlmostEqual(front.best(20).distance, 4.0)
+
+    def _all_plans(self, time_limit):
+        """(time, (km per grade in front order)) of every itinerary from Base"""
+        grades = ("blue", "red")
+        plans = set()
+        stack = [("Base", 0, (0, 0), None, 0)]
+        while stack:
+            node, time_used, vector, last_lift, lift_count = stack.pop()
+            plans.add((float(time_used), tuple(round(km, 6) for km in vector)))
+            for _, next_node, data in self.G.out_edges(node, data=True):
+                if time_used + data["time"] > time_limit:
+                    continue
+                count, lift, new_vector = lift_count, last_lift, vector
+                if data["distance"] == 0:
+                    count = lift_count + 1 if data["name"] == last_lift else 1
+                    lift = data["name"]
+                    if count > 3:
+                        continue
+                else:
+                    column = grades.index(data["grade"])
+                    new_vector = tuple(km + data["distance"] if i == column else km
+                                       for i, km in enumerate(vector))
+                stack.append((next_node, time_used + data["time"], new_vector, lift, count))
+        return plans
+
+if __name__ == "__main__":
+    unittest.main()
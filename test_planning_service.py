@@ -0,0 +1,92 @@
+import asyncio
+import json
+import unittest
+import batch_planner
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from planning_service import PlanningService, serve
+
+class TestPlanningService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+        self.cg = compile_graph(self.G)
+
+    async def test_identical_queries_share_one_solve(self):
+        """Test that a burst of identical queries runs a single search"""
+        async with PlanningService(self.cg, processes=0) as service:
+            results = await asyncio.gather(*[service.plan("Vallandry", 240, 50) for _ in range(20)])
+            other = await service.plan("Arc 1600", 60)
+        expected = find_max_distance_path(self.G, "Vallandry", 240, 50)
+        self.assertEqual({(r.distance, tuple(r.path)) for r in results},
+                         {(expected[0], tuple(expected[1]))})
+        self.assertEqual(other.distance, find_max_distance_path(self.G, "Arc 1600", 60, float("inf"))[0])
+        self.assertEqual(service.solves, 2)
+        self.assertEqual(service.coalesced, 19)
+
+    async def test_timeout_leaves_shared_solve_running(self):
+        """Test that a query timing out does not cancel the solve others wait for"""
+        async with PlanningService(self.cg, processes=0) as service:
+            with self.assertRaises(asyncio.TimeoutError):
+                await service.plan("Vallandry", 240, timeout=0)
+            result = await service.plan("Vallandry", 240)
+            with self.assertRaises(ValueError):
+                await service.plan("Nowhere", 60)
+        self.assertEqual(result.distance, find_max_distance_path(self.G, "Vallandry", 240, float("inf"))[0])
+        self.assertEqual((service.solves, service.coalesced, service.timeouts), (1, 1, 1))
+
+    async def test_distinct_time_limits_share_the_graph(self):
+        """Test that queries with ever new time limits keep no per-limit subgraphs or bounds"""
+        batch_planner._init_worker(None)
+        async with PlanningService(self.cg, processes=0) as service:
+            for time_limit in range(30, 90, 5):
+                result = await service.plan("Vallandry", time_limit)
+                self.assertEqual(result.distance,
+                                 find_max_distance_path(self.G, "Vallandry", time_limit,
+                                                        float("inf"))[0])
+        self.assertEqual(batch_planner._worker_subgraphs, {})
+        self.assertIsNone(batch_planner._worker_graph)
+
+    async def test_backpressure(self):
+        """Test that distinct queries beyond max_pending wait for a free slot"""
+        async with PlanningService(self.cg, processes=0, max_pending=1) as service:
+            first = asyncio.ensure_future(service.plan("Vallandry", 240))
+            second = asyncio.ensure_future(service.plan("Vallandry", 120))
+            for _ in range(3):
+                await asyncio.sleep(0)
+            self.assertEqual(service.solves, 1)
+            await asyncio.gather(first, second)
+            self.assertEqual(service.solves, 2)
+
+    async def test_server(self):
+        """Test JSON-lines queries over a localhost connection served by worker processes"""
+        async with PlanningService(self.cg, processes=2) as service:
+            server = await serve(service)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            lines = [
+                {"id": "a", "start": "Vallandry", "time_limit": 120},
+                {"id": "b", "start": "Vallandry", "time_limit": 120},
+                {"id": "c", "start": "Nowhere", "time_limit": 60},
+            ]
+            writer.write("".join(json.dumps(line) + "\n" for line in lines).encode() + b"not json\n")
+            await writer.drain()
+            writer.write_eof()
+            results = {}
+            while line := await reader.readline():
+                result = json.loads(line)
+                results[result["id"]] = result
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+        expected = find_max_distance_path(self.G, "Vallandry", 120, float("inf"))
+        for query_id in ("a", "b"):
+            self.assertEqual((results[query_id]["distance"], results[query_id]["path"]),
+                             expected)
+        self.assertIn("Unknown start point", results["c"]["error"])
+        self.assertIn("Invalid query", results[4]["error"])
+        self.assertEqual(service.solves, 1)
+
+if __name__ == "__main__":
+    unittest.main()
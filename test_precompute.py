@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from bounds import compute_bounds, get_bounds, times_to
+from compiled_graph import compile_graph
+from load_graph import LES_ARCS_PATH, create_les_arcs_graph
+from optimizer import find_max_distance_path
+from precompute import compute_tables, graph_digest, load_resort_tables, load_tables, save_tables
+
+class TestPrecompute(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resort_path = os.path.join(self.directory, "les_arcs.json")
+        shutil.copy(LES_ARCS_PATH, self.resort_path)
+        self.G, _ = create_les_arcs_graph()
+        self.cg = compile_graph(self.G)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tables(self):
+        """Test that the tables agree with single-source searches and the bounds"""
+        tables = compute_tables(self.cg)
+        end = self.cg.node_index["Arc 1600"]
+        np.testing.assert_allclose(tables.times_to(end), times_to(self.cg, end))
+        start = self.cg.node_index["Vallandry"]
+        self.assertEqual(tables.time_between(start, start), 0)
+        bounds = compute_bounds(self.cg)
+        for time_left in (30, 240):
+            self.assertAlmostEqual(tables.distance_bound(start, time_left),
+                                   bounds.bound(start, -1, 0, time_left))
+
+    def test_round_trip(self):
+        """Test that mapped tables hold the same values and refuse other graphs"""
+        tables = compute_tables(self.cg)
+        path = os.path.join(self.directory, "les_arcs.skitables")
+        save_tables(tables, path, graph_digest(self.cg))
+        mapped = load_tables(path, graph_digest(self.cg))
+        np.testing.assert_array_equal(mapped.times, tables.times)
+        self.assertFalse(mapped.times.flags.writeable)
+        self.assertEqual(mapped.bounds.state_index, tables.bounds.state_index)
+        self.assertEqual(mapped.bounds.rate, tables.bounds.rate)
+        self.assertEqual(mapped.bounds.potential, tables.bounds.potential)
+
+        other = compile_graph(self.G.subgraph(list(self.G)[:-1]))
+        with self.assertRaises(ValueError):
+            load_tables(path, graph_digest(other))
+
+    def test_resort_tables_used_by_searches(self):
+        """Test that cached tables are rebuilt after edits and answer the searches"""
+        tables = load_resort_tables(self.resort_path, self.cg)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "les_arcs.skitables")))
+        self.assertIs(get_bounds(self.cg), tables.bounds)
+        for end in (None, "Arc 1600"):
+            self.assertEqual(find_max_distance_path(self.cg, "Vallandry", 240, 1000, end=end),
+                             find_max_distance_path(self.G, "Vallandry", 240, 1000, end=end))
+
+        with open(self.resort_path) as f:
+            text = f.read()
+        with open(self.resort_path, "w") as f:
+            f.write(text.replace('"time": 7, "name": "Grizzly Lift"', '"time": 20, "name": "Grizzly Lift"'))
+        changed = load_resort_tables(self.resort_path)
+        self.assertFalse(np.array_equal(changed.times, tables.times))
+
+    def test_unwritable_tables(self):
+        """Test that tables that cannot be written are computed and kept in memory"""
+        blocker = os.path.join(self.directory, "not_a_directory")
+        open(blocker, "w").close()
+        tables = load_resort_tables(self.resort_path, self.cg,
+                                    os.path.join(blocker, "les_arcs.skitables"))
+        self.assertIs(get_bounds(self.cg), tables.bounds)
+        self.assertEqual(find_max_distance_path(self.cg, "Vallandry", 240, 1000),
+                         find_max_distance_path(self.G, "Vallandry", 240, 1000))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import networkx as nx
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path, print_path_breakdown
+from reduction import reduce_graph
+from synthetic_resort import create_synthetic_resort
+
+class TestReduction(unittest.TestCase):
+    def setUp(self):
+        # One lift loop through two pass-through points, plus a second lift
+        self.G = nx.MultiDiGraph()
+        self.G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        self.G.add_edge("Top", "Middle", distance=2, time=3, name="Upper", grade="red")
+        self.G.add_edge("Middle", "Base", distance=5, time=10, name="Lower", grade="blue")
+        self.G.add_edge("Base", "Other", distance=0, time=4, name="Lift2")
+        self.G.add_edge("Other", "Base", distance=1, time=3, name="Short", grade="red")
+
+    def test_chain_contracted(self):
+        """Test that pass-through points become macro-edges with a place to stop"""
+        reduction = reduce_graph(compile_graph(self.G), "Base", 100)
+        graph = reduction.graph
+        names = set(graph.edge_names)
+        self.assertIn("Lift1 + Upper + Lower", names)
+        self.assertIn("Lift2 + Short", names)
+        # Stopping at Top or Middle is still possible
+        self.assertIn("Lift1", names)
+        self.assertIn("Lift1 + Upper", names)
+        self.assertEqual(list(graph.out_edges(graph.node_index["Middle"])), [])
+
+    def test_lift_repeats_preserved(self):
+        """Test that macro-edges count their lift like the lift itself"""
+        for time_limit in (9, 40, 100):
+            expected = find_max_distance_path(self.G, "Base", time_limit, 1000)
+            reduced = find_max_distance_path(self.G, "Base", time_limit, 1000, reduce=True)
+            self.assertEqual(reduced, expected)
+        # Three loops over Lift1, then Lift2 is needed before a fourth
+        distance, path = find_max_distance_path(self.G, "Base", 100, 1000, reduce=True)
+        self.assertEqual(path[:12], ["Lift1", "Upper", "Lower"] * 3 + ["Lift2", "Short", "Lift1"])
+
+    def test_stop_inside_chain(self):
+        """Test that the best itinerary may end at a contracted point"""
+        distance, path = find_max_distance_path(self.G, "Base", 9, 1000, reduce=True)
+        self.assertEqual((distance, path), (2, ["Lift1", "Upper"]))
+
+    def test_same_optimum(self):
+        """Test that reduced searches find the same optimum on real and generated resorts"""
+        cases = [(create_les_arcs_graph()[0], "Vallandry")]
+        for seed in range(3):
+            G, node_rows = create_synthetic_resort(num_nodes=30, num_rows=3, seed=seed)
+            cases.append((G, node_rows[-1][0]))
+        for G, start in cases:
+            cg = compile_graph(G)
+            for time_limit, goal in ((45, 1000), (120, 1000), (120, 20)):
+                for method in ("labels", "dp"):
+                    expected, _ = find_max_distance_path(cg, start, time_limit, goal, method=method)
+                    distance, path = find_max_distance_path(cg, start, time_limit, goal,
+                                                            method=method, reduce=True,
+                                                            edge_keys=True)
+                    self.assertAlmostEqual(distance, expected, places=6)
+                    self._check_itinerary(G, start, path, time_limit, distance)
+
+    def test_reachability(self):
+        """Test that points out of reach in the time limit are dropped"""
+        G, node_rows = create_synthetic_resort(num_nodes=400, seed=0)
+        cg = compile_graph(G)
+        reduction = reduce_graph(cg, node_rows[-1][0], 60)
+        self.assertLess(reduction.graph.num_nodes * 5, cg.num_nodes)
+
+    def test_breakdown_of_expanded_path(self):
+        """Test that expanded results print with the original edges"""
+        G, _ = create_les_arcs_graph()
+        distance, path = find_max_distance_path(G, "Vallandry", 120, 1000, reduce=True,
+                                                edge_keys=True)
+        self.assertTrue(all(edge in G.edges for edge in path))
+        print_path_breakdown(G, distance, path, "Vallandry")
+
+    def _check_itinerary(self, G, start, path, time_limit, distance):
+        node, total_time, total_distance = start, 0, 0
+        for edge in path:
+            self.assertEqual(edge[0], node)
+            total_time += G.edges[edge]["time"]
+            total_distance += G.edges[edge]["distance"]
+            node = edge[1]
+        self.assertLessEqual(total_time, time_limit + 1e-9)
+        self.assertAlmostEqual(total_distance, distance, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
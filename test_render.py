@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from load_graph import load_resort
+from render import ResortRenderer, main, render_many
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        self.G, self.node_rows = create_les_arcs_graph()
+        self.directory = tempfile.mkdtemp()
+        _, self.path = find_max_distance_path(self.G, "Vallandry", 120, 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _file(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_png_matches_full_redraw(self):
+        """Test that maps drawn over the cached background equal a full redraw"""
+        renderer = ResortRenderer(self.G, self.node_rows, size=(6, 4), dpi=50)
+        renderer.render(self._file("empty.png"), "Arc 1600", [])
+        renderer.render(self._file("names.png"), "Vallandry", self.path)
+        _, keys = find_max_distance_path(self.G, "Vallandry", 120, 1000, edge_keys=True)
+        renderer.render(self._file("keys.png"), "Vallandry", keys)
+
+        names = np.asarray(Image.open(self._file("names.png")).convert("RGB"))
+        self.assertEqual(names.shape, (200, 300, 3))
+        self.assertTrue(np.array_equal(
+            names, np.asarray(Image.open(self._file("keys.png")).convert("RGB"))))
+        self.assertFalse(np.array_equal(
+            names, np.asarray(Image.open(self._file("empty.png")).convert("RGB"))))
+
+        for layer in renderer._layers:
+            layer.set_animated(False)
+        renderer.canvas.draw()
+        self.assertTrue(np.array_equal(names, np.asarray(renderer.canvas.buffer_rgba())[:, :, :3]))
+
+    def test_svg_and_invalid_paths(self):
+        """Test SVG maps and the errors for paths that do not fit the graph"""
+        renderer = ResortRenderer(self.G, size=(6, 4))
+        renderer.render(self._file("map.svg"), "Vallandry", self.path, title="Long day")
+        with open(self._file("map.svg")) as f:
+            self.assertIn("Long day", f.read())
+        with self.assertRaises(ValueError):
+            renderer.render(self._file("map.png"), "Vallandry", ["Nowhere Lift"])
+        with self.assertRaises(ValueError):
+            renderer.render(self._file("map.png"), "Nowhere", [])
+        with self.assertRaises(ValueError):
+            renderer.render(self._file("map.gif"), "Vallandry", self.path)
+
+    def test_process_pool(self):
+        """Test that a process pool writes the same maps as in-process rendering"""
+        jobs = [(self._file(f"{i}.png"), "Vallandry", self.path[:i]) for i in range(6)]
+        seconds = render_many(self.G, jobs, self.node_rows, processes=0, dpi=40)
+        self.assertEqual(len(seconds), len(jobs))
+        expected = [open(filename, "rb").read() for filename, _, _ in jobs]
+        render_many(self.G, jobs, self.node_rows, processes=2, chunksize=2, dpi=40)
+        self.assertEqual([open(filename, "rb").read() for filename, _, _ in jobs], expected)
+        self.assertEqual(render_many(self.G, [], processes=2), [])
+
+    def test_main_draws_parallel_slope(self):
+        """Test that batch maps highlight the parallel slope the plan took, not the first one"""
+        resort = {"node_rows": [["Top"], ["Bottom"]],
+                  "slopes": [{"start": "Top", "end": "Bottom", "distance": 1.0, "grade": "blue",
+                              "name": "Belette"},
+                             {"start": "Top", "end": "Bottom", "distance": 1.5, "grade": "red",
+                              "name": "Belette"}],
+                  "lifts": [{"start": "Bottom", "end": "Top", "time": 5, "name": "Lift"}]}
+        with open(self._file("resort.json"), "w") as f:
+            json.dump(resort, f)
+        with open(self._file("queries.jsonl"), "w") as f:
+            f.write(json.dumps({"id": "day", "start": "Top", "time_limit": 10}) + "\n")
+        main([self._file("queries.jsonl"), "-o", self._file("maps"), "-r", self._file("resort.json"),
+              "-p", "0", "--dpi", "40"])
+
+        G, node_rows = load_resort(self._file("resort.json"))
+        _, keys = find_max_distance_path(G, "Top", 10, float("inf"), edge_keys=True)
+        self.assertEqual(G.edges[keys[0]]["grade"], "red")
+        renderer = ResortRenderer(G, node_rows, dpi=40)
+        renderer.render(self._file("keys.png"), "Top", keys)
+        renderer.render(self._file("names.png"), "Top", [G.edges[key]["name"] for key in keys])
+        drawn = open(self._file(os.path.join("maps", "day.png")), "rb").read()
+        self.assertEqual(drawn, open(self._file("keys.png"), "rb").read())
+        self.assertNotEqual(drawn, open(self._file("names.png"), "rb").read())
+
+if __name__ == "__main__":
+    unittest.main()
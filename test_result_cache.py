@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from lift_schedules import LiftSchedule
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from result_cache import ResultCache, graph_fingerprint
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+
+    def test_hit_after_miss(self):
+        """Test that a repeated query is answered from memory"""
+        cache = ResultCache()
+        first = cache.find_max_distance_path(self.G, "Vallandry", 120, 30)
+        second = cache.find_max_distance_path(self.G, "Vallandry", 120, 30)
+        self.assertEqual(first, find_max_distance_path(self.G, "Vallandry", 120, 30))
+        self.assertEqual(first, second)
+        self.assertEqual((cache.misses, cache.hits), (1, 1))
+
+    def test_results_are_copies(self):
+        """Test that changing a returned path does not change the cached result"""
+        cache = ResultCache()
+        distance, path = cache.find_max_distance_path(self.G, "Vallandry", 120, 30)
+        expected = list(path)
+        path.append("Nowhere Lift")
+        self.assertEqual(cache.find_max_distance_path(self.G, "Vallandry", 120, 30),
+                         (distance, expected))
+
+    def test_query_options_in_key(self):
+        """Test that end, reduce and lift schedules are part of the cache key"""
+        cache = ResultCache()
+        cache.find_max_distance_path(self.G, "Vallandry", 120, 1000)
+        result = cache.find_max_distance_path(self.G, "Vallandry", 120, 1000, end="Arc 1600")
+        self.assertEqual(result,
+                         find_max_distance_path(self.G, "Vallandry", 120, 1000, end="Arc 1600"))
+        cache.find_max_distance_path(self.G, "Vallandry", 120, 1000, reduce=True)
+        self.assertEqual(cache.misses, 3)
+
+        schedules = {"Grizzly Lift": LiftSchedule([0, 600], [7, None])}
+        result = cache.find_max_distance_path(self.G, "Vallandry", 120, 1000, schedules=schedules,
+                                              start_time="09:00")
+        self.assertEqual(result, find_max_distance_path(self.G, "Vallandry", 120, 1000,
+                                                        schedules=schedules, start_time="09:00"))
+        cache.find_max_distance_path(self.G, "Vallandry", 120, 1000, schedules=schedules,
+                                     start_time="10:00")
+        self.assertEqual(cache.misses, 5)
+        cache.find_max_distance_path(self.G, "Vallandry", 120, 1000, schedules=schedules,
+                                     start_time="09:00")
+        self.assertEqual(cache.hits, 1)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResultCache(maxsize=2)
+        cache.find_max_distance_path(self.G, "Vallandry", 60, 30)
+        cache.find_max_distance_path(self.G, "Arc 1600", 60, 30)
+        cache.find_max_distance_path(self.G, "Vallandry", 60, 30)
+        cache.find_max_distance_path(self.G, "Arc 1800", 60, 30)
+        self.assertEqual(cache.stats()["size"], 2)
+
+        cache.find_max_distance_path(self.G, "Vallandry", 60, 30)
+        self.assertEqual(cache.hits, 2)
+        cache.find_max_distance_path(self.G, "Arc 1600", 60, 30)
+        self.assertEqual(cache.misses, 4)
+
+    def test_graph_change_invalidates(self):
+        """Test that closing a lift changes the fingerprint and misses the cache"""
+        cache = ResultCache()
+        before = graph_fingerprint(self.G)
+        cache.find_max_distance_path(self.G, "Vallandry", 120, 1000)
+
+        self.G.remove_edges_from([(u, v, k) for u, v, k, d in self.G.edges(keys=True, data=True)
+                                  if d["name"] == "Grizzly Lift"])
+        self.assertNotEqual(graph_fingerprint(self.G), before)
+        distance, path = cache.find_max_distance_path(self.G, "Vallandry", 120, 1000)
+        self.assertEqual(cache.misses, 2)
+        self.assertNotIn("Grizzly Lift", path)
+
+    def test_disk_tier_survives_restart(self):
+        """Test that results persisted on disk are found by a new cache"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.sqlite")
+            cache = ResultCache(path=path)
+            expected = cache.find_max_distance_path(self.G, "Vallandry", 90, 1000, edge_keys=True)
+            cache.close()
+
+            cache = ResultCache(path=path)
+            self.assertEqual(cache.find_max_distance_path(self.G, "Vallandry", 90, 1000, edge_keys=True),
+                             expected)
+            self.assertEqual((cache.disk_hits, cache.misses), (1, 0))
+            cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
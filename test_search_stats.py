@@ -0,0 +1,58 @@
+import unittest
+import networkx as nx
+from load_graph import create_les_arcs_graph
+from optimizer import find_max_distance_path
+from search_stats import SearchStats
+
+class TestSearchStats(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+
+    def test_stats_next_to_result(self):
+        """Test that requesting stats returns them without changing the result"""
+        plain = find_max_distance_path(self.G, "Vallandry", 240, 1000)
+        distance, path, stats = find_max_distance_path(self.G, "Vallandry", 240, 1000, stats=True)
+        self.assertEqual((distance, path), plain)
+        self.assertIsInstance(stats, SearchStats)
+        self.assertEqual(stats.method, "labels")
+        self.assertGreater(stats.expansions, 0)
+        self.assertGreaterEqual(stats.pops, stats.expansions)
+        self.assertGreaterEqual(stats.pushes + 1, stats.pops)
+        self.assertGreater(stats.queue_peak, 1)
+        self.assertGreater(stats.time_dropped, 0)
+        for phase in ("compile", "bounds", "seed", "search", "path"):
+            self.assertIn(phase, stats.phases)
+
+    def test_lift_repeat_drops(self):
+        """Test that lifts skipped by the repeat limit are counted"""
+        G = nx.DiGraph()
+        G.add_edge("Base", "Top", distance=0, time=5, name="Lift1")
+        G.add_edge("Top", "Base", distance=2, time=3, name="Slope1", grade="red")
+        for method in ("labels", "bfs"):
+            # Without pruning, the search has to try the fourth lift ride
+            distance, _, stats = find_max_distance_path(G, "Base", 100, 1000, method=method,
+                                                        prune=False, stats=True)
+            self.assertEqual(distance, 6)
+            self.assertGreater(stats.lift_repeat_dropped, 0, method)
+
+    def test_sampled_trace(self):
+        """Test that every n-th expansion is traced, up to the trace limit"""
+        stats = SearchStats(trace_every=10, trace_limit=5)
+        _, _, stats = find_max_distance_path(self.G, "Vallandry", 240, 1000, prune=False,
+                                             stats=stats)
+        self.assertEqual(len(stats.trace), min(5, stats.expansions // 10))
+        time_used, node, distance, _, _ = stats.trace[0]
+        self.assertIn(node, self.G)
+        self.assertLessEqual(time_used, 240)
+        self.assertGreaterEqual(distance, 0)
+
+    def test_as_dict(self):
+        """Test that stats convert to a plain dict for metrics"""
+        _, _, stats = find_max_distance_path(self.G, "Vallandry", 60, 1000, method="dp", stats=True)
+        result = stats.as_dict()
+        self.assertEqual(result["method"], "dp")
+        self.assertIn("search", result["phases"])
+        self.assertEqual(result["pops"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
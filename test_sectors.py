@@ -0,0 +1,78 @@
+import unittest
+from compiled_graph import compile_graph
+from load_graph import create_les_arcs_graph
+from optimizer import MAX_LIFT_REPEATS, find_max_distance_path
+from sectors import SectorPlanner, partition_sectors
+
+class TestSectors(unittest.TestCase):
+    def setUp(self):
+        self.G, _ = create_les_arcs_graph()
+        self.cg = compile_graph(self.G)
+
+    def test_partition(self):
+        """Test that sectors cover every node once and keep each lift inside one sector"""
+        sectors = partition_sectors(self.cg)
+        self.assertGreater(len(sectors), 1)
+        self.assertEqual(sorted(node for sector in sectors for node in sector),
+                         list(range(self.cg.num_nodes)))
+        sector_of = {node: i for i, sector in enumerate(sectors) for node in sector}
+        source = self.cg.source()
+        lift_sector = {}
+        for e in range(self.cg.num_edges):
+            if self.cg.lift[e] >= 0:
+                for node in (source[e], self.cg.target[e]):
+                    self.assertEqual(lift_sector.setdefault(self.cg.lift[e], sector_of[node]),
+                                     sector_of[node])
+
+    def test_matches_whole_graph_dp(self):
+        """Test that planning over sectors finds the dp optimum with a valid itinerary"""
+        planner = SectorPlanner(self.G, 300)
+        for start in ("Vallandry", "Arc 1600", "Arc 1950"):
+            for time_limit in (20, 90, 300):
+                distance, path = planner.plan(start, time_limit, edge_keys=True)
+                expected, _ = find_max_distance_path(self.G, start, time_limit, float("inf"),
+                                                     method="dp")
+                self.assertAlmostEqual(distance, expected)
+                self._check_itinerary(start, path, time_limit, distance)
+
+    def test_given_sectors_and_goal(self):
+        """Test sectors given by name and stopping at a distance goal"""
+        sectors = [
+            ["Arc 1600", "Arc 1800", "Mont Blanc Top", "Bois de l'Ours Top", "Arpette Bottom"],
+            ["Arc 1950", "Comborciere Top", "Comborciere Bottom", "La Bulle Restaurant",
+             "Transarc Top", "Transarc Middle"],
+            ["Vallandry", "Grizzly top", "Le Derby Top", "Le Derby Bottom"],
+        ]
+        planner = SectorPlanner(self.G, 240, sectors=sectors)
+        self.assertEqual(planner.num_sectors, 3)
+        distance, path = planner.plan("Vallandry", 240, 20, edge_keys=True)
+        _, expected = find_max_distance_path(self.G, "Vallandry", 240, 20, method="dp",
+                                             edge_keys=True)
+        self.assertGreaterEqual(distance, 20)
+        self.assertAlmostEqual(self._time(path), self._time(expected))
+        self._check_itinerary("Vallandry", path, 240, distance)
+
+        with self.assertRaises(ValueError):
+            planner.plan("Vallandry", 241)
+        with self.assertRaises(ValueError):
+            SectorPlanner(self.G, 60, sectors=sectors[:2])
+
+    def _time(self, path):
+        return sum(self.G.edges[key]["time"] for key in path)
+
+    def _check_itinerary(self, start, path, time_limit, distance):
+        """Check that path is a connected itinerary from start obeying the limits."""
+        node, last_lift, repeats = start, None, 0
+        for key in path:
+            self.assertEqual(key[0], node)
+            data = self.G.edges[key]
+            if data["distance"] == 0:
+                repeats = repeats + 1 if data["name"] == last_lift else 1
+                last_lift = data["name"]
+                self.assertLessEqual(repeats, MAX_LIFT_REPEATS)
+            node = key[1]
+        self.assertLessEqual(self._time(path), time_limit + 1e-6)
+        self.assertAlmostEqual(sum(self.G.edges[key]["distance"] for key in path), distance)
+
+if __name__ == "__main__":
+    unittest.main()
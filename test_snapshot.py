@@ -0,0 +1,92 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from compiled_graph import compile_graph
+from load_graph import LES_ARCS_PATH, create_les_arcs_graph
+from optimizer import find_max_distance_path
+from snapshot import load_compiled_resort, load_snapshot, save_snapshot
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.resort_path = os.path.join(self.directory, "les_arcs.json")
+        shutil.copy(LES_ARCS_PATH, self.resort_path)
+        self.G, _ = create_les_arcs_graph()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """Test that a mapped snapshot holds the same compiled graph"""
+        cg = compile_graph(self.G)
+        path = os.path.join(self.directory, "graph.skigraph")
+        save_snapshot(cg, path)
+        mapped = load_snapshot(path)
+        self.assertEqual(mapped.nodes, cg.nodes)
+        for name in ("indptr", "target", "time", "distance", "is_lift", "lift"):
+            self.assertEqual(list(getattr(mapped, name)), list(getattr(cg, name)), name)
+        self.assertEqual(mapped.edge_names, cg.edge_names)
+        self.assertEqual(mapped.edge_grades, cg.edge_grades)
+        self.assertEqual(mapped.edge_keys, cg.edge_keys)
+        self.assertEqual(mapped.lift_names, cg.lift_names)
+        for method in ("labels", "dp"):
+            self.assertEqual(find_max_distance_path(mapped, "Vallandry", 240, 1000, method=method),
+                             find_max_distance_path(self.G, "Vallandry", 240, 1000, method=method))
+
+    def test_rebuilt_when_resort_changes(self):
+        """Test that editing the resort file invalidates its snapshot"""
+        cg = load_compiled_resort(self.resort_path)
+        snapshot_path = os.path.join(self.directory, "les_arcs.skigraph")
+        self.assertTrue(os.path.exists(snapshot_path))
+        self.assertEqual(load_compiled_resort(self.resort_path).time.tolist(), cg.time.tolist())
+
+        with open(self.resort_path) as f:
+            text = f.read()
+        with open(self.resort_path, "w") as f:
+            f.write(text.replace('"time": 7, "name": "Grizzly Lift"', '"time": 20, "name": "Grizzly Lift"'))
+        changed = load_compiled_resort(self.resort_path)
+        lift = changed.edge_names.index("Grizzly Lift")
+        self.assertEqual(changed.time[lift], 20)
+
+    def test_unwritable_snapshot(self):
+        """Test that a snapshot that cannot be written leaves the graph in memory"""
+        blocker = os.path.join(self.directory, "not_a_directory")
+        open(blocker, "w").close()
+        cg = load_compiled_resort(self.resort_path, os.path.join(blocker, "les_arcs.skigraph"))
+        self.assertEqual(find_max_distance_path(cg, "Vallandry", 240, 1000),
+                         find_max_distance_path(self.G, "Vallandry", 240, 1000))
+
+    def test_read_only_directory(self):
+        """Test that a resort in a read-only directory loads without its snapshot"""
+        os.chmod(self.directory, 0o555)
+        try:
+            if os.access(self.directory, os.W_OK):
+                self.skipTest("read-only directories are writable for this user")
+            cg = load_compiled_resort(self.resort_path)
+            self.assertFalse(os.path.exists(os.path.join(self.directory, "les_arcs.skigraph")))
+            self.assertEqual(cg.edge_keys, compile_graph(self.G).edge_keys)
+        finally:
+            os.chmod(self.directory, 0o755)
+
+    def test_rejects_other_files(self):
+        """Test that files that are not snapshots of this version are refused"""
+        path = os.path.join(self.directory, "bad.skigraph")
+        with open(path, "wb") as f:
+            f.write(b"not a snapshot" * 10)
+        with self.assertRaises(ValueError):
+            load_snapshot(path)
+
+    def test_pickles_as_file_name(self):
+        """Test that a mapped graph is sent to other processes by file name"""
+        cg = load_compiled_resort(self.resort_path)
+        data = pickle.dumps(cg)
+        self.assertLess(len(data), 200)
+        copy = pickle.loads(data)
+        self.assertEqual(copy.edge_keys, cg.edge_keys)
+        # Graphs built in memory still pickle their arrays
+        self.assertEqual(pickle.loads(pickle.dumps(compile_graph(self.G))).edge_keys, cg.edge_keys)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from compiled_graph import compile_graph
+from optimizer import solve_compiled
+from synthetic_resort import create_synthetic_resort
+
+class TestSyntheticResort(unittest.TestCase):
+    def test_same_seed_same_graph(self):
+        """Test that the generator is deterministic for a seed"""
+        G1, rows1 = create_synthetic_resort(num_nodes=60, seed=3)
+        G2, rows2 = create_synthetic_resort(num_nodes=60, seed=3)
+        G3, _ = create_synthetic_resort(num_nodes=60, seed=4)
+        self.assertEqual(rows1, rows2)
+        self.assertEqual(list(G1.edges(keys=True, data=True)), list(G2.edges(keys=True, data=True)))
+        self.assertNotEqual(list(G1.edges(keys=True, data=True)), list(G3.edges(keys=True, data=True)))
+
+    def test_layout(self):
+        """Test that lifts go up, slopes go down and every node has a way on"""
+        G, node_rows = create_synthetic_resort(num_nodes=100, num_rows=5, seed=0)
+        self.assertEqual(sum(len(row) for row in node_rows), 100)
+        for u, v, data in G.edges(data=True):
+            if data["distance"] == 0:
+                self.assertLess(G.nodes[v]["row"], G.nodes[u]["row"])
+            else:
+                self.assertGreater(G.nodes[v]["row"], G.nodes[u]["row"])
+        for node in G.nodes:
+            self.assertGreater(G.out_degree(node), 0)
+        for node in node_rows[-1]:
+            self.assertTrue(any(d["distance"] == 0 for _, _, d in G.out_edges(node, data=True)))
+
+    def test_solvers_agree(self):
+        """Test that the exact solvers agree on a synthetic resort"""
+        G, node_rows = create_synthetic_resort(num_nodes=40, seed=1)
+        cg = compile_graph(G)
+        labels, _ = solve_compiled(cg, node_rows[-1][0], 120, 1e9, "labels")
+        dp, _ = solve_compiled(cg, node_rows[-1][0], 120, 1e9, "dp")
+        self.assertAlmostEqual(labels, dp, places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,28 +2,7 @@ import networkx as nx
 import matplotlib.pyplot as plt
 from load_graph import create_les_arcs_graph
 import numpy as np
-
-def wrap_text(text, width=10):
-    """Wrap text at specified width."""
-    words = text.split()
-    lines = []
-    current_line = []
-    current_length = 0
-    
-    for word in words:
-        if current_length + len(word) + 1 <= width:
-            current_line.append(word)
-            current_length += len(word) + 1
-        else:
-            lines.append(' '.join(current_line))
-            current_line = [word]
-            current_length = len(word)
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    return '\n'.join(lines)
-
+from render import edge_curvatures, node_positions, wrap_text
 
 def draw_curved_edge(pos, node1, node2, color, label, rad, ax):
     """Draw a curved edge between two nodes."""
@@ -102,23 +81,7 @@ def visualize_ski_resort():
     fig, ax = plt.subplots(figsize=(18, 12))
     
     # Calculate positions based on rows
-    pos = {}
-    total_rows = len(node_rows)
-    
-    # Create a mapping of node to row number for easy lookup
-    node_to_row = {}
-    for row_idx, row in enumerate(node_rows):
-        for node in row:
-            node_to_row[node] = row_idx
-    
-    for row_idx, row in enumerate(node_rows):
-        y = 1 - (row_idx / (total_rows - 1))  # Convert row to y coordinate (top = 1, bottom = 0)
-        
-        # Position nodes horizontally within their row
-        for col_idx, node in enumerate(row):
-            x = (col_idx - (len(row) - 1)/2) / max(4, len(row))
-            x = x * 1.5  # Spread out horizontally
-            pos[node] = (x, y)
+    pos = node_positions(node_rows)
     
     # Draw nodes with larger size
     nx.draw_networkx_nodes(G, pos,
@@ -127,79 +90,20 @@ def visualize_ski_resort():
                           alpha=0.7,
                           ax=ax)
     
-    # Group edges by their endpoints
-    edge_groups = {}
-    for u, v, data in G.edges(data=True):
-        key = frozenset([u, v])
-        if key not in edge_groups:
-            edge_groups[key] = {'up': [], 'down': []}
-        
-        # Determine direction based on row numbers
-        u_row = [idx for idx, row in enumerate(node_rows) if u in row][0]
-        v_row = [idx for idx, row in enumerate(node_rows) if v in row][0]
-        
-        if data['distance'] == 0:  # Lift
-            edge_groups[key]['up'].append((u, v, data))
-        else:  # Slope
-            if v_row > u_row:  # Going down (remember: higher row number = lower altitude)
-                edge_groups[key]['down'].append((u, v, data))
-            else:
-                edge_groups[key]['up'].append((u, v, data))
-    
-    # Draw edges with curves based on direction
-    for key, directions in edge_groups.items():
-        # Get the two nodes
-        node1, node2 = list(key)
-        # Get their row numbers (lower row number = higher altitude)
-        row1 = node_to_row[node1]
-        row2 = node_to_row[node2]
-        # Determine which node is higher (lower row number = higher altitude)
-        higher_node = node1 if row1 < row2 else node2
-        lower_node = node2 if row1 < row2 else node1
+    # Draw edges curved by direction, upward and downward edges between the
+    # same nodes to opposite sides
+    for (u, v, key), rad in edge_curvatures(G, pos).items():
+        data = G.edges[u, v, key]
+        color = 'gray' if data['distance'] == 0 else {
+            'blue': 'blue',
+            'red': 'red',
+            'black': 'black'
+        }[data['grade']]
         
-        # Draw upward edges (going from lower to higher altitude)
-        for i, (u, v, data) in enumerate(directions['up']):
-            # Base curvature depends on whether edge starts from the left or right node
-            x1, _ = pos[u]
-            x2, _ = pos[v]
-            is_going_right = x1 < x2
-            
-            # If going right, curve right (positive); if going left, curve left (negative)
-            base_rad = 0.4 if is_going_right else -0.4
-            # Add additional curve for parallel edges
-            rad = base_rad + (0.2 * i if len(directions['up']) > 1 else 0)
-            
-            color = 'gray' if data['distance'] == 0 else {
-                'blue': 'blue',
-                'red': 'red',
-                'black': 'black'
-            }[data['grade']]
-            
-            label = (f"{wrap_text(data['name'])}\n{data['time']}m" if data['distance'] == 0 
-                    else f"{wrap_text(data['name'])}\n{data['distance']}km\n{data['time']}m")
-            
-            draw_curved_edge(pos, u, v, color, label, rad, ax)
+        label = (f"{wrap_text(data['name'])}\n{data['time']}m" if data['distance'] == 0 
+                else f"{wrap_text(data['name'])}\n{data['distance']}km\n{data['time']}m")
         
-        # Draw downward edges (going from higher to lower altitude)
-        for i, (u, v, data) in enumerate(directions['down']):
-            # Base curvature depends on whether edge starts from the left or right node
-            x1, _ = pos[u]
-            x2, _ = pos[v]
-            is_going_right = x1 < x2
-            
-            # Opposite curve direction from upward edges
-            base_rad = -0.4 if is_going_right else 0.4
-            # Add additional curve for parallel edges
-            rad = base_rad - (0.2 * i if len(directions['down']) > 1 else 0)
-            
-            color = {
-                'blue': 'blue',
-                'red': 'red',
-                'black': 'black'
-            }[data['grade']]
-            
-            label = f"{wrap_text(data['name'])}\n{data['distance']}km\n{data['time']}m"
-            draw_curved_edge(pos, u, v, color, label, rad, ax)
+        draw_curved_edge(pos, u, v, color, label, rad, ax)
     
     # Draw node labels with larger font
     node_labels = {node: wrap_text(node, width=15) for node in G.nodes()}